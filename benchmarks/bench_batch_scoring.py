@@ -0,0 +1,39 @@
+# **********************************************************************************************************************************************************************
+# Benchmark: batch prospect scoring (code/nfl_batch.py)
+# - synthetic combine history and a synthetic draft class, top-k comparables for every prospect in one pass
+# - run via: python benchmarks/bench_batch_scoring.py [--players 2000] [--prospects 300 3000]
+# **********************************************************************************************************************************************************************
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'code'))
+from nfl_batch import score_prospects
+from nfl_sources import clean_combine_data
+from nfl_similarity import SIMILARITY_METRICS, SimilarityEngine
+from synthetic_data import make_combine_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark batch prospect scoring')
+    parser.add_argument('--players', type=int, default=2_000, help='historical combine players')
+    parser.add_argument('--prospects', type=int, nargs='+', default=[300, 3_000])
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+
+    combine = clean_combine_data(make_combine_table(args.players))
+    start = time.perf_counter()
+    engines = {position: SimilarityEngine(combine[combine['Pos'] == position]) for position in combine['Pos'].dropna().unique()}
+    print(f'engines built for {args.players:,} players: {time.perf_counter() - start:.3f} s')
+
+    for n_prospects in args.prospects:
+        prospects = clean_combine_data(make_combine_table(n_prospects, seed=1)).rename(columns={'Pos': 'position'})
+        prospects = prospects.dropna(subset=SIMILARITY_METRICS + ['position'])
+        start = time.perf_counter()
+        results = score_prospects(prospects, engines.__getitem__, k=args.k)
+        print(f"{len(prospects):>6,} prospects scored in {time.perf_counter() - start:.3f} s ({len(results):,} comparables)")
+
+
+if __name__ == '__main__':
+    main()
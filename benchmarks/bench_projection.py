@@ -0,0 +1,58 @@
+# **********************************************************************************************************************************************************************
+# Benchmark: projection models (code/nfl_models.py, code/nfl_train.py)
+# - synthetic combine and seasonal data, training of all models (sequential and in a process pool)
+# - inference latency of ProjectionModels.project for one player and for whole draft classes
+# - run via: python benchmarks/bench_projection.py [--players 4000] [--batches 1 100 10000] [--workers 4]
+# **********************************************************************************************************************************************************************
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'code'))
+from nfl_sources import clean_combine_data, clean_season_data
+from nfl_models import ProjectionModels
+from nfl_train import train_models
+from synthetic_data import make_combine_table, make_season_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark training and inference of the projection models')
+    parser.add_argument('--players', type=int, default=4_000, help='players of the synthetic combine data')
+    parser.add_argument('--batches', type=int, nargs='+', default=[1, 100, 10_000], help='rows per projection call')
+    parser.add_argument('--workers', type=int, default=None, help='processes of the parallel training')
+    parser.add_argument('--repeat', type=int, default=20, help='repetitions of each projection call')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        combine_path = os.path.join(directory, 'combine.parquet')
+        season_path = os.path.join(directory, 'season.parquet')
+        clean_combine_data(make_combine_table(args.players)).to_parquet(combine_path, index=False)
+        clean_season_data(make_season_table(args.players * 4)).to_parquet(season_path, index=False)
+
+        for workers in [1, args.workers]:
+            start = time.perf_counter()
+            version_dir = train_models(combine_path, season_path, os.path.join(directory, f'models_{workers}'), workers=workers)
+            print(f'training with {workers or os.cpu_count()} worker(s): {time.perf_counter() - start:.3f} s')
+
+        models = ProjectionModels(version_dir)
+        start = time.perf_counter()
+        models.project('WR', {metric: 0.0 for metric in models.features})
+        print(f'first projection (loads the models): {(time.perf_counter() - start) * 1000:.1f} ms')
+
+        prospects = clean_combine_data(make_combine_table(max(args.batches), seed=1))
+        for n_rows in args.batches:
+            batch = prospects.iloc[:n_rows]
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                models.project('WR', batch)
+                timings.append(time.perf_counter() - start)
+            print(f'{n_rows:>7,} rows: median {np.median(timings) * 1000:.2f} ms per call ({n_rows / np.median(timings):,.0f} rows/s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# **********************************************************************************************************************************************************************
+# Benchmark: memory per dashboard session
+# - starts more and more sessions of the dashboard in one process (streamlit's AppTest, every session keeps its own session state)
+#   on synthetic data (see synthetic_data.make_dataset), each session opens both pages and runs a comparison
+# - reports the resident memory of the process and the Python memory retained by the sessions (traced with tracemalloc from the
+#   end of the first session on): the dataset is loaded once per process and shared by all sessions (see nfl_data.load_engine /
+#   nfl_sources.compact_frame), so the memory per additional session should stay small and flat.
+#   The resident memory also grows with the malloc arenas of the script threads (one per rerun), the traced memory does not
+# - run via: python benchmarks/bench_session_memory.py [--scale 1] [--sessions 1 2 4 8 16 32]
+# **********************************************************************************************************************************************************************
+import argparse
+import gc
+import os
+import sys
+import tempfile
+
+import tracemalloc
+
+import psutil
+from streamlit.testing.v1 import AppTest
+
+CODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'code')
+sys.path.insert(0, CODE_DIR)
+import nfl_sources
+from bench_suite import write_sources
+from synthetic_data import make_dataset
+
+APP = os.path.join(CODE_DIR, 'main_nfl_app.py')
+
+
+def rss_mb():
+    gc.collect()
+    return psutil.Process().memory_info().rss / 2**20
+
+
+# One session: the comparison of existing players (default page), then a new player compared with the similar players
+def open_session():
+    session = AppTest.from_file(APP, default_timeout=120).run()
+    session.sidebar.radio[0].set_value("Record new players and compare performance").run()
+    session.sidebar.button[1].click().run()
+    if session.exception:
+        raise RuntimeError(session.exception)
+    return session
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Resident memory of the dashboard process per number of sessions')
+    parser.add_argument('--scale', type=float, default=1, help='multiple of the shipped data')
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32], help='numbers of open sessions to measure')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    raw_combine, raw_season = make_dataset(args.scale, seed=args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        # the app reads the data relative to the directory it is started from
+        os.makedirs(os.path.join(directory, nfl_sources.DATA_DIR))
+        write_sources(os.path.join(directory, nfl_sources.DATA_DIR), raw_combine, raw_season)
+        os.chdir(directory)
+
+        baseline = rss_mb()
+        sessions = [open_session()]
+        first = rss_mb()
+        tracemalloc.start()
+        print(f'scale {args.scale:g}x: {len(raw_combine):,} combine rows, {len(raw_season):,} player seasons')
+        print(f'process before the first session: {baseline:.1f} MB (the first session loads the data and renders the figures)')
+        print(f"{'sessions':>8} {'RSS MB':>10} {'+ RSS MB':>10} {'retained MB':>12} {'KB / extra session':>20}")
+        print(f'{1:>8} {first:>10.1f} {0.0:>10.1f} {0.0:>12.2f} {"":>20}')
+        for count in sorted(set(args.sessions) - {1}):
+            while len(sessions) < count:
+                sessions.append(open_session())
+            rss = rss_mb()
+            retained = tracemalloc.get_traced_memory()[0] / 2**20
+            print(f'{count:>8} {rss:>10.1f} {rss - first:>10.1f} {retained:>12.2f} {retained * 1024 / (count - 1):>20.1f}')
+        tracemalloc.stop()
+        os.chdir(os.path.dirname(directory))
+
+
+if __name__ == '__main__':
+    main()
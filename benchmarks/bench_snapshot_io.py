@@ -0,0 +1,88 @@
+# **********************************************************************************************************************************************************************
+# Benchmark: CSV vs. Parquet snapshot loading
+# - synthetic combine / seasonal tables at 1x, 10x and 100x the size of the shipped data
+# - each load runs in a fresh process, reporting wall time, resident memory growth and the size of the resulting frame
+# - "projected" only reads the columns the dashboard needs from the seasonal data
+# - run via: python benchmarks/bench_snapshot_io.py [--scales 1 10 100]
+# **********************************************************************************************************************************************************************
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import psutil
+
+CODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'code')
+sys.path.insert(0, CODE_DIR)
+import nfl_sources
+from synthetic_data import COMBINE_ROWS, SEASON_ROWS, make_combine_table, make_season_table
+
+SEASON_APP_COLUMNS = ['player_id', 'player_name', 'position', 'season', 'receiving_yards', 'receiving_tds', 'receptions',
+                      'receiving_yards_after_catch', 'carries', 'rushing_yards', 'rushing_tds']
+
+
+def write_sources(directory, scale):
+    combine_csv = os.path.join(directory, 'players_unique_2010_2023.csv')
+    season_csv = os.path.join(directory, 'players_2010_2023.csv')
+    make_combine_table(COMBINE_ROWS * scale).to_csv(combine_csv, index=False)
+    make_season_table(SEASON_ROWS * scale).to_csv(season_csv, index=False)
+    nfl_sources.read_combine_csv(combine_csv).to_parquet(nfl_sources.snapshot_path(combine_csv), index=False)
+    nfl_sources.read_season_csv(season_csv).to_parquet(nfl_sources.snapshot_path(season_csv), index=False)
+    return combine_csv, season_csv
+
+
+def _rss_mb():
+    return psutil.Process().memory_info().rss / 2**20
+
+
+def _measure(queue, loader, path, columns):
+    sys.path.insert(0, CODE_DIR)
+    import nfl_sources
+
+    read = {
+        'combine_csv': nfl_sources.read_combine_csv,
+        'season_csv': lambda source: nfl_sources.read_season_csv(source, columns),
+        'parquet': lambda source: nfl_sources.read_parquet(source, columns),
+    }[loader]
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    df = read(path)
+    seconds = time.perf_counter() - start
+    queue.put((seconds, _rss_mb() - rss_before, df.memory_usage(deep=True).sum() / 2**20))
+
+
+def measure(loader, path, columns=None):
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_measure, args=(queue, loader, path, columns))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark CSV vs. Parquet loading of the NFL data')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    args = parser.parse_args()
+
+    print(f"{'scale':>6} {'data set':<20} {'format':<10} {'load [s]':>10} {'RSS +MB':>13} {'frame MB':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in args.scales:
+            combine_csv, season_csv = write_sources(directory, scale)
+            cases = [
+                ('combine', 'csv', measure('combine_csv', combine_csv)),
+                ('combine', 'parquet', measure('parquet', nfl_sources.snapshot_path(combine_csv))),
+                ('season', 'csv', measure('season_csv', season_csv)),
+                ('season', 'parquet', measure('parquet', nfl_sources.snapshot_path(season_csv))),
+                ('season (projected)', 'csv', measure('season_csv', season_csv, SEASON_APP_COLUMNS)),
+                ('season (projected)', 'parquet', measure('parquet', nfl_sources.snapshot_path(season_csv), SEASON_APP_COLUMNS)),
+            ]
+            for data_set, file_format, (seconds, rss_mb, frame_mb) in cases:
+                print(f'{scale:>5}x {data_set:<20} {file_format:<10} {seconds:>10.3f} {rss_mb:>13.1f} {frame_mb:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
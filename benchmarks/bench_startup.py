@@ -0,0 +1,103 @@
+# **********************************************************************************************************************************************************************
+# Benchmark: cold start of the dashboard
+# - every run starts a fresh Python process with -X importtime that opens the dashboard once (streamlit's AppTest) on synthetic data
+#   (see synthetic_data.make_dataset), either on the Analyze page (default) or on the Record page (before Compare is clicked)
+# - reports per menu mode: time to the first rendered page (process start until the first script run finished), the part of it
+#   spent importing modules, and the import time of the heavy optional dependencies (matplotlib, seaborn, scipy, sklearn, joblib)
+#   if the page imported them at all
+# - run via: python benchmarks/bench_startup.py [--repeat 3] [--scale 1]
+# **********************************************************************************************************************************************************************
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+CODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'code')
+APP = os.path.join(CODE_DIR, 'main_nfl_app.py')
+
+MODES = {
+    'analyze': "Analyze existing players",
+    'record': "Record new players and compare performance",
+}
+
+# Top-level packages reported separately (cumulative import time of the package itself)
+HEAVY_MODULES = ['matplotlib', 'matplotlib.pyplot', 'seaborn', 'scipy', 'sklearn', 'joblib']
+
+
+# Child process: open the app once in the given mode, print the time from process start to the end of the first run as JSON
+def run_child(mode):
+    from streamlit.testing.v1 import AppTest
+
+    session = AppTest.from_file(APP, default_timeout=300)
+    session.session_state['menu_choice'] = MODES[mode]
+    session.run()
+    if session.exception:
+        raise RuntimeError(session.exception)
+    print(json.dumps({'first_render_s': time.time() - float(os.environ['BENCH_STARTED'])}))
+
+
+# Cumulative import times (seconds) of the top-level imports and of the heavy modules, from the -X importtime output
+def parse_importtime(stderr):
+    total = 0.0
+    heavy = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        name = module.strip()
+        seconds = int(cumulative) / 1e6
+        # top-level imports are not indented
+        if not module[1:].startswith(' '):
+            total += seconds
+        if name in HEAVY_MODULES:
+            heavy[name] = heavy.get(name, 0.0) + seconds
+    return total, heavy
+
+
+def run_once(mode, directory):
+    env = dict(os.environ, BENCH_STARTED=repr(time.time()), PYTHONPATH=os.pathsep.join([CODE_DIR, os.environ.get('PYTHONPATH', '')]))
+    process = subprocess.run([sys.executable, '-X', 'importtime', os.path.abspath(__file__), '--child', mode], cwd=directory, env=env,
+                             capture_output=True, text=True, check=True)
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result['imports_s'], result['heavy'] = parse_importtime(process.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time to the first rendered page of a new dashboard process per menu mode')
+    parser.add_argument('--repeat', type=int, default=3, help='cold starts per mode')
+    parser.add_argument('--scale', type=float, default=1, help='multiple of the shipped data')
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    parser.add_argument('--child', choices=list(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args.child)
+        return
+
+    sys.path.insert(0, CODE_DIR)
+    import nfl_sources
+    from bench_suite import write_sources
+    from synthetic_data import make_dataset
+
+    with tempfile.TemporaryDirectory() as directory:
+        # the app reads the data relative to the directory it is started from
+        os.makedirs(os.path.join(directory, nfl_sources.DATA_DIR))
+        write_sources(os.path.join(directory, nfl_sources.DATA_DIR), *make_dataset(args.scale))
+
+        for mode in args.modes:
+            results = [run_once(mode, directory) for _ in range(args.repeat)]
+            first_render = np.median([result['first_render_s'] for result in results])
+            imports = np.median([result['imports_s'] for result in results])
+            print(f'{mode:<8} first render {first_render * 1000:8.0f} ms   imports {imports * 1000:8.0f} ms')
+            for module in HEAVY_MODULES:
+                times = [result['heavy'][module] for result in results if module in result['heavy']]
+                print(f"    {module:<20} {f'{np.median(times) * 1000:8.0f} ms' if times else 'not imported'}")
+
+
+if __name__ == '__main__':
+    main()
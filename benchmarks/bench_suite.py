@@ -0,0 +1,225 @@
+# **********************************************************************************************************************************************************************
+# Benchmark suite: every stage of the dashboard on synthetic data at configurable scale (see synthetic_data.make_dataset)
+# - stages: loading (CSV / Parquet), unit conversion, index build and position filtering, engine build, similarity search
+#   (one player / a draft class / all players in a process pool), correlation matrix with bootstrap intervals, seasonal aggregation,
+#   career store (build, seasonal history, similar careers), figure rendering (PNG / Vega-Lite), projection training and inference,
+#   weekly rollup
+# - each stage runs once as warm-up and then --repeat times, the median / min wall time is reported per stage and scale
+# - --output writes the results as JSON (with python / library versions and the git commit), --baseline compares against
+#   a previous result file: stages slower than --threshold x the baseline are listed as regressions and the exit code is 1
+# - run via: python benchmarks/bench_suite.py [--scales 1 10 100] [--seasons 1994 2023] [--weekly] [--stages load_* find_*]
+#            [--output results.json] [--baseline baseline.json]
+# **********************************************************************************************************************************************************************
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'code'))
+import nfl_sources
+from nfl_aggregates import build_season_cube
+from nfl_careers import CareerStore
+from nfl_charts import combine_boxplot_chart, seasonal_stat_chart
+from nfl_comparables import build_comparables
+from nfl_correlations import build_correlations
+from nfl_index import PlayerIndex
+from nfl_models import ProjectionModels
+from nfl_render import draw_combine_boxplot, draw_seasonal_stat, render_png
+from nfl_similarity import SIMILARITY_METRICS, SimilarityEngine
+from nfl_train import train_models
+from synthetic_data import SHIPPED_SEASONS, make_combine_table, make_dataset
+
+# Stages with one run only (too slow to repeat at large scales)
+SINGLE_RUN_STAGES = ['projection_training', 'correlation_matrix']
+
+PROSPECTS = 1_000
+
+
+# Source files of one scale: the raw CSVs plus the Parquet snapshots of the ingest step
+def write_sources(directory, combine, season):
+    combine_csv = os.path.join(directory, os.path.basename(nfl_sources.COMBINE_CSV))
+    season_csv = os.path.join(directory, os.path.basename(nfl_sources.SEASON_CSV))
+    combine.to_csv(combine_csv, index=False)
+    season.to_csv(season_csv, index=False)
+    nfl_sources.read_combine_csv(combine_csv).to_parquet(nfl_sources.snapshot_path(combine_csv), index=False)
+    nfl_sources.read_season_csv(season_csv).to_parquet(nfl_sources.snapshot_path(season_csv), index=False)
+    return combine_csv, season_csv
+
+
+# Stages of one scale: [(name, function)], functions share the prepared data via closures
+def make_stages(directory, raw_combine, raw_season, raw_weekly=None):
+    combine_csv, season_csv = write_sources(directory, raw_combine, raw_season)
+    combine = nfl_sources.read_combine_source(nfl_sources.snapshot_path(combine_csv))
+    season = nfl_sources.read_season_source(nfl_sources.snapshot_path(season_csv))
+    index = PlayerIndex(combine, season)
+    engine = nfl_sources.build_engine(nfl_sources.engine_sources(combine_csv, season_csv))
+    first, last = index.season_range
+    new_player = {metric: float(np.nanmedian(index.combine_rows('WR')[metric])) for metric in SIMILARITY_METRICS}
+    prospects = nfl_sources.clean_combine_data(make_combine_table(PROSPECTS, seed=1)).rename(columns={'Pos': 'position'})
+    players = index.players('WR')[:3]
+    models_dir = os.path.join(directory, 'models')
+    trained = {}
+
+    def load_csv():
+        nfl_sources.read_combine_csv(combine_csv)
+        nfl_sources.read_season_csv(season_csv)
+
+    def load_parquet():
+        nfl_sources.read_combine_source(nfl_sources.snapshot_path(combine_csv))
+        nfl_sources.read_season_source(nfl_sources.snapshot_path(season_csv))
+
+    def position_filter():
+        for position in index.positions:
+            index.combine_rows(position)
+            index.position_seasons(position, first, last)
+
+    def render_figures():
+        history = engine.season_history(players, first, last, stats=['receiving_yards'])
+        render_png(draw_seasonal_stat(history, engine.position_mean_per_year('WR', 'receiving_yards', first, last), 'receiving_yards', 'WR'))
+        render_png(draw_combine_boxplot(engine.distributions.box_stats('WR', '40yd'), 'WR', '40yd', [('Player', new_player['40yd'], 'red')]))
+
+    # same figures as client-side charts: building the chart and serializing the spec with its data (what the server sends)
+    def build_charts():
+        history = engine.season_history(players, first, last, stats=['receiving_yards'])
+        seasonal_stat_chart(history, engine.position_mean_per_year('WR', 'receiving_yards', first, last), 'receiving_yards', 'WR').to_json()
+        combine_boxplot_chart(engine.distributions.box_stats('WR', '40yd'), 'WR', '40yd', [('Player', new_player['40yd'], 'red')]).to_json()
+
+    def projection_training():
+        trained['models'] = ProjectionModels(train_models(nfl_sources.snapshot_path(combine_csv), nfl_sources.snapshot_path(season_csv), models_dir))
+        return trained['models']
+
+    # models of the training stage (trained on first use if that stage is not selected)
+    def projection_models():
+        return trained.get('models') or projection_training()
+
+    stages = [
+        ('load_csv', load_csv),
+        ('load_parquet', load_parquet),
+        ('unit_conversion', lambda: nfl_sources.convert_combine_units(raw_combine.copy())),
+        ('index_build', lambda: PlayerIndex(combine, season)),
+        ('position_filter', position_filter),
+        ('engine_build', lambda: nfl_sources.build_engine(nfl_sources.engine_sources(combine_csv, season_csv))),
+        ('similarity_engine_build', lambda: SimilarityEngine(index.combine_rows('WR'))),
+        ('find_similar_players', lambda: engine.find_similar_players('WR', new_player, 10)),
+        ('batch_scoring', lambda: engine.score_prospects(prospects, 10, missing='masked')),
+        ('all_players_comparables', lambda: build_comparables(index)),
+        ('correlation_matrix', lambda: build_correlations(combine, season)),
+        ('seasonal_aggregation', lambda: build_season_cube(season)),
+        ('season_series', lambda: [engine.season_series('WR', stat) for stat in engine.season_cube.stats]),
+        ('career_store_build', lambda: CareerStore(engine.index.season)),
+        ('season_history', lambda: engine.season_history(players, first, last, stats=['receiving_yards'])),
+        ('career_history', lambda: engine.career_history(players, first, last, stats=['receiving_yards'])),
+        ('similar_careers', lambda: [engine.similar_careers(player) for player in players]),
+        ('figure_rendering', render_figures),
+        ('figure_rendering_altair', build_charts),
+        ('projection_training', projection_training),
+        ('projection_inference_1', lambda: projection_models().project('WR', new_player)),
+        (f'projection_inference_{PROSPECTS}', lambda: projection_models().project('WR', prospects)),
+    ]
+    if raw_weekly is not None:
+        # per-week rows summed up to player seasons
+        stages.append(('weekly_rollup', lambda: raw_weekly.groupby(['player_id', 'season'], sort=False).sum(numeric_only=True)))
+    return stages
+
+
+def time_stage(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def metadata():
+    import matplotlib
+    import pandas as pd
+    import sklearn
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(), 'commit': commit,
+            'numpy': np.__version__, 'pandas': pd.__version__, 'matplotlib': matplotlib.__version__, 'sklearn': sklearn.__version__}
+
+
+# Results slower than threshold x the median of the same stage and scale in the baseline (adds baseline_median_s and ratio to the results)
+def compare(results, baseline, threshold, min_seconds=0.001):
+    reference = {(result['stage'], result['scale']): result['median_s'] for result in baseline['results']}
+    regressions = []
+    for result in results:
+        before = reference.get((result['stage'], result['scale']))
+        if before is None:
+            continue
+        ratio = result['median_s'] / before if before > 0 else float('inf')
+        result['baseline_median_s'] = before
+        result['ratio'] = round(ratio, 3)
+        if ratio > threshold and result['median_s'] - before > min_seconds:
+            regressions.append(result)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark all stages of the dashboard on synthetic data')
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10], help='multiples of the shipped data (1 = 14 seasons)')
+    parser.add_argument('--seasons', type=int, nargs=2, default=list(SHIPPED_SEASONS), metavar=('FIRST', 'LAST'))
+    parser.add_argument('--weekly', action='store_true', help='also benchmark the rollup of per-week data')
+    parser.add_argument('--stages', nargs='+', default=['*'], help='stage names or patterns to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per stage (after one warm-up run)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--baseline', help='JSON of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=1.25, help='slowdown factor reported as regression')
+    args = parser.parse_args()
+
+    results = []
+    for scale in args.scales:
+        start = time.perf_counter()
+        raw_combine, raw_season = make_dataset(scale, args.seasons[0], args.seasons[1], seed=args.seed)
+        raw_weekly = make_dataset(scale, args.seasons[0], args.seasons[1], weekly=True, seed=args.seed)[1] if args.weekly else None
+        print(f'scale {scale:g}x: {len(raw_combine):,} combine rows, {len(raw_season):,} player seasons'
+              + (f', {len(raw_weekly):,} player weeks' if args.weekly else '') + f' (generated in {time.perf_counter() - start:.1f} s)')
+
+        with tempfile.TemporaryDirectory() as directory:
+            for name, function in make_stages(directory, raw_combine, raw_season, raw_weekly):
+                if not any(fnmatch.fnmatch(name, pattern) for pattern in args.stages):
+                    continue
+                single = name in SINGLE_RUN_STAGES
+                if not single:
+                    function()
+                timings = time_stage(function, 1 if single else args.repeat)
+                result = {'stage': name, 'scale': scale, 'median_s': float(np.median(timings)), 'min_s': float(np.min(timings)), 'runs': len(timings)}
+                results.append(result)
+                print(f"  {name:<28} median {result['median_s'] * 1000:>10.2f} ms   min {result['min_s'] * 1000:>10.2f} ms")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline.get('seasons') != args.seasons:
+            sys.exit(f"{args.baseline} covers the seasons {baseline.get('seasons')}, not comparable with {args.seasons}")
+        regressions = compare(results, baseline, args.threshold)
+        print(f'\ncompared with {args.baseline}:')
+        for result in results:
+            if 'ratio' in result:
+                flag = '  REGRESSION' if result in regressions else ''
+                print(f"  {result['stage']:<28} {result['scale']:>6g}x  {result['baseline_median_s'] * 1000:>10.2f} ms -> "
+                      f"{result['median_s'] * 1000:>10.2f} ms  ({result['ratio']:.2f}x){flag}")
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'meta': metadata(), 'seasons': args.seasons, 'results': results}, file, indent=2)
+        print(f'results -> {args.output}')
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
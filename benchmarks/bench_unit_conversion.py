@@ -0,0 +1,74 @@
+# **********************************************************************************************************************************************************************
+# Micro-benchmark: combine unit conversion
+# - per-row Series.apply of the original helpers vs. the vectorized convert_combine_units (code/nfl_sources.py)
+# - checks that both produce identical Height_cm / Weight_kg / BroadJump_m / Vertical_cm values (incl. NaN)
+# - run via: python benchmarks/bench_unit_conversion.py [--rows 1000000]
+# **********************************************************************************************************************************************************************
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'code'))
+from nfl_sources import convert_combine_units
+from synthetic_data import make_combine_table
+
+
+# Original per-row helpers (reference implementation)
+def feet_inches_to_cm(height):
+    if isinstance(height, str) and '-' in height:
+        feet, inches = height.split('-')
+        return round((int(feet) * 12 + int(inches)) * 2.54, 2)
+    return None
+
+def pounds_to_kg(weight):
+    return round(weight * 0.453592, 2) if pd.notnull(weight) else None
+
+def inches_to_m(inches):
+    return round(inches * 0.0254, 2) if pd.notnull(inches) else None
+
+def inches_to_cm(inches):
+    return round(inches * 2.54, 2) if pd.notnull(inches) else None
+
+def convert_combine_units_apply(df):
+    df['Height_cm'] = df['Height'].apply(feet_inches_to_cm)
+    df['Weight_kg'] = df['Weight'].apply(pounds_to_kg)
+    df['BroadJump_m'] = df['Broad Jump'].apply(inches_to_m)
+    df['Vertical_cm'] = df['Vertical'].apply(inches_to_cm)
+    return df
+
+
+def best_of(function, df, repeat):
+    timings = []
+    for _ in range(repeat):
+        frame = df.copy()
+        start = time.perf_counter()
+        result = function(frame)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the combine unit conversion')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_combine_table(args.rows)
+    apply_time, expected = best_of(convert_combine_units_apply, df, args.repeat)
+    vectorized_time, actual = best_of(convert_combine_units, df, args.repeat)
+
+    for column in ['Height_cm', 'Weight_kg', 'BroadJump_m', 'Vertical_cm']:
+        np.testing.assert_array_equal(actual[column].to_numpy(), expected[column].to_numpy(dtype='float64'), err_msg=column)
+
+    print(f'rows:        {args.rows:>12,}')
+    print(f'apply:       {apply_time:>12.3f} s')
+    print(f'vectorized:  {vectorized_time:>12.3f} s')
+    print(f'speed-up:    {apply_time / vectorized_time:>12.1f} x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+# **********************************************************************************************************************************************************************
+# Synthetic NFL data for the benchmarks
+# - same schema as 00_Data/players_unique_2010_2023.csv (combine data, raw US units)
+#   and 00_Data/players_2010_2023.csv (seasonal stats merged with the rosters)
+# - make_dataset(scale) builds both tables at a multiple of the shipped data (1x = 14 seasons, ~2,000 combine players,
+#   ~8,000 player seasons), optionally over more seasons and per week (one row per player and game, with a 'week' column)
+# - combine values are drawn per position (size, speed and strength profiles) with the missing-test rates of the real combine,
+#   seasonal stats follow the role of the position (passing / rushing / receiving volume) with the NaN patterns of nfl_data_py
+#   (efficiency and share columns are NaN without the underlying plays)
+# - the values are plausible, not meant for analysis; the same seed gives the same tables
+# **********************************************************************************************************************************************************************
+import numpy as np
+import pandas as pd
+
+COMBINE_POSITIONS = ['WR', 'RB', 'TE', 'QB', 'CB', 'S', 'LB', 'DE', 'DT', 'OT', 'OG', 'C']
+
+# Size of the shipped data (2010-2023) = scale 1
+COMBINE_ROWS = 2_000
+SEASON_ROWS = 8_000
+SHIPPED_SEASONS = (2010, 2023)
+
+# Share of the combine participants per position (1x: ~330 WR, ~190 RB, ...)
+POSITION_SHARES = {'WR': 0.165, 'RB': 0.095, 'TE': 0.07, 'QB': 0.055, 'CB': 0.12, 'S': 0.075, 'LB': 0.095, 'DE': 0.085, 'DT': 0.07,
+                   'OT': 0.065, 'OG': 0.06, 'C': 0.025}
+
+# Combine profile per position: height (in), weight (lb), 40yd (s), vertical (in), broad jump (in), bench (reps), 3cone (s), shuttle (s)
+POSITION_PROFILES = {
+    'WR': (72.5, 202, 4.49, 35.5, 121, 14, 6.95, 4.22),
+    'RB': (70.5, 213, 4.52, 34.5, 119, 19, 7.05, 4.25),
+    'TE': (76.5, 252, 4.72, 33.0, 116, 20, 7.15, 4.37),
+    'QB': (74.5, 222, 4.82, 31.5, 112, 18, 7.10, 4.30),
+    'CB': (71.5, 193, 4.47, 36.0, 123, 14, 6.95, 4.18),
+    'S': (72.5, 205, 4.54, 35.5, 121, 16, 7.00, 4.21),
+    'LB': (73.5, 238, 4.68, 34.0, 118, 21, 7.10, 4.30),
+    'DE': (76.0, 265, 4.78, 33.0, 116, 24, 7.25, 4.40),
+    'DT': (75.0, 305, 5.10, 29.5, 106, 28, 7.65, 4.65),
+    'OT': (77.5, 315, 5.25, 28.0, 102, 24, 7.75, 4.70),
+    'OG': (76.0, 315, 5.30, 27.5, 101, 26, 7.80, 4.75),
+    'C': (75.0, 303, 5.25, 28.5, 103, 26, 7.65, 4.60),
+}
+PROFILE_SPREADS = (1.8, 12, 0.10, 3.0, 6, 4.5, 0.20, 0.15)
+
+# Share of players without a result per test (the real combine: many skip the agility drills or the bench)
+COMBINE_NAN_RATES = {'Height': 0.01, 'Weight': 0.01, '40yd': 0.14, 'Vertical': 0.20, 'Bench': 0.26, 'Broad Jump': 0.21, '3Cone': 0.35, 'Shuttle': 0.33}
+
+# Seasonal stat columns as delivered by nfl.import_seasonal_data (subset), all stored as floats
+SEASON_STATS = [
+    'completions', 'attempts', 'passing_yards', 'passing_tds', 'interceptions', 'sacks', 'passing_air_yards', 'passing_epa',
+    'carries', 'rushing_yards', 'rushing_tds', 'rushing_fumbles', 'rushing_first_downs', 'rushing_epa',
+    'receptions', 'targets', 'receiving_yards', 'receiving_tds', 'receiving_fumbles', 'receiving_air_yards',
+    'receiving_yards_after_catch', 'receiving_first_downs', 'receiving_epa', 'racr', 'target_share', 'air_yards_share',
+    'wopr_x', 'special_teams_tds', 'fantasy_points', 'fantasy_points_ppr', 'games', 'tgt_sh', 'ay_sh', 'yac_sh',
+    'ry_sh', 'rtd_sh', 'dom', 'w8dom', 'yptmpa', 'ppr_sh',
+]
+
+# Volume of a full-time starter per season: pass attempts, carries, targets
+POSITION_VOLUME = {'QB': (520, 55, 0), 'RB': (0, 190, 45), 'WR': (0, 4, 95), 'TE': (0, 1, 65)}
+
+WEEKS_PER_SEASON = 17
+
+
+def _scaled_rows(rows, scale, first_season, last_season):
+    return max(1, int(round(rows * scale * (last_season - first_season + 1) / (SHIPPED_SEASONS[1] - SHIPPED_SEASONS[0] + 1))))
+
+
+# Combine table with n_rows players (positions drawn with the shares of the real combine unless positions is given)
+def make_combine_table(n_rows, seed=0, first_season=SHIPPED_SEASONS[0], last_season=SHIPPED_SEASONS[1], positions=None):
+    rng = np.random.default_rng(seed)
+    if positions is None:
+        positions = rng.choice(list(POSITION_SHARES), n_rows, p=np.array(list(POSITION_SHARES.values())) / sum(POSITION_SHARES.values()))
+    else:
+        positions = rng.choice(positions, n_rows)
+    profiles = np.array([POSITION_PROFILES[position] for position in positions])
+    # one latent athleticism factor per player: fast players also jump higher and further
+    athleticism = rng.normal(0, 1, n_rows)
+    noise = rng.normal(0, 1, (n_rows, len(PROFILE_SPREADS))) * np.array(PROFILE_SPREADS)
+    values = profiles + noise
+    values[:, 2] -= 0.05 * athleticism
+    values[:, 3] += 1.5 * athleticism
+    values[:, 4] += 3.0 * athleticism
+    values[:, 6] -= 0.08 * athleticism
+    values[:, 7] -= 0.05 * athleticism
+
+    height_inches = np.round(values[:, 0]).astype('int64')
+    drafted = rng.random(n_rows) < 0.62
+    draft_round = np.where(drafted, rng.integers(1, 8, n_rows), 0)
+    pick = np.where(drafted, (draft_round - 1) * 32 + rng.integers(1, 33, n_rows), 0)
+    season = rng.integers(first_season, last_season + 1, n_rows)
+    df = pd.DataFrame({
+        'player_id': [f'00-{i:07d}' for i in range(n_rows)],
+        'player_name': [f'Player {i}' for i in range(n_rows)],
+        'Pos': positions,
+        'School': rng.choice(['Alabama', 'Ohio St.', 'Georgia', 'LSU', 'Clemson', 'Michigan', 'Texas', 'USC', 'Oregon', 'State'], n_rows),
+        'season': season,
+        'Height': pd.Series(height_inches // 12).astype(str) + '-' + pd.Series(height_inches % 12).astype(str),
+        'Weight': np.round(values[:, 1]),
+        '40yd': np.round(values[:, 2], 2),
+        'Vertical': np.round(values[:, 3] * 2) / 2,
+        'Bench': np.maximum(np.round(values[:, 5]), 0),
+        'Broad Jump': np.round(values[:, 4]),
+        '3Cone': np.round(values[:, 6], 2),
+        'Shuttle': np.round(values[:, 7], 2),
+        'Drafted': np.where(drafted, pd.Series(draft_round).map({1: '1st', 2: '2nd', 3: '3rd'}).fillna(pd.Series(draft_round).astype(str) + 'th')
+                            + ' / ' + pd.Series(pick).astype(str) + 'th pick / ' + pd.Series(season).astype(str), None),
+        'Round': np.where(drafted, draft_round, np.nan),
+        'Pick': np.where(drafted, pick, np.nan),
+    })
+
+    # Not every player takes every test, injured players only get measured
+    injured = rng.random(n_rows) < 0.05
+    for column, rate in COMBINE_NAN_RATES.items():
+        missing = rng.random(n_rows) < rate
+        if column not in ['Height', 'Weight']:
+            missing |= injured
+        df.loc[missing, column] = np.nan
+    return df
+
+
+# Seasonal stats of player seasons (players: frame with player_id, player_name, position, first_season, seasons).
+# weekly: one row per game with the column 'week' instead of one row per season
+def _season_rows(players, last_season, rng, weekly=False):
+    careers = players['seasons'].to_numpy()
+    player = np.repeat(np.arange(len(players)), careers)
+    offset = np.arange(len(player)) - np.repeat(np.cumsum(careers) - careers, careers)
+    season = players['first_season'].to_numpy()[player] + offset
+    keep = season <= last_season
+    player, season = player[keep], season[keep]
+    positions = players['position'].to_numpy()[player]
+
+    # games per season, usage of the player within the team's role (most players are backups)
+    games = np.minimum(rng.binomial(WEEKS_PER_SEASON, 0.8, len(player)) + 1, WEEKS_PER_SEASON)
+    usage = np.clip(rng.gamma(0.9, 0.45, len(player)), 0, 1.3)
+    week = None
+    if weekly:
+        # one row per game: the weeks played are a random subset of the season (rows ordered by week)
+        ranks = np.argsort(np.argsort(rng.random((len(player), WEEKS_PER_SEASON)), axis=1), axis=1)
+        rows, week = np.nonzero(ranks < games[:, None])
+        week = week + 1
+        player, season, positions, usage = player[rows], season[rows], positions[rows], usage[rows]
+        games = np.ones(len(rows), dtype='int64')
+
+    share = usage * games / WEEKS_PER_SEASON
+    volume = np.array([POSITION_VOLUME.get(position, (0, 0, 0)) for position in positions], dtype='float64') * share[:, None]
+    n = len(player)
+    stats = {}
+
+    attempts = rng.poisson(volume[:, 0])
+    completions = rng.binomial(attempts, 0.64)
+    stats['completions'] = completions
+    stats['attempts'] = attempts
+    stats['passing_yards'] = np.round(completions * rng.normal(11.3, 1.2, n))
+    stats['passing_tds'] = rng.poisson(stats['passing_yards'] / 155)
+    stats['interceptions'] = rng.poisson(attempts / 42)
+    stats['sacks'] = rng.poisson(attempts / 16)
+    stats['passing_air_yards'] = np.round(attempts * rng.normal(7.8, 1.0, n))
+    stats['passing_epa'] = np.where(attempts > 0, np.round(rng.normal(0.05, 0.12, n) * attempts, 2), np.nan)
+
+    carries = rng.poisson(volume[:, 1])
+    stats['carries'] = carries
+    stats['rushing_yards'] = np.round(carries * rng.normal(4.3, 0.9, n))
+    stats['rushing_tds'] = rng.poisson(carries / 38)
+    stats['rushing_fumbles'] = rng.poisson(carries / 140)
+    stats['rushing_first_downs'] = rng.poisson(carries * 0.22)
+    stats['rushing_epa'] = np.where(carries > 0, np.round(rng.normal(-0.04, 0.12, n) * carries, 2), np.nan)
+
+    targets = rng.poisson(volume[:, 2])
+    receptions = rng.binomial(targets, 0.64)
+    receiving_yards = np.round(receptions * np.maximum(rng.normal(11.8, 2.5, n), 2))
+    air_yards = np.round(targets * rng.normal(9.5, 2.5, n))
+    stats['receptions'] = receptions
+    stats['targets'] = targets
+    stats['receiving_yards'] = receiving_yards
+    stats['receiving_tds'] = rng.poisson(receiving_yards / 150)
+    stats['receiving_fumbles'] = rng.poisson(receptions / 160)
+    stats['receiving_air_yards'] = air_yards
+    stats['receiving_yards_after_catch'] = np.round(receiving_yards * rng.uniform(0.25, 0.55, n))
+    stats['receiving_first_downs'] = rng.poisson(receptions * 0.55)
+    stats['receiving_epa'] = np.where(targets > 0, np.round(rng.normal(0.15, 0.2, n) * targets, 2), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stats['racr'] = np.where(air_yards > 0, np.round(receiving_yards / air_yards, 3), np.nan)
+        team_targets = games * 34.0
+        stats['target_share'] = np.where(targets > 0, np.round(targets / team_targets, 3), np.nan)
+        stats['air_yards_share'] = np.where(targets > 0, np.round(air_yards / (games * 290.0), 3), np.nan)
+        stats['wopr_x'] = np.round(1.5 * stats['target_share'] + 0.7 * stats['air_yards_share'], 3)
+        stats['special_teams_tds'] = rng.poisson(0.015 * games)
+        stats['fantasy_points'] = np.round(0.04 * stats['passing_yards'] + 4 * stats['passing_tds'] - 2 * stats['interceptions']
+                                           + 0.1 * (stats['rushing_yards'] + receiving_yards) + 6 * (stats['rushing_tds'] + stats['receiving_tds'])
+                                           - 2 * (stats['rushing_fumbles'] + stats['receiving_fumbles']) + 6 * stats['special_teams_tds'], 2)
+        stats['fantasy_points_ppr'] = stats['fantasy_points'] + receptions
+        stats['games'] = games
+        stats['tgt_sh'] = stats['target_share']
+        stats['ay_sh'] = stats['air_yards_share']
+        stats['yac_sh'] = np.where(targets > 0, np.round(stats['receiving_yards_after_catch'] / (games * 120.0), 3), np.nan)
+        stats['ry_sh'] = np.where(targets > 0, np.round(receiving_yards / (games * 230.0), 3), np.nan)
+        stats['rtd_sh'] = np.where(targets > 0, np.round(stats['receiving_tds'] / (games * 1.5), 3), np.nan)
+        stats['dom'] = np.round((stats['ry_sh'] + stats['rtd_sh']) / 2, 3)
+        stats['w8dom'] = np.round(0.8 * stats['ry_sh'] + 0.2 * stats['rtd_sh'], 3)
+        stats['yptmpa'] = np.where(targets > 0, np.round(receiving_yards / team_targets, 3), np.nan)
+        stats['ppr_sh'] = np.where(stats['fantasy_points_ppr'] > 0, np.round(stats['fantasy_points_ppr'] / (games * 110.0), 3), np.nan)
+
+    df = pd.DataFrame({
+        'player_id': players['player_id'].to_numpy()[player],
+        'season': season,
+        'season_type': 'REG',
+        'player_name': players['player_name'].to_numpy()[player],
+        'position': positions,
+        'draft_number': players['draft_number'].to_numpy()[player],
+    })
+    if weekly:
+        df.insert(2, 'week', week)
+    stats = pd.DataFrame({column: np.asarray(stats[column], dtype='float64') for column in SEASON_STATS})
+    return pd.concat([df, stats], axis=1)
+
+
+# Players of the seasonal data: career start and length (about 4 seasons on average)
+def _career_players(player_ids, player_names, positions, draft_numbers, first_seasons, rng):
+    return pd.DataFrame({
+        'player_id': player_ids,
+        'player_name': player_names,
+        'position': positions,
+        'draft_number': draft_numbers,
+        'first_season': first_seasons,
+        'seasons': np.minimum(rng.geometric(0.24, len(player_ids)), 16),
+    })
+
+
+# Seasonal table with about n_rows player seasons (players of their own, not linked to a combine table)
+def make_season_table(n_rows, seed=0, first_season=SHIPPED_SEASONS[0], last_season=SHIPPED_SEASONS[1], weekly=False):
+    rng = np.random.default_rng(seed)
+    n_players = max(1, n_rows // 3)
+    players = _career_players([f'00-{i:07d}' for i in range(n_players)], [f'Player {i}' for i in range(n_players)],
+                              rng.choice(list(POSITION_SHARES), n_players), np.where(rng.random(n_players) < 0.7, rng.integers(1, 260, n_players), np.nan),
+                              rng.integers(first_season - 3, last_season + 1, n_players), rng)
+    season = _season_rows(players, last_season, rng, weekly)
+    return season[season['season'] >= first_season].reset_index(drop=True)
+
+
+# Combine and seasonal table at `scale` times the shipped data (per season), linked by player_id:
+# most players of the seasonal data went through the combine (career starts in their combine year), ~20% did not (undrafted free agents)
+def make_dataset(scale=1, first_season=SHIPPED_SEASONS[0], last_season=SHIPPED_SEASONS[1], weekly=False, seed=0):
+    rng = np.random.default_rng(seed + 1)
+    combine = make_combine_table(_scaled_rows(COMBINE_ROWS, scale, first_season, last_season), seed, first_season, last_season)
+
+    # (careers running past the last season are cut, about 3 stored seasons per player)
+    n_players = max(1, _scaled_rows(SEASON_ROWS, scale, first_season, last_season) // 3)
+    from_combine = rng.choice(len(combine), min(int(n_players * 0.8), len(combine)), replace=False)
+    n_others = n_players - len(from_combine)
+    players = _career_players(
+        np.concatenate([combine['player_id'].to_numpy()[from_combine], [f'00-9{i:06d}' for i in range(n_others)]]),
+        np.concatenate([combine['player_name'].to_numpy()[from_combine], [f'Free Agent {i}' for i in range(n_others)]]),
+        np.concatenate([combine['Pos'].to_numpy()[from_combine], rng.choice(list(POSITION_SHARES), n_others)]),
+        np.concatenate([combine['Pick'].to_numpy()[from_combine], np.full(n_others, np.nan)]),
+        np.concatenate([combine['season'].to_numpy()[from_combine], rng.integers(first_season, last_season + 1, n_others)]),
+        rng)
+    season = _season_rows(players, last_season, rng, weekly)
+    return combine, season
@@ -4,62 +4,57 @@
 # - run via: streamlit run main_nfl_app.py
 # - Attention with appearance: 100% zoom in browser is optimal
 # **********************************************************************************************************************************************************************
+# (matplotlib / seaborn are imported by nfl_render when the first figure is drawn, scipy / sklearn only by the similarity search and the projections)
 import streamlit as st
-import matplotlib.pyplot as plt
-import seaborn as sns
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import StandardScaler
-from scipy.spatial import distance
-from matplotlib.ticker import MaxNLocator
+from nfl_data import load_correlations, load_engine
+from nfl_distributions import percentile_label
+from nfl_careers import CAREER_YEARS
+from nfl_charts import CHART_BACKEND, combine_boxplot_chart, seasonal_grid_chart, seasonal_stat_chart
+from nfl_models import INTERVAL
+from nfl_profile import PROFILE_ENV, begin, discard, end, profile_mode, stage, to_jsonl, to_prometheus
+from nfl_render import draw_combine_boxplot, draw_seasonal_grid, draw_seasonal_stat, get_figure_cache
+from nfl_sources import DASHBOARD_SEASON_COLUMNS
+from nfl_similarity import SIMILARITY_METRICS
 
 st.set_page_config(layout="wide")
 
-# Data source 1: The unique combine data set
-df_players_combine_unique = pd.read_csv('00_Data/players_unique_2010_2023.csv')
-
-# Data source 2: The seasonal stats
-df_season_data = pd.read_csv('00_Data/players_2010_2023.csv')
-
-# Ensure the 'season' column is an integer and handle any invalid data
-df_season_data['season'] = pd.to_numeric(df_season_data['season'], errors='coerce')
-
-# Drop rows where 'season' is NaN or invalid
-df_season_data = df_season_data.dropna(subset=['season'])
-df_season_data['season'] = df_season_data['season'].astype(int)
-
-sns.set_style("darkgrid")
-
-# **********************************************************************************************************************************************************************
-# Part 2: Conversion of values
-# - only used for combine measurement values (easier to interpret in Europe).
-# - KPIs for seasonal performance remain in the original unit
-# **********************************************************************************************************************************************************************
-
-# Conversion functions for player metrics for us in eu metrics
-def feet_inches_to_cm(height):
-    if isinstance(height, str) and '-' in height:
-        feet, inches = height.split('-')
-        return round((int(feet) * 12 + int(inches)) * 2.54, 2)
-    return None
-
-def pounds_to_kg(weight):
-    return round(weight * 0.453592, 2) if pd.notnull(weight) else None
-
-def inches_to_m(inches):
-    return round(inches * 0.0254, 2) if pd.notnull(inches) else None
-
-def inches_to_cm(inches):
-    return round(inches * 2.54, 2) if pd.notnull(inches) else None
-
-# Apply conversion functions to the relevant columns
-df_players_combine_unique['Height_cm'] = df_players_combine_unique['Height'].apply(feet_inches_to_cm)
-df_players_combine_unique['Weight_kg'] = df_players_combine_unique['Weight'].apply(pounds_to_kg)
-df_players_combine_unique['BroadJump_m'] = df_players_combine_unique['Broad Jump'].apply(inches_to_m)
-df_players_combine_unique['Vertical_cm'] = df_players_combine_unique['Vertical'].apply(inches_to_cm)
+# Optional instrumentation of this rerun (see nfl_profile.py): switched on by NFL_PROFILE=1|cprofile|pyinstrument or ?profile=... in the URL,
+# the stages are shown in the "Profiling" panel at the bottom of the sidebar.
+# A previous rerun interrupted before the end of the script (new widget value, stop) left its profile behind: dropped first
+discard()
+rerun_profile = None
+profiling = profile_mode(st.query_params.get('profile'))
+if profiling:
+    rerun_profile = begin(profiling)
+
+# Seasonal KPIs shown in the dashboard (only these, the identifiers and the stats of the career store are read from the seasonal data, see nfl_sources.py)
+receiving_stats = ['receiving_yards', 'receiving_tds', 'receptions', 'receiving_yards_after_catch']
+rushing_stats = ['carries', 'rushing_yards', 'rushing_tds']
+
+# Data source 1: The unique combine data set (incl. conversion to metric units, see nfl_sources.py)
+# Data source 2: The seasonal stats (from the season partitions of the ingestion pipeline if present, see nfl_fetch.py)
+# Both data sets are loaded from the Parquet snapshots (build via: python code/nfl_ingest.py) or the CSVs as fallback
+# and indexed by position, player and season (see nfl_index.py), the index holds the frames as .combine and .season.
+# All computations run in the analytics engine (see nfl_engine.py, shared with the HTTP service nfl_api.py), the app only draws the results.
+# Loading and indexing are cached across reruns and sessions and only repeated when a source file changes
+engine = load_engine(season_columns=DASHBOARD_SEASON_COLUMNS)
+player_index = engine.index
+
+# Seasons available in the seasonal data (e.g. 2010-2023, new seasons are added by: python code/nfl_fetch.py)
+first_season, last_season = engine.first_season, engine.last_season
+
+# Distributions of the combine metrics per position (boxplot statistics and percentile ranks, see nfl_distributions.py)
+position_distributions = engine.distributions
+
+# Figures are rendered once to PNG and cached across reruns and sessions (see nfl_render.py),
+# the keys include the data version of the engine, so a data update renders them again.
+# With NFL_CHART_BACKEND=altair the figures are interactive charts drawn by the browser instead (see nfl_charts.py)
+figure_cache = get_figure_cache()
 
 # **********************************************************************************************************************************************************************
-# Part 3: Menu and UX/UI Design
+# Part 2: Menu and UX/UI Design
 # - pop-up window with additional information
 # - sidebar main-menu
 # - overall style of the dashboard
@@ -100,7 +95,10 @@ if st.sidebar.button("Help"):
 
 
 # Sidebar radio selection for menu
-menu_choice = st.sidebar.radio("Select Mode", ["Analyze existing players", "Record new players and compare performance"])
+menu_choice = st.sidebar.radio("Select Mode", ["Analyze existing players", "Record new players and compare performance", "Combine vs. season correlations"],
+                               key="menu_choice")
+if rerun_profile is not None:
+    rerun_profile.labels['page'] = menu_choice
 
 # Set up different titles, images, and explanations for each mode in CSS
 if menu_choice == "Analyze existing players":
@@ -127,12 +125,24 @@ elif menu_choice == "Record new players and compare performance":
     """
     new_section_title = "Compare Combine performance with existing players"
     new_section_explanation = """
-    This section shows the top 10 most similar players based on the metrics entered for the new player and gives an overview on his combine performance.
+    This section shows the most similar players (top 10 by default) based on the metrics entered for the new player and gives an overview on his combine performance.
     """
     final_section_title = "How would this player perform in a NFL season?"
     final_section_explanation = """
     To find out how players with similar Combine values have performed in the competition, select the desired players and metric
     """
+elif menu_choice == "Combine vs. season correlations":
+    headline = "Do Combine values matter?"
+    image_url = "https://carolinablitz.com/wp-content/uploads/2024/02/NFL-Combine.jpeg"
+    explanation = """
+    You have selected the overview of the correlations between the Combine metrics and the seasonal performance.
+    Select the position and the correlation measure in the side menu
+    """
+    new_section_title = "Correlation of the Combine metrics with the seasonal stats"
+    new_section_explanation = """
+    Each cell shows the correlation of a Combine metric with the average of a seasonal stat over the seasons of a player (one value per player,
+    players with both values only). The table below lists every pair with bootstrap confidence intervals and the regression line.
+    """
 
 # Display the headline, image, and info-box style explanation side by side
 st.markdown(f"<h1 style='font-size: 40px;'>{headline}</h1>", unsafe_allow_html=True)
@@ -187,25 +197,31 @@ if menu_choice == "Analyze existing players":
     # Step 1: Select position first
     st.sidebar.subheader("Select Position")
     
-    # Filter out NaN positions before showing in the selectbox
-    valid_positions = df_players_combine_unique['Pos'].dropna().unique()
+    # Positions of the index (NaN positions are not indexed)
+    valid_positions = engine.positions
     selected_position = st.sidebar.selectbox("Select Position", valid_positions)
 
-    # Filter data based on the selected position
-    filtered_data = df_players_combine_unique[df_players_combine_unique['Pos'] == selected_position]
+    # Look up the data of the selected position
+    with stage('position_filter') as record:
+        filtered_data = player_index.combine_rows(selected_position)
+        record.rows = len(filtered_data)
 
     # Step 2: Select two players from the selected position
+    # (the widgets show the names, the selection is the integer player key)
     st.sidebar.subheader(f"Select two players playing in {selected_position}")
-    player1 = st.sidebar.selectbox("Select Player 1", filtered_data['player_name'].unique())
-    player2 = st.sidebar.selectbox("Select Player 2", filtered_data['player_name'].unique())
+    player1_key = st.sidebar.selectbox("Select Player 1", engine.players(selected_position), format_func=engine.label)
+    player2_key = st.sidebar.selectbox("Select Player 2", engine.players(selected_position), format_func=engine.label)
 
     # Display selected players' data
-    if player1 and player2:
+    if player1_key is not None and player2_key is not None:
+        player1 = engine.label(player1_key)
+        player2 = engine.label(player2_key)
         st.subheader(f"Performance comparison between {player1} and {player2}")
 
         # Get player data for both players
-        player1_data = filtered_data[filtered_data['player_name'] == player1]
-        player2_data = filtered_data[filtered_data['player_name'] == player2]
+        with stage('player_filter'):
+            player1_data = player_index.combine_player(selected_position, player1_key)
+            player2_data = player_index.combine_player(selected_position, player2_key)
 
         # Extract stats for player 1
         player1_position = player1_data['Pos'].values[0]
@@ -235,20 +251,41 @@ if menu_choice == "Analyze existing players":
                     player2_vertical, player2_broad_jump, player2_bench]
         }
 
+        # Metrics to compare
+        # The boxplots show the players of the position with all metrics recorded, the percentiles rank a value among all players
+        # with that metric recorded (see nfl_distributions.py)
+        metrics = ['Height_cm', 'Weight_kg', '40yd', 'Vertical_cm', 'BroadJump_m', 'Bench']
+
+        # Percentile rank of each value within the selected position (e.g. "87th percentile"), looked up in the precomputed distributions
+        with stage('percentiles', rows=2):
+            for player, player_key in [(player1, player1_key), (player2, player2_key)]:
+                percentiles = engine.percentiles(selected_position, engine.combine_values(selected_position, player_key))
+                comparison_data[f"{player} (percentile)"] = [""] + [percentile_label(percentiles[metric]) or "" for metric in metrics]
+
         comparison_df = pd.DataFrame(comparison_data).replace(np.nan, "This value was not recorded")
 
         # Display the DataFrame as a table without the index (index always visible...)
         st.table(comparison_df.set_index("Metric"))
 
-        # Metrics to compare
-        metrics = ['Height_cm', 'Weight_kg', '40yd', 'Vertical_cm', 'BroadJump_m', 'Bench']
-        filtered_data = filtered_data.dropna(subset=metrics)
+        # Closest historical players of both players within the position (same distance as on the Record page),
+        # looked up in the precomputed comparables table (python code/nfl_comparables.py), else computed for the selected players
+        st.markdown("<h3>Closest historical comparables</h3>", unsafe_allow_html=True)
+        for column, player, player_key in zip(st.columns(2), [player1, player2], [player1_key, player2_key]):
+            with column:
+                st.markdown(f"**{player}**")
+                comparables = engine.player_comparables(selected_position, player_key)
+                if comparables is None or comparables.empty:
+                    st.caption("No combine values recorded for this player.")
+                else:
+                    st.dataframe(comparables[['Rank', 'label', 'Distance']].rename(columns={'label': 'Player'}), hide_index=True)
+        if engine.comparables is None:
+            st.caption("Computed on the fly, precompute the comparables of all players with: python code/nfl_comparables.py")
 
         # Error handling for missing metrics
         missing_metrics = [metric for metric in metrics if metric not in filtered_data.columns]
         if missing_metrics:
             st.error(f"The following columns are missing from the data: {', '.join(missing_metrics)}")
-        elif filtered_data.empty:
+        elif all(position_distributions.box_stats(selected_position, metric) is None for metric in metrics):
             st.error("No data available for this position.")
         else:
             # Create a column for the plots (3x2 grid for each metric)
@@ -263,24 +300,19 @@ if menu_choice == "Analyze existing players":
 
                         if pd.notnull(player1_value) or pd.notnull(player2_value):
                             # Plot the boxplot and scatter both players' data points if at least one value is present
-                            fig, ax = plt.subplots(figsize=(7, 5))
-                            sns.boxplot(x='Pos', y=metric, data=filtered_data, ax=ax)
-
-                            # Plot player 1's value if available
-                            if pd.notnull(player1_value):
-                                ax.scatter([0], [player1_value], color='red', s=100, zorder=5, label=player1)
-
-                            # Plot player 2's value if available
-                            if pd.notnull(player2_value):
-                                ax.scatter([0], [player2_value], color='blue', s=100, zorder=5, label=player2)
-
-                            # Set the legend to the upper right
-                            ax.legend(loc="upper right")
-
-                            ax.set_title(f'{metric} Comparison', fontsize=14)
-                            ax.set_xlabel("Position", fontsize=12)
-                            ax.set_ylabel(metric, fontsize=12)
-                            st.pyplot(fig)
+                            # (player 1 in red, player 2 in blue, missing values are skipped)
+                            compared = [(player1, player1_value, 'red'), (player2, player2_value, 'blue')]
+                            if CHART_BACKEND == 'altair':
+                                with stage('chart combine_boxplot'):
+                                    chart = combine_boxplot_chart(position_distributions.box_stats(selected_position, metric), selected_position, metric, compared)
+                                with stage('display_figure'):
+                                    st.altair_chart(chart, use_container_width=True)
+                            else:
+                                image = figure_cache.get_or_render(
+                                    ('combine_boxplot', engine.version, selected_position, metric, player1_key, player2_key),
+                                    lambda: draw_combine_boxplot(position_distributions.box_stats(selected_position, metric), selected_position, metric, compared))
+                                with stage('display_figure'):
+                                    st.image(image, use_column_width=True)
                         else:
                             # If both values are missing, show a message in a frame the same size as the plot
                             st.markdown(
@@ -299,16 +331,14 @@ if menu_choice == "Analyze existing players":
 
         # Add Seasonal Performance plots for both players
         # Function to plot seasonal performance for the two players
-        def plot_seasonal_performance(player1_name, player2_name, df_season_data):
-            # Filter the data for the selected players
-            filtered_data = df_season_data[df_season_data['player_name'].isin([player1_name, player2_name])]
-    
-            # Ensure each player is plotted for their active seasons only (2010-2023 is the valid range therefore)
-            filtered_data = filtered_data[(filtered_data['season'] >= 2010) & (filtered_data['season'] <= 2023)]
+        def plot_seasonal_performance(player1_key, player2_key, engine):
+            player1_name = engine.label(player1_key)
+            player2_name = engine.label(player2_key)
 
-            # Filter data for each player individually
-            player1_data = filtered_data[filtered_data['player_name'] == player1_name]
-            player2_data = filtered_data[filtered_data['player_name'] == player2_name]
+            # Look up the data of the selected players in the career store (see nfl_careers.py)
+            # Ensure each player is plotted for their active seasons only (the seasons available in the data are the valid range therefore)
+            player1_data = engine.career_history(player1_key, first_season, last_season)
+            player2_data = engine.career_history(player2_key, first_season, last_season)
 
             # warning messages
             warnings = []
@@ -330,44 +360,28 @@ if menu_choice == "Analyze existing players":
 
             # Proceed only if there is data for at least one player
             if not player1_data.empty or not player2_data.empty:
-                # Remove duplicates and NaN values for the selected metrics
-                filtered_data = filtered_data.drop_duplicates(subset=['player_name', 'season', 'receiving_yards', 'receiving_tds', 'receptions', 'receiving_yards_after_catch'])
-                filtered_data = filtered_data.dropna(subset=['receiving_yards', 'receiving_tds', 'receptions', 'receiving_yards_after_catch'])
-
-                # Create a 2x2 grid of plots for the four metrics
-                fig, axes = plt.subplots(2, 2, figsize=(14, 12))
-
-                # Plot 1: Receiving Yards per season
-                sns.lineplot(x='season', y='receiving_yards', hue='player_name', data=filtered_data, ax=axes[0, 0])
-                axes[0, 0].set_title(f'Seasonal Receiving Yards Comparison')
-                axes[0, 0].set_xlabel('Season')
-                axes[0, 0].set_ylabel('Receiving Yards')
-                axes[0, 0].xaxis.set_major_locator(plt.MaxNLocator(integer=True))  # Force x-axis to show only integer years (2010 instead 2010.00)
-
-                # Plot 2: Receiving Touchdowns per season
-                sns.lineplot(x='season', y='receiving_tds', hue='player_name', data=filtered_data, ax=axes[0, 1])
-                axes[0, 1].set_title(f'Seasonal Receiving TDs Comparison')
-                axes[0, 1].set_xlabel('Season')
-                axes[0, 1].set_ylabel('Receiving TDs')
-                axes[0, 1].xaxis.set_major_locator(plt.MaxNLocator(integer=True))  # Force x-axis to show only integer years
-
-                # Plot 3: Catches (Receptions) per season
-                sns.lineplot(x='season', y='receptions', hue='player_name', data=filtered_data, ax=axes[1, 0])
-                axes[1, 0].set_title(f'Seasonal Catches (Receptions) Comparison')
-                axes[1, 0].set_xlabel('Season')
-                axes[1, 0].set_ylabel('Receptions')
-                axes[1, 0].xaxis.set_major_locator(plt.MaxNLocator(integer=True))  # Force x-axis to show only integer years
-
-                # Plot 4: Yards after Catch per season
-                sns.lineplot(x='season', y='receiving_yards_after_catch', hue='player_name', data=filtered_data, ax=axes[1, 1])
-                axes[1, 1].set_title(f'Seasonal Yards after Catch Comparison')
-                axes[1, 1].set_xlabel('Season')
-                axes[1, 1].set_ylabel('Yards after Catch')
-                axes[1, 1].xaxis.set_major_locator(plt.MaxNLocator(integer=True))  # Force x-axis to show only integer years
-
-                # Adjust layout and display the plots
-                plt.tight_layout()
-                st.pyplot(fig)
+                # Remove NaN values for the selected metrics (only done when the figure is not cached yet)
+                # (the seasonal data holds one row per player and season, duplicates are resolved when the data is loaded)
+                def prepare_and_draw(draw=draw_seasonal_grid):
+                    season_data = engine.career_history([player1_key, player2_key], first_season, last_season, stats=receiving_stats)
+
+                    # 2x2 grid of plots for the four metrics
+                    return draw(season_data, [
+                        ('receiving_yards', 'Seasonal Receiving Yards Comparison', 'Receiving Yards'),
+                        ('receiving_tds', 'Seasonal Receiving TDs Comparison', 'Receiving TDs'),
+                        ('receptions', 'Seasonal Catches (Receptions) Comparison', 'Receptions'),
+                        ('receiving_yards_after_catch', 'Seasonal Yards after Catch Comparison', 'Yards after Catch'),
+                    ])
+
+                if CHART_BACKEND == 'altair':
+                    with stage('chart receiving_grid'):
+                        chart = prepare_and_draw(seasonal_grid_chart)
+                    with stage('display_figure'):
+                        st.altair_chart(chart, use_container_width=True)
+                else:
+                    image = figure_cache.get_or_render(('receiving_grid', engine.version, player1_key, player2_key), prepare_and_draw)
+                    with stage('display_figure'):
+                        st.image(image, use_column_width=True)
 
         if warnings:
             warnings_text = "<br>".join(warnings)  # Join warnings with line breaks
@@ -385,7 +399,20 @@ if menu_choice == "Analyze existing players":
         )
 
         # Plot the seasonal performance
-        plot_seasonal_performance(player1, player2, df_season_data)
+        plot_seasonal_performance(player1_key, player2_key, engine)
+
+        # Players whose first seasons resemble those of both players: per-game stats of the first career years, compared within the
+        # position of their last season (career-trajectory store, see nfl_careers.py)
+        st.markdown("<h3>Similar careers</h3>", unsafe_allow_html=True)
+        career_years = st.slider("First seasons of the careers compared", 1, 5, CAREER_YEARS, key="career_years")
+        for column, player, player_key in zip(st.columns(2), [player1, player2], [player1_key, player2_key]):
+            with column:
+                st.markdown(f"**{player}**")
+                careers = engine.similar_careers(player_key, career_years)
+                if careers is None or careers.empty:
+                    st.caption("No seasonal data recorded for this player.")
+                else:
+                    st.dataframe(careers[['Rank', 'label', 'First season', 'Seasons', 'Distance']].rename(columns={'label': 'Player'}), hide_index=True)
 
 
 # **********************************************************************************************************************************************************************
@@ -421,17 +448,42 @@ elif menu_choice == "Record new players and compare performance":
         'Bench': new_bench
     }
 
+    # Settings of the similarity search (defaults: top 10, Euclidean distance over the recorded metrics, all metrics weighted equally)
+    missing_value_options = {
+        "masked": "Compare recorded metrics only",
+        "impute": "Estimate missing metrics",
+        "complete": "Only players with all metrics",
+    }
+    with st.sidebar.expander("Similarity settings"):
+        n_similar = st.slider("Number of similar players", min_value=1, max_value=50, value=10, key="n_similar_input")
+        similarity_distance = st.radio("Distance", ["euclidean", "mahalanobis"], key="distance_input")
+        similarity_missing = st.radio("Missing combine values", list(missing_value_options), format_func=missing_value_options.get, key="missing_input")
+        if similarity_distance == "mahalanobis" and similarity_missing == "masked":
+            # the Mahalanobis distance combines all metrics, missing values have to be estimated
+            st.caption("With the Mahalanobis distance missing metrics are estimated.")
+            similarity_missing = "impute"
+        similarity_weights = {
+            metric: st.slider(f"Weight {metric}", min_value=0.0, max_value=3.0, value=1.0, step=0.1, key=f"weight_{metric}_input",
+                              disabled=similarity_distance == "mahalanobis")
+            for metric in SIMILARITY_METRICS}
+
+    # Only weights different from 1 change the distance, the plain Euclidean distance is the default
+    if similarity_distance == "mahalanobis" or all(weight == 1.0 for weight in similarity_weights.values()):
+        similarity_weights = None
+
     # Button to trigger the comparison
     if st.sidebar.button("Compare"):
         st.session_state.compare_clicked = True
 
+    # Batch mode: a CSV with a whole draft class (position + combine metrics per prospect)
+    st.sidebar.subheader("Score a draft class")
+    prospects_file = st.sidebar.file_uploader("Upload prospects (CSV)", type="csv", key="prospects_upload",
+                                              help="One row per prospect with the columns position, " + ", ".join(SIMILARITY_METRICS) + " and optionally player_name")
+
     # If compare button is clicked, calculate and display the comparison
     if st.session_state.compare_clicked and st.session_state.player_data:
         new_player_data = st.session_state.player_data
 
-        # Filter players by the selected position
-        filtered_data = df_players_combine_unique[df_players_combine_unique['Pos'] == selected_position]
-
         # Create two columns, left for the player values and right for the similar players
         col1, col2 = st.columns([1, 1])  # Ensure both columns take equal space for the layout
 
@@ -453,36 +505,31 @@ elif menu_choice == "Record new players and compare performance":
             </div>
             """, unsafe_allow_html=True)
 
-        # Right column: Show the top 10 similar players
+        # Right column: Show the top n similar players
         # *****************************************************************************************************************
-        # How does it work:
-        # - First the values (existing and newly added) are scaled (reason: different metrics)
-        # - Function calculates the Euclidean distance between the new player and every other player
+        # How does it work (see nfl_similarity.py):
+        # - The values (existing and newly added) are scaled (reason: different metrics)
+        # - The engine calculates the distance between the new player and every other player
         #   - Only players with the same position as the new player are compared
-        # - Sort the data based on distance
+        # - The engine of a position is built once and reused for every comparison
         # *****************************************************************************************************************
         with col2:
-            def find_similar_players(new_player_data, filtered_data, metrics, n=10):
-                filtered_metrics = filtered_data[metrics]
-                scaler = StandardScaler()
-                scaled_data = scaler.fit_transform(filtered_metrics)
-                new_player_df = pd.DataFrame([new_player_data], columns=metrics)
-                scaled_new_player = scaler.transform(new_player_df)
-                distances = distance.cdist(scaled_new_player, scaled_data, 'euclidean').flatten()
-                filtered_data.loc[:, 'Distance'] = distances
-                similar_players = filtered_data.sort_values(by='Distance').head(n).reset_index(drop=True)
-                similar_players.insert(0, 'Rank', range(1, len(similar_players) + 1))
-                return similar_players
-
-            # Define the metrics to compare
-            metrics = ['Height_cm', 'Weight_kg', '40yd', 'Vertical_cm', 'BroadJump_m', 'Bench']
-            
-            similar_players = find_similar_players(new_player_data, filtered_data, metrics, n=10)
+            similar_players = engine.find_similar_players(selected_position, new_player_data, n_similar, similarity_weights, similarity_distance,
+                                                          similarity_missing)
 
             # Add title and show the table of similar players
-            st.markdown("<h3>Top 10 Similar Players</h3>", unsafe_allow_html=True)
+            st.markdown(f"<h3>Top {n_similar} Similar Players</h3>", unsafe_allow_html=True)
             st.dataframe(similar_players[['Rank', 'player_name']])
 
+        # *** Projected seasonal performance (models trained offline, see nfl_models.py) ***
+        projections = engine.project_player(selected_position, new_player_data)
+        st.markdown("<h3>Projected Seasonal Performance</h3>", unsafe_allow_html=True)
+        if projections is None:
+            st.caption(f"No projection models for {selected_position} trained yet (python code/nfl_train.py).")
+        else:
+            st.dataframe(projections.round(1), hide_index=True)
+            st.caption(f"Average per season. Low / High: {INTERVAL:.0%} prediction interval (model version {engine.projection_models.version}).")
+
         # *** Seasonal Performance Plot ***
         st.markdown("<hr>", unsafe_allow_html=True)
         # Display the title and explanation (including warnings if present)
@@ -495,8 +542,10 @@ elif menu_choice == "Record new players and compare performance":
             """, 
             unsafe_allow_html=True)
 
-        player_list = similar_players['player_name'].tolist()
-        selected_players = st.multiselect("Select players to view seasonal performance", player_list, default=player_list[:1])
+        # Keys of the similar players (the seasonal data is looked up by key, the widget shows the names)
+        player_list = [int(player) for player in dict.fromkeys(similar_players['player_key']) if player >= 0]
+        selected_players = st.multiselect("Select players to view seasonal performance", player_list, default=player_list[:1],
+                                          format_func=engine.label)
 
         # Create a dropdown to select the seasonal indicator (depending on position)
         if selected_position == 'WR':
@@ -510,41 +559,104 @@ elif menu_choice == "Record new players and compare performance":
         if selected_players and seasonal_stat:
             st.subheader(f"Seasonal Performance for Selected Players - {seasonal_stat.replace('_', ' ').title()}")
 
-            # Filter the seasonal data for the selected players and seasons (2010-2023)
-            filtered_season_data = df_season_data[
-                (df_season_data['player_name'].isin(selected_players)) &
-                (df_season_data['season'] >= 2010) & 
-                (df_season_data['season'] <= 2023)]
+            # Ensure seasonal_stat exists in the data
+            if seasonal_stat in player_index.season.columns:
+                # Data preparation and drawing only run when the figure is not cached yet
+                def prepare_and_draw(draw=draw_seasonal_stat):
+                    # Look up the seasonal data for the selected players and the available seasons in the career store
+                    # (rows with NaN values in the selected stat column are removed)
+                    filtered_season_data = engine.career_history(selected_players, first_season, last_season, stats=[seasonal_stat])
+
+                    # Mean of the selected metric for all players in the same position, looked up in the season aggregates
+                    position_mean_per_year = engine.position_mean_per_year(selected_position, seasonal_stat, first_season, last_season)
+
+                    # Line plot for the seasonal performance of the selected players with the yearly mean of the position
+                    return draw(filtered_season_data, position_mean_per_year, seasonal_stat, selected_position)
+
+                if CHART_BACKEND == 'altair':
+                    with stage('chart seasonal_stat'):
+                        chart = prepare_and_draw(seasonal_stat_chart)
+                    with stage('display_figure'):
+                        st.altair_chart(chart, use_container_width=True)
+                else:
+                    image = figure_cache.get_or_render(
+                        ('seasonal_stat', engine.version, selected_position, tuple(selected_players), seasonal_stat), prepare_and_draw)
+                    with stage('display_figure'):
+                        st.image(image, use_column_width=True)
+            else:
+                st.write(f"No data available for {seasonal_stat}.")
 
-            # Remove duplicate rows for the same player, season, and selected metric
-            filtered_season_data = filtered_season_data.drop_duplicates(subset=['player_name', 'season', seasonal_stat])
+    # *** Batch comparison of an uploaded draft class ***
+    if prospects_file is not None:
+        st.markdown("<hr>", unsafe_allow_html=True)
+        st.markdown("<h2>Comparables for the uploaded draft class</h2>", unsafe_allow_html=True)
+
+        try:
+            with stage('load_prospects') as record:
+                prospects = pd.read_csv(prospects_file)
+                record.rows = len(prospects)
+            comparables = engine.score_prospects(prospects, n_similar, similarity_weights, similarity_distance, similarity_missing)
+        except ValueError as error:
+            st.error(f"The uploaded file could not be scored: {error}")
+        else:
+            n_scored = comparables['prospect'].nunique()
+            if n_scored < len(prospects):
+                st.warning(f"{len(prospects) - n_scored} of {len(prospects)} prospects were skipped (missing metrics or no players at their position).")
+            st.dataframe(comparables)
+
+            col1, col2 = st.columns([1, 1])
+            with col1:
+                st.download_button("Download as CSV", comparables.to_csv(index=False), file_name="comparables.csv", mime="text/csv")
+            with col2:
+                st.download_button("Download as Parquet", comparables.to_parquet(index=False), file_name="comparables.parquet",
+                                   mime="application/octet-stream")
+
+            # Projections of the whole class: one predict call per position and stat
+            projections = engine.project_prospects(prospects)
+            if projections is not None:
+                st.markdown("<h3>Projected seasonal performance</h3>", unsafe_allow_html=True)
+                st.dataframe(projections.round(1), hide_index=True)
+                st.download_button("Download projections as CSV", projections.to_csv(index=False), file_name="projections.csv", mime="text/csv")
 
-            # Remove rows with NaN values in the selected stat column
-            filtered_season_data = filtered_season_data.dropna(subset=[seasonal_stat])
 
-            # Calculate the mean of the selected metric for all players in the same position
-            position_mean_per_year = df_season_data[
-                (df_season_data['position'] == selected_position) & 
-                (df_season_data['season'] >= 2010) & 
-                (df_season_data['season'] <= 2023)
-            ].groupby('season')[seasonal_stat].mean().reset_index()
+# **********************************************************************************************************************************************************************
+# Part 5: Correlations of the combine metrics with the seasonal stats
+# - the matrix of all positions is computed once per data version (see nfl_correlations.py), the page only filters it
+# **********************************************************************************************************************************************************************
 
-            # Ensure seasonal_stat exists in the data
-            if seasonal_stat in filtered_season_data.columns:
-                # Create a line plot for the seasonal performance of the selected players
-                fig, ax = plt.subplots(figsize=(10, 6))
-                sns.lineplot(x='season', y=seasonal_stat, hue='player_name', data=filtered_season_data, ax=ax)
-
-                # Plot the yearly mean values for the selected position
-                sns.lineplot(x='season', y=seasonal_stat, data=position_mean_per_year, ax=ax, color='gray', linestyle='--', label=f'Mean {seasonal_stat.replace("_", " ").title()} for {selected_position}')
-
-                ax.set_title(f'Seasonal {seasonal_stat.replace("_", " ").title()} Performance', fontsize=16)
-                ax.set_xlabel('Season', fontsize=14)
-                ax.set_ylabel(seasonal_stat.replace('_', ' ').title(), fontsize=14)
-                ax.legend()
-                st.pyplot(fig)
-            else:
-                st.write(f"No data available for {seasonal_stat}.")
+elif menu_choice == "Combine vs. season correlations":
+    correlations, correlation_settings, correlation_version = load_correlations()
+    if correlations.empty:
+        st.write("Not enough players with Combine and seasonal data for correlations.")
+    else:
+        correlation_positions = sorted(correlations['position'].unique())
+        correlation_position = st.sidebar.selectbox("Select Position", correlation_positions, key="correlation_position",
+                                                    index=correlation_positions.index('WR') if 'WR' in correlation_positions else 0)
+        measure = st.sidebar.radio("Correlation", ["Pearson", "Spearman"], key="correlation_measure").lower()
+
+        with stage('correlation_filter') as record:
+            position_correlations = correlations[(correlations['position'] == correlation_position) & correlations[measure].notna()]
+            record.rows = len(position_correlations)
+
+        if position_correlations.empty:
+            st.write(f"Not enough players with Combine and seasonal data for {correlation_position}.")
+        else:
+            # Heatmap: combine metrics x seasonal stats (in the order of the data), -1 blue to +1 red like the notebook's heatmap
+            matrix = position_correlations.pivot(index='metric', columns='stat', values=measure)
+            matrix = matrix.reindex(index=[metric for metric in SIMILARITY_METRICS if metric in matrix.index],
+                                    columns=list(dict.fromkeys(position_correlations['stat'])))
+            st.dataframe(matrix.style.background_gradient(cmap='coolwarm', vmin=-1, vmax=1).format('{:.2f}', na_rep=''))
+
+            # All pairs of the position, strongest correlations first
+            st.markdown("<h3>Strongest correlations</h3>", unsafe_allow_html=True)
+            ranked = position_correlations.iloc[np.argsort(-position_correlations[measure].abs().to_numpy(), kind='stable')]
+            st.dataframe(ranked.drop(columns='position').rename(columns={
+                'metric': 'Combine metric', 'stat': 'Seasonal stat', 'n': 'Players', 'pearson': 'Pearson r', 'pearson_low': 'r low',
+                'pearson_high': 'r high', 'pearson_p': 'p-value', 'spearman': 'Spearman rho', 'spearman_low': 'rho low',
+                'spearman_high': 'rho high', 'slope': 'Slope', 'intercept': 'Intercept', 'r2': 'R\u00b2'}).round(3), hide_index=True)
+            st.caption(f"Data version {correlation_version}: {correlation_settings['confidence']:.0%} bootstrap intervals from "
+                       f"{correlation_settings['resamples']:,} resamples of the players, p-value of the Pearson r as in scipy's linregress.")
+            st.download_button("Download correlations as CSV", correlations.to_csv(index=False), file_name="correlations.csv", mime="text/csv")
 
 # Add a dividing line at the end of the dashboard page
 st.markdown("<hr>", unsafe_allow_html=True)
@@ -563,6 +675,27 @@ st.markdown(
     """, 
     unsafe_allow_html=True)
 
+# **********************************************************************************************************************************************************************
+# Profiling panel: stages of this rerun (only if profiling is switched on, see the top of the script)
+# **********************************************************************************************************************************************************************
+rerun_profile = end()
+if rerun_profile is not None:
+    with st.sidebar.expander("Profiling", expanded=True):
+        st.caption(f"Rerun: {rerun_profile.seconds * 1000:.0f} ms, {len(rerun_profile.records)} stages (switch off: ?profile=0 or unset {PROFILE_ENV})")
+        st.dataframe(pd.DataFrame({
+            "Stage": ["\u2003" * record.depth + record.name for record in rerun_profile.records],
+            "ms": [record.seconds * 1000 for record in rerun_profile.records],
+            "Rows": [record.rows for record in rerun_profile.records],
+            "Alloc (KB)": [record.allocated / 1024 for record in rerun_profile.records],
+            "Peak (KB)": [record.peak / 1024 for record in rerun_profile.records],
+            "Detail": [record.detail for record in rerun_profile.records],
+        }).round(1), hide_index=True)
+        st.download_button("Download as JSON lines", to_jsonl(rerun_profile), file_name="profile.jsonl", mime="application/x-ndjson")
+        st.download_button("Download as Prometheus text", to_prometheus(rerun_profile), file_name="profile.prom", mime="text/plain")
+        if rerun_profile.report is not None:
+            st.markdown(f"**{rerun_profile.mode} profile of the rerun**")
+            st.code(rerun_profile.report, language=None)
+
 # **********************************************************************************************************************************************************************
 # Have fun testing it out! :) Viktor & Carlo
 
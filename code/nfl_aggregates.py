@@ -0,0 +1,102 @@
+# **********************************************************************************************************************************************************************
+# Season aggregates cube: position x season x stat
+# - one row per (position, season, stat) with mean, median, p10, p90, std and count over the player seasons of that position
+#   (every stat of SEASON_STATS in the seasonal data, missing values ignored like in pandas' groupby)
+# - written by the ingest step next to the seasonal data, updated incrementally: only seasons whose rows changed
+#   (new or corrected seasons, detected by a content hash per season) are aggregated again
+# - the dashboard reads the cube through SeasonCube: a (position, stat) lookup is a dict access, no scan of the seasonal data
+# **********************************************************************************************************************************************************************
+import numpy as np
+import pandas as pd
+
+AGGREGATES = ['mean', 'median', 'p10', 'p90', 'std', 'count']
+CUBE_COLUMNS = ['position', 'season', 'stat'] + AGGREGATES + ['season_hash']
+
+# Stat columns of the seasonal data as delivered by nfl.import_seasonal_data. Other numeric columns (keys, roster information like
+# draft_number, jersey_number or age, ids) are not stats and are never aggregated
+SEASON_STATS = [
+    'completions', 'attempts', 'passing_yards', 'passing_tds', 'interceptions', 'sacks', 'sack_yards', 'sack_fumbles', 'sack_fumbles_lost',
+    'passing_air_yards', 'passing_yards_after_catch', 'passing_first_downs', 'passing_epa', 'passing_2pt_conversions', 'pacr', 'dakota',
+    'carries', 'rushing_yards', 'rushing_tds', 'rushing_fumbles', 'rushing_fumbles_lost', 'rushing_first_downs', 'rushing_epa',
+    'rushing_2pt_conversions', 'receptions', 'targets', 'receiving_yards', 'receiving_tds', 'receiving_fumbles', 'receiving_fumbles_lost',
+    'receiving_air_yards', 'receiving_yards_after_catch', 'receiving_first_downs', 'receiving_epa', 'receiving_2pt_conversions', 'racr',
+    'target_share', 'air_yards_share', 'wopr_x', 'wopr_y', 'special_teams_tds', 'fantasy_points', 'fantasy_points_ppr', 'games',
+    'tgt_sh', 'ay_sh', 'yac_sh', 'ry_sh', 'rtd_sh', 'rfd_sh', 'rtdfd_sh', 'dom', 'w8dom', 'yptmpa', 'ppr_sh',
+]
+
+
+# Numeric stat columns of the seasonal data (the columns of SEASON_STATS present, in the order of the data)
+def stat_columns(season):
+    stats = set(SEASON_STATS)
+    return [column for column in season.select_dtypes('number').columns if column in stats]
+
+
+# Content hash of the rows of each season (independent of the row order): {season: hash}
+def season_hashes(season):
+    hashes = pd.util.hash_pandas_object(season, index=False)
+    return hashes.groupby(season['season'].to_numpy()).sum()
+
+
+# Cube of the seasonal data (columns: CUBE_COLUMNS)
+def build_season_cube(season, stats=None):
+    stats = stat_columns(season) if stats is None else list(stats)
+    season = season.dropna(subset=['position'])
+    grouped = season.groupby(['position', 'season'], observed=True)[stats]
+    aggregates = {
+        'mean': grouped.mean(),
+        'median': grouped.median(),
+        'p10': grouped.quantile(0.1),
+        'p90': grouped.quantile(0.9),
+        'std': grouped.std(),
+        'count': grouped.count(),
+    }
+    cube = pd.concat({name: frame.stack(dropna=False) for name, frame in aggregates.items()}, axis=1)
+    cube.index.names = ['position', 'season', 'stat']
+    cube = cube.reset_index()
+    cube['position'] = cube['position'].astype('object')
+    cube['count'] = cube['count'].astype('int64')
+    cube['season_hash'] = cube['season'].map(season_hashes(season)).astype('uint64')
+    return cube[CUBE_COLUMNS]
+
+
+# Update an existing cube to the current seasonal data: changed and new seasons are aggregated again,
+# removed seasons are dropped. A different set of stats rebuilds the whole cube.
+# Returns (cube, aggregated seasons)
+def update_season_cube(cube, season, stats=None):
+    stats = stat_columns(season) if stats is None else list(stats)
+    if set(cube['stat']) != set(stats):
+        return build_season_cube(season, stats), sorted(season['season'].unique())
+
+    hashes = season_hashes(season.dropna(subset=['position']))
+    known = cube.groupby('season')['season_hash'].first()
+    changed = [value for value, digest in hashes.items() if known.get(value) != digest]
+
+    kept = cube[cube['season'].isin(hashes.index) & ~cube['season'].isin(changed)]
+    if changed:
+        updated = build_season_cube(season[season['season'].isin(changed)], stats)
+        kept = pd.concat([kept, updated], ignore_index=True)
+    cube = kept.sort_values(['position', 'season', 'stat'], kind='stable').reset_index(drop=True)
+    return cube, changed
+
+
+class SeasonCube:
+    def __init__(self, cube):
+        self.cube = cube
+        self.stats = list(dict.fromkeys(cube['stat']))
+
+        # (position, stat) -> aggregates per season (sorted by season)
+        self._series = {}
+        cube = cube.sort_values('season', kind='stable')
+        for (position, stat), frame in cube.groupby(['position', 'stat'], sort=False):
+            self._series[(position, stat)] = frame[['season'] + AGGREGATES].reset_index(drop=True)
+
+    # Yearly aggregate of a stat for a position as frame with the columns 'season' and <stat>,
+    # optionally limited to the seasons first..last (inclusive)
+    def series(self, position, stat, aggregate='mean', first=None, last=None):
+        frame = self._series.get((position, stat))
+        if frame is None:
+            return pd.DataFrame({'season': np.empty(0, dtype='int64'), stat: np.empty(0)})
+        seasons = frame['season'].to_numpy()
+        start = 0 if first is None else np.searchsorted(seasons, first, side='left')
+        stop = len(seasons) if last is None else np.searchsorted(seasons, last, side='right')
+        return pd.DataFrame({'season': seasons[start:stop], stat: frame[aggregate].to_numpy()[start:stop]})
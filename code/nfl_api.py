@@ -0,0 +1,216 @@
+# **********************************************************************************************************************************************************************
+# Headless HTTP service over the analytics engine (see nfl_engine.py), for tools that need the dashboard's computations without the UI
+# - JSON endpoints: positions, players, player profiles (combine values, percentiles, seasons), comparables of existing and new players,
+#   season series (aggregates per position and season) and projections
+# - the engine is built once at startup from the local data (no external services, see nfl_sources.build_engine; Streamlit is not needed)
+#   and is read-only afterwards
+# - with --workers > 1 the engine is built before the worker processes are forked (Linux/macOS): all workers share the same
+#   in-memory copy of the data (copy-on-write pages), each worker serves the same socket. Without fork a single process is started
+# - responses are cached per worker in an LRU cache keyed by endpoint, parameters and data version
+# - the data is read at startup: restart the service after an ingest / fetch / training run
+# - run via: python code/nfl_api.py [--host 127.0.0.1] [--port 8000] [--workers 4] [--data-dir 00_Data]
+# **********************************************************************************************************************************************************************
+import argparse
+import gc
+import json
+import os
+import socket
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import uvicorn
+from fastapi import FastAPI, HTTPException, Query, Response
+from pydantic import BaseModel, Field
+
+import nfl_sources
+from nfl_aggregates import AGGREGATES
+from nfl_similarity import DISTANCES, MISSING_MODES, SIMILARITY_METRICS
+
+RESPONSE_CACHE_ENTRIES = 1024
+
+
+# LRU cache of serialized responses (thread-safe, the endpoints run in the thread pool of the server)
+class ResponseCache:
+    def __init__(self, max_entries=RESPONSE_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                return body
+        body = compute()
+        with self._lock:
+            self._entries[key] = body
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return body
+
+
+# JSON of frames / dicts / numbers (NaN -> null)
+def to_json(value):
+    if isinstance(value, pd.DataFrame):
+        return value.to_json(orient='records')
+    if isinstance(value, dict):
+        return '{' + ','.join(f'{json.dumps(str(key))}:{to_json(item)}' for key, item in value.items()) + '}'
+    if isinstance(value, (list, tuple)):
+        return '[' + ','.join(to_json(item) for item in value) + ']'
+    if isinstance(value, (float, np.floating)) and np.isnan(value):
+        return 'null'
+    if isinstance(value, np.generic):
+        value = value.item()
+    return json.dumps(value)
+
+
+class ComparablesRequest(BaseModel):
+    position: str
+    metrics: dict[str, float | None] = Field(description='combine values of the new player in metric units, e.g. {"Height_cm": 185.4}')
+    k: int = Field(10, ge=1, le=100)
+    distance: str = 'euclidean'
+    missing: str = 'masked'
+    weights: dict[str, float] | None = None
+
+
+class ProjectionRequest(BaseModel):
+    position: str
+    metrics: dict[str, float | None]
+
+
+def create_app(engine):
+    app = FastAPI(title='NFL analytics API', version='1')
+    cache = ResponseCache()
+
+    # Cached JSON response of compute() for the key (the data version is part of every key)
+    def respond(key, compute):
+        return Response(cache.get_or_compute((engine.version,) + key, lambda: to_json(compute()).encode()), media_type='application/json')
+
+    def check_position(position):
+        if position not in engine.positions:
+            raise HTTPException(404, f'Unknown position: {position}')
+
+    def player_values(metrics):
+        unknown = [metric for metric in metrics if metric not in SIMILARITY_METRICS]
+        if unknown:
+            raise HTTPException(422, f"Unknown metrics: {', '.join(unknown)} (expected: {', '.join(SIMILARITY_METRICS)})")
+        return {metric: np.nan if metrics.get(metric) is None else metrics[metric] for metric in SIMILARITY_METRICS}
+
+    @app.get('/health')
+    def health():
+        return {'status': 'ok', 'seasons': [engine.first_season, engine.last_season], 'positions': len(engine.positions),
+                'projection_models': None if engine.projection_models is None else engine.projection_models.version}
+
+    @app.get('/positions')
+    def positions():
+        return respond(('positions',), lambda: engine.positions)
+
+    @app.get('/players')
+    def players(position: str):
+        check_position(position)
+        return respond(('players', position), lambda: [{'player_key': key, 'label': engine.label(key)} for key in engine.players(position)])
+
+    @app.get('/players/{player_key}')
+    def player_profile(player_key: int, first: int | None = None, last: int | None = None):
+        if engine.index.name(player_key) is None:
+            raise HTTPException(404, f'Unknown player: {player_key}')
+        return respond(('profile', player_key, first, last), lambda: engine.player_profile(player_key, first, last))
+
+    @app.get('/players/{player_key}/comparables')
+    def player_comparables(player_key: int, position: str, k: int = Query(10, ge=1, le=100)):
+        check_position(position)
+        if engine.index.name(player_key) is None:
+            raise HTTPException(404, f'Unknown player: {player_key}')
+        return respond(('player_comparables', player_key, position, k), lambda: engine.player_comparables(position, player_key, k))
+
+    @app.get('/seasons/{position}/{stat}')
+    def season_series(position: str, stat: str, aggregate: str = 'mean', first: int | None = None, last: int | None = None):
+        check_position(position)
+        if stat not in engine.season_cube.stats:
+            raise HTTPException(404, f'Unknown stat: {stat}')
+        if aggregate not in AGGREGATES:
+            raise HTTPException(422, f"aggregate: one of {AGGREGATES}")
+        return respond(('series', position, stat, aggregate, first, last), lambda: engine.season_series(position, stat, aggregate, first, last))
+
+    @app.post('/comparables')
+    def comparables(request: ComparablesRequest):
+        check_position(request.position)
+        if request.distance not in DISTANCES or request.missing not in MISSING_MODES:
+            raise HTTPException(422, f"distance: one of {DISTANCES}, missing: one of {MISSING_MODES}")
+        missing = request.missing
+        if request.distance == 'mahalanobis':
+            if request.weights:
+                raise HTTPException(422, 'weights: not supported with the Mahalanobis distance (it is invariant to scaling the metrics)')
+            if missing == 'masked':
+                # the Mahalanobis distance combines all metrics, missing values are estimated (as on the Record page)
+                missing = 'impute'
+        values = player_values(request.metrics)
+        unknown = [metric for metric in request.weights or {} if metric not in SIMILARITY_METRICS]
+        if unknown:
+            raise HTTPException(422, f"Unknown weights: {', '.join(unknown)} (expected: {', '.join(SIMILARITY_METRICS)})")
+        weights = dict(sorted(request.weights.items())) if request.weights else None
+        key = ('comparables', request.position, tuple(values.items()), request.k, request.distance, missing,
+               None if weights is None else tuple(weights.items()))
+        return respond(key, lambda: engine.find_similar_players(request.position, values, request.k, weights, request.distance, missing))
+
+    @app.post('/projections')
+    def projections(request: ProjectionRequest):
+        values = player_values(request.metrics)
+        if engine.projection_models is None or not engine.projection_models.targets(request.position):
+            raise HTTPException(404, f'No projection models for {request.position}')
+        return respond(('projections', request.position, tuple(values.items())), lambda: engine.project_player(request.position, values))
+
+    return app
+
+
+# Serve the app: one process, or (with fork) `workers` processes forked after the engine was built, all accepting on one socket
+def serve(app, host, port, workers=1):
+    if workers <= 1 or not hasattr(os, 'fork'):
+        uvicorn.run(app, host=host, port=port)
+        return
+
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    # objects created so far are never collected, so the garbage collector of the workers does not touch (and copy) their pages
+    gc.freeze()
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            uvicorn.Server(uvicorn.Config(app, host=host, port=port)).run(sockets=[sock])
+            os._exit(0)
+        children.append(pid)
+    print(f'{workers} workers serving http://{host}:{port}')
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        # the workers received the interrupt as well and shut down
+        for pid in children:
+            os.waitpid(pid, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the NFL analytics (comparables, players, seasons) as JSON API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=1, help='worker processes sharing the loaded data (needs fork)')
+    parser.add_argument('--data-dir', default=nfl_sources.DATA_DIR, help='directory of the dashboard data')
+    args = parser.parse_args()
+
+    sources = nfl_sources.engine_sources(os.path.join(args.data_dir, os.path.basename(nfl_sources.COMBINE_CSV)),
+                                      os.path.join(args.data_dir, os.path.basename(nfl_sources.SEASON_CSV)))
+    fingerprints = nfl_sources.source_fingerprints(sources)
+    engine = nfl_sources.build_engine(sources, version=(fingerprints, None))
+    serve(create_app(engine), args.host, args.port, args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+# **********************************************************************************************************************************************************************
+# Batch prospect similarity: top-k historical comparables for a whole draft class in one pass
+# - input: one row per prospect with the position ('position' or 'Pos') and the combine metrics in metric units
+#   (Height_cm, Weight_kg, 40yd, Vertical_cm, BroadJump_m, Bench), optionally a 'player_name' or 'name' column
+# - all prospects of a position are scored at once by the position's similarity engine (chunked matrix distances)
+# - output: one row per (prospect, rank) with the comparable player and the distance, written as Parquet or CSV
+# - run via: python code/nfl_batch.py prospects.csv -o comparables.parquet [--k 10]
+# - the Record page offers the same via an upload widget
+# **********************************************************************************************************************************************************************
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from nfl_index import group_rows
+from nfl_similarity import MISSING_MODES, SIMILARITY_METRICS, SimilarityEngine
+
+PROSPECT_COLUMNS = ['prospect', 'prospect_name', 'position', 'Rank', 'player_id', 'player_name', 'Distance']
+
+
+def _find_column(prospects, candidates, required=True):
+    for column in candidates:
+        if column in prospects.columns:
+            return column
+    if required:
+        raise ValueError(f"The prospects need one of the columns {candidates}")
+    return None
+
+
+# Score all prospects: engine_for_position(position) returns the SimilarityEngine of a position.
+# Prospects without players at their position get no comparables, neither do prospects with missing metrics
+# unless the engine handles missing values ('masked' / 'impute', see nfl_similarity.py).
+def score_prospects(prospects, engine_for_position, k=10, chunk_size=1024, metrics=SIMILARITY_METRICS):
+    missing = [metric for metric in metrics if metric not in prospects.columns]
+    if missing:
+        raise ValueError(f"The prospects are missing the metric columns: {', '.join(missing)}")
+
+    position_column = _find_column(prospects, ['position', 'Pos'])
+    name_column = _find_column(prospects, ['player_name', 'name'], required=False)
+    names = prospects[name_column].to_numpy() if name_column else np.full(len(prospects), None)
+    values = prospects[list(metrics)].to_numpy(dtype='float64')
+    observed = ~np.isnan(values)
+
+    results = []
+    for position, rows in group_rows(prospects[position_column]).items():
+        engine = engine_for_position(position)
+        scorable = observed[rows].any(axis=1) if engine.missing != 'complete' else observed[rows].all(axis=1)
+        rows = rows[scorable]
+        if len(rows) == 0 or len(engine.players) == 0:
+            continue
+
+        nearest, distances = engine.nearest(values[rows], k, chunk_size)
+        n_prospects, n_comparables = nearest.shape
+        comparables = engine.players.take(nearest.ravel())
+        results.append(pd.DataFrame({
+            'prospect': np.repeat(rows, n_comparables),
+            'prospect_name': np.repeat(names[rows], n_comparables),
+            'position': position,
+            'Rank': np.tile(np.arange(1, n_comparables + 1), n_prospects),
+            'player_id': comparables['player_id'].to_numpy() if 'player_id' in comparables.columns else None,
+            'player_name': comparables['player_name'].to_numpy(),
+            'Distance': distances.ravel(),
+        }))
+
+    if not results:
+        return pd.DataFrame(columns=PROSPECT_COLUMNS)
+    return pd.concat(results, ignore_index=True).sort_values(['prospect', 'Rank'], kind='stable').reset_index(drop=True)
+
+
+def write_results(results, path):
+    if path.endswith('.parquet'):
+        results.to_parquet(path, index=False)
+    else:
+        results.to_csv(path, index=False)
+
+
+def main():
+    # imported here: nfl_sources builds the analytics engine, which scores prospects through this module
+    import nfl_sources
+
+    parser = argparse.ArgumentParser(description='Find the top-k historical comparables for a CSV of prospects')
+    parser.add_argument('prospects', help='CSV with position and combine metrics per prospect')
+    parser.add_argument('-o', '--output', default='comparables.parquet', help='output file (.parquet or .csv)')
+    parser.add_argument('--k', type=int, default=10, help='number of comparables per prospect')
+    parser.add_argument('--chunk-size', type=int, default=1024, help='prospects per distance block')
+    parser.add_argument('--missing', choices=MISSING_MODES, default='masked', help='handling of missing combine values')
+    parser.add_argument('--data-dir', default=nfl_sources.DATA_DIR, help='directory containing the combine data')
+    args = parser.parse_args()
+
+    combine_path = os.path.join(args.data_dir, os.path.basename(nfl_sources.COMBINE_CSV))
+    combine = nfl_sources.read_combine_source(nfl_sources.resolve_source(combine_path))
+    engines = {}
+
+    def engine_for_position(position):
+        if position not in engines:
+            engines[position] = SimilarityEngine(combine[combine['Pos'] == position], missing=args.missing)
+        return engines[position]
+
+    prospects = pd.read_csv(args.prospects)
+    results = score_prospects(prospects, engine_for_position, args.k, args.chunk_size)
+    write_results(results, args.output)
+    print(f"{results['prospect'].nunique():,} of {len(prospects):,} prospects scored -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+# **********************************************************************************************************************************************************************
+# Career-trajectory store: the seasonal stats of every player aligned by career year (year 1 = first season in the data)
+# - dense float32 arrays players x career years (x stats) with a boolean mask of the recorded seasons: season totals, games,
+#   per-game values and a rolling mean of the per-game values over the last ROLLING_WINDOW recorded career years
+# - built once per data version with the analytics engine (see nfl_sources.build_engine) from the seasonal data held in memory,
+#   shared read-only by all sessions like the other frames of the engine
+# - the seasonal history of a few players is a take of their rows (no filter over the seasonal data), the career matrix of a
+#   position (first N career years of the selected stats, one row per player) feeds the "similar careers" search, which uses the
+#   masked distance of the similarity search (see nfl_similarity.py): career years a player did not play are left out
+# **********************************************************************************************************************************************************************
+import numpy as np
+import pandas as pd
+
+from nfl_index import group_rows
+from nfl_similarity import SimilarityEngine
+
+# Stats held in the store (those present in the seasonal data), the games are used for the per-game values
+CAREER_STATS = ['receptions', 'targets', 'receiving_yards', 'receiving_tds', 'receiving_yards_after_catch', 'carries', 'rushing_yards', 'rushing_tds']
+GAMES_COLUMN = 'games'
+ROLLING_WINDOW = 3
+
+# Similar careers: career years compared by default, stats compared per position (other positions: all stats of the store)
+CAREER_YEARS = 3
+CAREER_SEARCH_STATS = {
+    'WR': ['receptions', 'targets', 'receiving_yards', 'receiving_tds', 'receiving_yards_after_catch'],
+    'RB': ['carries', 'rushing_yards', 'rushing_tds', 'receptions'],
+}
+BASES = ['per_game', 'totals', 'rolling']
+
+
+# Sums of the rows (values: rows x columns) per player and career year as float32 array players x years x columns, missing values
+# ignored; NaN where no row has a value
+def _season_sums(values, player_rows, years, shape):
+    cells = player_rows * shape[1] + years
+    sums = np.empty(shape + (values.shape[1],), dtype='float32')
+    for column in range(values.shape[1]):
+        observed = ~np.isnan(values[:, column])
+        counts = np.bincount(cells[observed], minlength=shape[0] * shape[1])
+        column_sums = np.bincount(cells[observed], weights=values[observed, column], minlength=shape[0] * shape[1])
+        sums[:, :, column] = np.where(counts > 0, column_sums, np.nan).reshape(shape)
+    return sums
+
+
+class CareerStore:
+    # season: seasonal data with the player_key column (see PlayerIndex.season), one row per player and season. Rows sharing a player
+    # and season (e.g. name-matched rows without player_id left after the deduplication at ingest) are summed like stints of one season
+    def __init__(self, season, stats=CAREER_STATS, window=ROLLING_WINDOW):
+        self.stats = [stat for stat in stats if stat in season.columns]
+        self.window = window
+        keys = season['player_key'].to_numpy()
+        seasons = season['season'].to_numpy(dtype='float64')
+        valid = (keys >= 0) & ~np.isnan(seasons)
+        seasons = seasons[valid].astype('int64')
+
+        # players sorted by key, career year of each row: season - first season of the player
+        self.players, player_rows = np.unique(keys[valid], return_inverse=True)
+        player_rows = player_rows.ravel()
+        first = np.full(len(self.players), np.iinfo('int64').max)
+        np.minimum.at(first, player_rows, seasons)
+        self.first_season = first.astype('int32')
+        years = seasons - first[player_rows]
+        n_years = int(years.max()) + 1 if len(years) else 0
+
+        self.mask = np.zeros((len(self.players), n_years), dtype=bool)
+        self.mask[player_rows, years] = True
+        self.totals = _season_sums(season[self.stats].to_numpy(dtype='float64')[valid], player_rows, years, self.mask.shape)
+        games = season[GAMES_COLUMN].to_numpy(dtype='float64')[valid] if GAMES_COLUMN in season.columns else np.full(len(years), np.nan)
+        self.games = _season_sums(games[:, None], player_rows, years, self.mask.shape)[:, :, 0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.per_game = np.where((self.games > 0)[:, :, None], self.totals / self.games[:, :, None], np.nan).astype('float32')
+
+        # rolling mean over the career years y - window + 1 .. y, years without value are skipped (NaN if none has a value)
+        observed = ~np.isnan(self.per_game)
+        sums = np.cumsum(np.where(observed, self.per_game, 0.0), axis=1, dtype='float64')
+        counts = np.cumsum(observed, axis=1)
+        if n_years > window:
+            sums[:, window:] -= sums[:, :-window].copy()
+            counts[:, window:] -= counts[:, :-window].copy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.rolling = np.where((counts > 0) & self.mask[:, :, None], sums / counts, np.nan).astype('float32')
+        for array in [self.mask, self.totals, self.games, self.per_game, self.rolling]:
+            array.flags.writeable = False
+
+        # position of a player: the position of their last season
+        order = np.lexsort((seasons, player_rows))
+        last_rows = order[np.r_[np.flatnonzero(np.diff(player_rows[order])), len(order) - 1]] if len(order) else order
+        self.positions = season['position'].astype('object').to_numpy()[valid][last_rows]
+        self._by_position = group_rows(self.positions)
+
+    @property
+    def career_years(self):
+        return self.mask.shape[1]
+
+    # Row of each player in the arrays (-1 for players without seasons)
+    def rows(self, players):
+        players = np.atleast_1d(np.asarray(players, dtype='int64'))
+        rows = np.searchsorted(self.players, players)
+        rows = np.minimum(rows, max(len(self.players) - 1, 0))
+        return np.where((len(self.players) > 0) & (self.players[rows] == players), rows, -1)
+
+    def position(self, player):
+        row = self.rows(player)[0]
+        return None if row < 0 else self.positions[row]
+
+    # Keys of the players whose last season was at a position
+    def position_players(self, position):
+        return self.players[self._by_position.get(position, np.empty(0, dtype='int64'))]
+
+    # Default stats of the similar careers search for a position
+    def search_stats(self, position):
+        return [stat for stat in CAREER_SEARCH_STATS.get(position, self.stats) if stat in self.stats]
+
+    # Career vectors of players: the first `years` career years of the stats (basis: per_game, totals or rolling), flattened per player
+    # as year 1 stats, year 2 stats, ... (players x years * stats, float64, NaN for years not played). Unknown players get NaN rows
+    def career_vectors(self, players, years=CAREER_YEARS, stats=None, basis='per_game'):
+        if basis not in BASES:
+            raise ValueError(f"Unknown basis '{basis}', expected one of {BASES}")
+        stats = self.stats if stats is None else list(stats)
+        columns = [self.stats.index(stat) for stat in stats]
+        rows = self.rows(players)
+        values = np.full((len(rows), years, len(columns)), np.nan)
+        shown = min(years, self.career_years)
+        values[rows >= 0, :shown] = getattr(self, basis)[rows[rows >= 0], :shown][:, :, columns]
+        return values.reshape(len(rows), years * len(columns))
+
+    # Similarity engine over the career vectors of the players of a position (masked distance, see nfl_similarity.py)
+    def similarity_engine(self, position, years=CAREER_YEARS, stats=None, basis='per_game'):
+        stats = self.search_stats(position) if stats is None else list(stats)
+        players = self.position_players(position)
+        features = [f'{stat}_year{year}' for year in range(1, years + 1) for stat in stats]
+        return SimilarityEngine(pd.DataFrame({'player_key': players}), features, missing='masked',
+                                values=self.career_vectors(players, years, stats, basis))
+
+    # Season rows of players (in the given order, seasons ascending) with player_key, season, career_year, games and the season totals,
+    # optionally limited to the seasons first..last. stats: only rows where these stats are recorded
+    def history(self, players, first=None, last=None, stats=None):
+        if np.ndim(players) == 0:
+            players = [players]
+        rows = self.rows(list(dict.fromkeys(players)))
+        rows = rows[rows >= 0]
+        player_numbers, years = np.nonzero(self.mask[rows])
+        rows = rows[player_numbers]
+        seasons = self.first_season[rows] + years
+        keep = np.ones(len(rows), dtype=bool)
+        if first is not None:
+            keep &= seasons >= first
+        if last is not None:
+            keep &= seasons <= last
+        totals = self.totals[rows, years].astype('float64')
+        if stats is not None:
+            keep &= ~np.isnan(totals[:, [self.stats.index(stat) for stat in stats]]).any(axis=1)
+        history = pd.DataFrame({'player_key': self.players[rows[keep]], 'season': seasons[keep], 'career_year': years[keep] + 1,
+                                'games': self.games[rows[keep], years[keep]].astype('float64')})
+        return pd.concat([history, pd.DataFrame(totals[keep], columns=self.stats)], axis=1)
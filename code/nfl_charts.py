@@ -0,0 +1,110 @@
+# **********************************************************************************************************************************************************************
+# Client-side chart backend (Vega-Lite via Altair) for the dashboard figures, alternative to the PNG rendering of nfl_render.py
+# - the server only sends the aggregated data of a chart: the box summary of a combine metric (quartiles, whiskers, fliers) with the
+#   values of the compared players, and the per-season values of the selected players with the yearly mean of the position
+#   (looked up in the season aggregates cube). No raster is drawn on the server
+# - the browser draws the charts: hover tooltips, zoom / pan (mouse wheel / drag, double click resets) and legend toggling
+#   (click a legend entry, shift-click for several) run client-side without a rerun of the script
+# - selected at startup with the environment variable NFL_CHART_BACKEND=altair (default: matplotlib, see CHART_BACKEND)
+# - same arguments as the draw_* functions of nfl_render.py, altair is imported on first use
+# **********************************************************************************************************************************************************************
+import os
+
+import numpy as np
+import pandas as pd
+
+CHART_BACKEND_ENV = 'NFL_CHART_BACKEND'
+CHART_BACKENDS = ['matplotlib', 'altair']
+CHART_BACKEND = os.environ.get(CHART_BACKEND_ENV, 'matplotlib').strip().lower()
+if CHART_BACKEND not in CHART_BACKENDS:
+    raise ValueError(f"{CHART_BACKEND_ENV}={CHART_BACKEND}, expected one of {CHART_BACKENDS}")
+
+# Fliers sent per box at most (evenly spaced order statistics of all fliers, the extremes are always kept)
+MAX_FLIERS = 200
+
+# Colours of the player lines (seaborn's default palette, like the matplotlib figures) and of the position mean
+PALETTE = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
+MEAN_COLOR = 'gray'
+
+
+def downsample_fliers(fliers, max_fliers=MAX_FLIERS):
+    fliers = np.sort(np.asarray(fliers, dtype='float64'))
+    if len(fliers) <= max_fliers:
+        return fliers
+    return fliers[np.unique(np.linspace(0, len(fliers) - 1, max_fliers).round().astype('int64'))]
+
+
+# Boxplot of a combine metric for a position with the values of the compared players as points
+# box_stats: precomputed statistics of the position (see nfl_distributions.py), players: list of (name, value, color), missing values are skipped
+def combine_boxplot_chart(box_stats, position, metric, players):
+    import altair as alt
+
+    box = pd.DataFrame([{'Position': position, **{key: float(box_stats[key]) for key in ['whislo', 'q1', 'med', 'q3', 'whishi', 'mean']}}])
+    fliers = pd.DataFrame({'Position': position, 'value': downsample_fliers(box_stats['fliers'])})
+    points = pd.DataFrame([{'Position': position, 'Player': name, 'value': float(value)} for name, value, _ in players
+                           if value is not None and value == value], columns=['Position', 'Player', 'value'])
+    colors = [color for _, value, color in players if value is not None and value == value]
+
+    x = alt.X('Position:N', title='Position')
+    y = alt.Y('value:Q', title=metric, scale=alt.Scale(zero=False))
+    summary = alt.Chart(box).encode(x=x, tooltip=[alt.Tooltip(key, format='.2f') for key in ['whishi', 'q3', 'med', 'mean', 'q1', 'whislo']])
+    layers = [
+        summary.mark_rule().encode(y=alt.Y('whislo:Q', title=metric, scale=alt.Scale(zero=False)), y2='whishi:Q'),
+        summary.mark_bar(size=60, color=PALETTE[0]).encode(y='q1:Q', y2='q3:Q'),
+        summary.mark_tick(size=60, thickness=2, color='white').encode(y='med:Q'),
+        alt.Chart(fliers).mark_point(color='#555').encode(x=x, y=y, tooltip=[alt.Tooltip('value:Q', format='.2f')]),
+        alt.Chart(points).mark_circle(size=150, opacity=1).encode(
+            x=x, y=y, color=alt.Color('Player:N', scale=alt.Scale(domain=list(points['Player']), range=colors), legend=alt.Legend(orient='top-right')),
+            tooltip=['Player:N', alt.Tooltip('value:Q', title=metric, format='.2f')]),
+    ]
+    return alt.layer(*layers).properties(title=f'{metric} Comparison', height=350).interactive(bind_x=False)
+
+
+# Line chart of a stat per season: one line per series (column 'Series'), dashed for the rows with dashed=True.
+# legend: selection bound to the legend, series not selected are faded out
+def _season_lines(data, title, axis_label, domain, colors, legend):
+    import altair as alt
+
+    return alt.Chart(data).mark_line(point=True).encode(
+        x=alt.X('season:Q', title='Season', scale=alt.Scale(zero=False), axis=alt.Axis(format='d', tickMinStep=1)),
+        y=alt.Y('value:Q', title=axis_label),
+        color=alt.Color('Series:N', title=None, scale=alt.Scale(domain=domain, range=colors)),
+        strokeDash=alt.StrokeDash('dashed:N', legend=None, scale=alt.Scale(domain=[False, True], range=[[1, 0], [6, 4]])),
+        opacity=alt.condition(legend, alt.value(1.0), alt.value(0.15)),
+        tooltip=['Series:N', alt.Tooltip('season:Q', format='d'), alt.Tooltip('value:Q', title=axis_label, format=',.1f')],
+    ).add_params(legend).properties(title=title)
+
+
+# Long format of the seasonal values of the players (player_name holds the display labels): season, Series, value, dashed
+def _player_series(season_data, stat):
+    data = season_data[['season', 'player_name', stat]].dropna(subset=[stat])
+    return pd.DataFrame({'season': data['season'].to_numpy(dtype='int64'), 'Series': data['player_name'].astype('object').to_numpy(),
+                         'value': data[stat].to_numpy(dtype='float64'), 'dashed': False})
+
+
+# 2x2 grid of seasonal line charts, one per stat: stats is a list of (column, title, axis label), one legend selection for all charts
+def seasonal_grid_chart(season_data, stats):
+    import altair as alt
+
+    names = list(season_data['player_name'].unique())
+    legend = alt.selection_point(fields=['Series'], bind='legend')
+    charts = [_season_lines(_player_series(season_data, stat), title, label, names, PALETTE[:len(names)], legend).properties(height=280)
+              for stat, title, label in stats]
+    rows = [alt.hconcat(*charts[i:i + 2]) for i in range(0, len(charts), 2)]
+    return alt.vconcat(*rows).interactive()
+
+
+# Line chart of one seasonal stat for the selected players, with the yearly mean of their position as dashed line
+def seasonal_stat_chart(season_data, position_mean_per_year, stat, position):
+    import altair as alt
+
+    stat_title = stat.replace('_', ' ').title()
+    mean_label = f'Mean {stat_title} for {position}'
+    players = _player_series(season_data, stat)
+    mean = pd.DataFrame({'season': position_mean_per_year['season'].to_numpy(dtype='int64'), 'Series': mean_label,
+                         'value': position_mean_per_year[stat].to_numpy(dtype='float64'), 'dashed': True})
+    names = list(season_data['player_name'].unique())
+    legend = alt.selection_point(fields=['Series'], bind='legend')
+    chart = _season_lines(pd.concat([players, mean], ignore_index=True), f'Seasonal {stat_title} Performance', stat_title,
+                          names + [mean_label], PALETTE[:len(names)] + [MEAN_COLOR], legend)
+    return chart.properties(height=400).interactive()
@@ -0,0 +1,171 @@
+# **********************************************************************************************************************************************************************
+# All-players comparables: the top k closest historical players of every player in the combine data, within their position
+# - same standardized distance as the similarity search of the dashboard (see nfl_similarity.py), the player itself is left out
+# - offline job: the players of each position are split into blocks of --block-size players, the blocks are scored in a
+#   process pool (each worker builds the similarity engine of a position once and reuses it for all blocks of that position)
+# - output: compact table with one row per (player, rank): player_key, position, rank, neighbour_key, distance (float32),
+#   sorted by player_key, written next to the combine data with the settings (k, distance, missing) in the Parquet metadata
+# - the dashboard looks the comparables of a player up by binary search (Analyze page); without a current table they are
+#   computed for the selected player on the fly
+# - run via: python code/nfl_comparables.py [--data-dir 00_Data] [--k 10] [--workers 4]
+# **********************************************************************************************************************************************************************
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from nfl_similarity import DISTANCES, MISSING_MODES, SIMILARITY_METRICS, SimilarityEngine
+
+COMPARABLE_COLUMNS = ['player_key', 'position', 'rank', 'neighbour_key', 'distance']
+COMPARABLES_K = 10
+COMPARABLES_DISTANCE = 'euclidean'
+COMPARABLES_MISSING = 'masked'
+BLOCK_SIZE = 512
+
+# Key of the settings in the Parquet metadata
+METADATA_KEY = b'nfl_comparables'
+
+
+def empty_comparables():
+    return pd.DataFrame({'player_key': np.empty(0, dtype='int32'), 'position': pd.Categorical([]), 'rank': np.empty(0, dtype='int16'),
+                         'neighbour_key': np.empty(0, dtype='int32'), 'distance': np.empty(0, dtype='float32')})
+
+
+# Top k comparables of players among the players of a similarity engine, the players themselves left out.
+# keys: player keys of the engine's players, values: metric matrix of the players to score (one row per player), players: their keys.
+# Players without the metrics the engine needs get no comparables. Returns a frame with player_key, rank, neighbour_key, distance
+def nearest_comparables(engine, keys, values, players, k=COMPARABLES_K, chunk_size=1024):
+    observed = ~np.isnan(values)
+    rows = np.flatnonzero(observed.any(axis=1) if engine.missing != 'complete' else observed.all(axis=1))
+    if len(rows) == 0 or len(keys) == 0:
+        return empty_comparables().drop(columns='position')
+
+    # one neighbour more than needed, the player itself is usually the closest one
+    nearest, distances = engine.nearest(values[rows], k + 1, chunk_size)
+    neighbours = keys[nearest]
+    players = np.asarray(players)[rows]
+    own = neighbours == players[:, None]
+    # the player itself moves to the end of its row (stable: the others keep their order), then the first k are kept
+    order = np.argsort(own, axis=1, kind='stable')[:, :k]
+    neighbours = np.take_along_axis(neighbours, order, axis=1)
+    distances = np.take_along_axis(distances, order, axis=1)
+    valid = ~np.take_along_axis(own, order, axis=1).ravel()
+    width = order.shape[1]
+    return pd.DataFrame({
+        'player_key': np.repeat(players, width)[valid].astype('int32'),
+        'rank': np.tile(np.arange(1, width + 1, dtype='int16'), len(players))[valid],
+        'neighbour_key': neighbours.ravel()[valid].astype('int32'),
+        'distance': distances.ravel()[valid].astype('float32'),
+    })
+
+
+# **********************************************************************************************************************************************************************
+# Process pool: the players of all positions are sent to every worker once (initializer), the tasks are (position, start, stop)
+# **********************************************************************************************************************************************************************
+
+_worker_positions = {}
+_worker_settings = {}
+_worker_engines = {}
+
+
+def _init_worker(positions, settings):
+    _worker_positions.clear()
+    _worker_positions.update(positions)
+    _worker_settings.clear()
+    _worker_settings.update(settings)
+    _worker_engines.clear()
+
+
+def _score_block(task):
+    position, start, stop = task
+    keys, values = _worker_positions[position]
+    engine = _worker_engines.get(position)
+    if engine is None:
+        engine = SimilarityEngine(pd.DataFrame({'player_key': keys}), SIMILARITY_METRICS, None, _worker_settings['distance'],
+                                  _worker_settings['missing'], values=values)
+        _worker_engines[position] = engine
+    result = nearest_comparables(engine, keys, values[start:stop], keys[start:stop], _worker_settings['k'])
+    return result.assign(position=position)
+
+
+# Comparables of all players of the index (see nfl_index.PlayerIndex), columns COMPARABLE_COLUMNS sorted by player_key, position, rank
+def build_comparables(index, k=COMPARABLES_K, distance=COMPARABLES_DISTANCE, missing=COMPARABLES_MISSING, workers=None, block_size=BLOCK_SIZE):
+    positions = {position: (index.combine_rows(position)['player_key'].to_numpy(), np.asarray(index.metric_matrix(position)))
+                 for position in index.positions}
+    settings = {'k': k, 'distance': distance, 'missing': missing}
+    tasks = [(position, start, min(start + block_size, len(keys)))
+             for position, (keys, _) in positions.items() for start in range(0, len(keys), block_size)]
+
+    if workers == 1:
+        _init_worker(positions, settings)
+        blocks = list(map(_score_block, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(positions, settings)) as pool:
+            blocks = list(pool.map(_score_block, tasks))
+
+    if not blocks:
+        return empty_comparables()
+    table = pd.concat(blocks, ignore_index=True).sort_values(['player_key', 'position', 'rank'], kind='stable').reset_index(drop=True)
+    table['position'] = table['position'].astype('category')
+    return table[COMPARABLE_COLUMNS]
+
+
+def write_comparables(table, path, settings):
+    arrow_table = pa.Table.from_pandas(table, preserve_index=False)
+    arrow_table = arrow_table.replace_schema_metadata({**(arrow_table.schema.metadata or {}), METADATA_KEY: json.dumps(settings).encode()})
+    pq.write_table(arrow_table, path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+
+def read_comparables(path):
+    arrow_table = pq.read_table(path)
+    return ComparablesTable(arrow_table.to_pandas(), json.loads(arrow_table.schema.metadata[METADATA_KEY]))
+
+
+class ComparablesTable:
+    def __init__(self, table, settings):
+        self.table = table
+        self.k = settings['k']
+        self.distance = settings['distance']
+        self.missing = settings['missing']
+        self._players = table['player_key'].to_numpy()
+
+    # Comparables of a player at a position (columns rank, neighbour_key, distance), rows of the player found by binary search
+    def lookup(self, position, player):
+        start, stop = np.searchsorted(self._players, [player, player + 1])
+        rows = self.table.iloc[start:stop]
+        return rows[rows['position'] == position][['rank', 'neighbour_key', 'distance']]
+
+
+def main():
+    # imported here: nfl_sources reads the table through this module
+    import nfl_sources
+
+    parser = argparse.ArgumentParser(description='Precompute the top-k historical comparables of every player within their position')
+    parser.add_argument('--data-dir', default=nfl_sources.DATA_DIR, help='directory of the dashboard data')
+    parser.add_argument('--k', type=int, default=COMPARABLES_K, help='comparables per player')
+    parser.add_argument('--distance', choices=DISTANCES, default=COMPARABLES_DISTANCE)
+    parser.add_argument('--missing', choices=MISSING_MODES, default=COMPARABLES_MISSING, help='handling of missing combine values')
+    parser.add_argument('--workers', type=int, default=None, help='processes scoring blocks (default: number of CPUs)')
+    parser.add_argument('--block-size', type=int, default=BLOCK_SIZE, help='players per task')
+    args = parser.parse_args()
+    if args.distance == 'mahalanobis' and args.missing == 'masked':
+        parser.error('the Mahalanobis distance needs --missing impute or complete')
+
+    combine_path = os.path.join(args.data_dir, os.path.basename(nfl_sources.COMBINE_CSV))
+    season_path = os.path.join(args.data_dir, os.path.basename(nfl_sources.SEASON_CSV))
+    # the player keys are the ones of the dashboard: the index is built like the one of the engine
+    engine = nfl_sources.build_engine(nfl_sources.engine_sources(combine_path, season_path), season_columns=['player_id', 'player_name', 'position', 'season'])
+    table = build_comparables(engine.index, args.k, args.distance, args.missing, args.workers, args.block_size)
+    path = nfl_sources.comparables_path(combine_path)
+    write_comparables(table, path, {'k': args.k, 'distance': args.distance, 'missing': args.missing})
+    print(f"{table['player_key'].nunique():,} players, {len(table):,} comparables -> {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+# **********************************************************************************************************************************************************************
+# Combine vs. season correlation matrix ("do combine values matter?", scripted version of the regressions of the exploration notebook)
+# - one row per (position, combine metric, season stat): players with both values (n), Pearson r with p-value, Spearman rho,
+#   bootstrap confidence intervals of both, and the least-squares line (slope, intercept, R^2) like scipy's linregress
+# - unit of observation: a player, season stats as the average over the seasons of the player (like the player averages of the
+#   notebook and the training table of the projection models, see nfl_models.training_table), missing values are left out per pair
+# - vectorized: the sums of all stats of a metric come from one matrix product, the bootstrap resamples are multinomial weights
+#   of the players (B x n) in batches, so a batch of resamples is one matrix product (Pearson) or one pass per column (Spearman,
+#   the ranks of a resample follow from the cumulative weights of the sorted values). Tasks (position, metric) run in a process pool
+# - the table is cached next to the combine data with the dataset version (a hash over the fingerprints of the combine and the
+#   seasonal data) and the settings in the Parquet metadata; the dashboard uses it only if the version matches its data, else it
+#   computes the matrix once per data version (see nfl_data.load_correlations)
+# - run via: python code/nfl_correlations.py [--data-dir 00_Data] [--resamples 1000] [--workers 4]
+# **********************************************************************************************************************************************************************
+import argparse
+import hashlib
+import json
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from nfl_aggregates import stat_columns
+from nfl_models import training_table
+from nfl_similarity import SIMILARITY_METRICS
+
+CORRELATION_COLUMNS = ['position', 'metric', 'stat', 'n', 'pearson', 'pearson_low', 'pearson_high', 'pearson_p',
+                       'spearman', 'spearman_low', 'spearman_high', 'slope', 'intercept', 'r2']
+
+# Bootstrap settings: resamples, coverage of the percentile intervals, resamples per batch (bounds the memory: batch x players weights)
+RESAMPLES = 1000
+CONFIDENCE = 0.95
+BATCH_SIZE = 200
+DEFAULT_SEED = 42
+
+# Pairs with fewer players get no statistics (NaN)
+MIN_CORRELATION_PLAYERS = 10
+
+# Key of the version and settings in the Parquet metadata
+METADATA_KEY = b'nfl_correlations'
+
+
+# Dataset version of a correlation table: hash over the data fingerprints ({'combine': ..., 'season': ...})
+def correlation_version(data_fingerprints):
+    return hashlib.sha256(json.dumps(data_fingerprints, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def correlation_settings(resamples=RESAMPLES, confidence=CONFIDENCE, seed=DEFAULT_SEED, metrics=SIMILARITY_METRICS):
+    return {'resamples': resamples, 'confidence': confidence, 'seed': seed, 'metrics': list(metrics)}
+
+
+# Seed of the resamples of one task (independent of the order and the number of workers)
+def task_seed(seed, position, metric):
+    return (seed + zlib.crc32(f'{position}/{metric}'.encode())) % 2**32
+
+
+# **********************************************************************************************************************************************************************
+# Vectorized statistics
+# **********************************************************************************************************************************************************************
+
+# Pearson r of weighted samples from the weighted sums (arrays of any shape), NaN for fewer than MIN_CORRELATION_PLAYERS or no variance
+def _pearson(n, sx, sy, sxx, syy, sxy):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = (sxy - sx * sy / n) / np.sqrt((sxx - sx * sx / n) * (syy - sy * sy / n))
+    return np.where(n >= MIN_CORRELATION_PLAYERS, np.clip(r, -1, 1), np.nan)
+
+
+# Sort order and ties of a column for weighted_ranks: (order, sorted positions of tied values, first and last sorted position of their ties)
+def rank_structure(values):
+    order = np.argsort(values, kind='stable')
+    sorted_values = values[order]
+    first = np.r_[True, sorted_values[1:] != sorted_values[:-1]]
+    last = np.r_[first[1:], True]
+    positions = np.arange(len(values))
+    first = np.maximum.accumulate(np.where(first, positions, 0))
+    last = np.minimum.accumulate(np.where(last, positions, len(values))[::-1])[::-1]
+    tied = np.flatnonzero(first != last)
+    return order, tied, first[tied], last[tied]
+
+
+# Average ranks (ties share their mean rank, like scipy's rankdata) of the values of a column in weighted samples.
+# structure: see rank_structure, weights: n x B (a player drawn w times counts w times, rows with missing values must have weight 0).
+# Returns the n x B ranks and weights in sorted order (ranks arbitrary for weight 0) and the B sums of weight x rank^2
+def weighted_ranks(structure, weights):
+    order, tied, first, last = structure
+    sorted_weights = weights[order]
+    cumulative = np.cumsum(sorted_weights, axis=0)
+    # weight of the values below + (weight of the equal values + 1) / 2, without ties: cumulative weight - (weight - 1) / 2
+    ranks = cumulative - (sorted_weights - 1) / 2
+    if len(tied):
+        ranks[tied] = (cumulative[last] + cumulative[first] - sorted_weights[first] + 1) / 2
+    return ranks, sorted_weights, np.einsum('nb,nb->b', sorted_weights * ranks, ranks)
+
+
+# Spearman rho of one metric with every stat in weighted samples: structures of the metric and of the stats (see rank_structure),
+# patterns: [(mask of the pairs with both values, stat columns with this mask)], weights n x B. Returns s x B
+def _spearman(x_structure, y_structures, patterns, weights):
+    rho = np.full((len(y_structures), weights.shape[1]), np.nan)
+    for mask, columns in patterns:
+        pair_weights = weights * mask[:, None].astype(weights.dtype)
+        n = pair_weights.sum(axis=0, dtype='float64')
+        # the weighted sum of the ranks 1..n is n (n + 1) / 2 (also with ties)
+        rank_sum = n * (n + 1) / 2
+        ranks, sorted_weights, sxx = weighted_ranks(x_structure, pair_weights)
+        weighted_rx = np.empty_like(ranks)
+        weighted_rx[x_structure[0]] = sorted_weights * ranks
+        syy = np.empty((len(columns), weights.shape[1]))
+        sxy = np.empty((len(columns), weights.shape[1]))
+        for i, column in enumerate(columns):
+            ry, _, syy[i] = weighted_ranks(y_structures[column], pair_weights)
+            sxy[i] = np.einsum('nb,nb->b', weighted_rx[y_structures[column][0]], ry)
+        rho[columns] = _pearson(n, rank_sum, rank_sum, sxx, syy, sxy)
+    return rho
+
+
+# Weighted sums of one metric x (n) with every stat Y (n x s), NaN = missing: weights n x B -> (n, sx, sy, sxx, syy, sxy), each s x B
+def _pearson_sums(x, Y, weights):
+    mx = ~np.isnan(x)
+    my = ~np.isnan(Y)
+    x0 = np.where(mx, x, 0.0)
+    y0 = np.where(my, Y, 0.0)
+    terms = np.concatenate([my & mx[:, None], x0[:, None] * my, y0 * mx[:, None], (x0 ** 2)[:, None] * my, y0 ** 2 * mx[:, None],
+                            x0[:, None] * y0], axis=1)
+    return np.split(terms.T @ weights, 6, axis=0)
+
+
+# Statistics of one metric with every stat of a position: x (n), Y (n x s), NaN = missing. Returns a frame with one row per stat
+def correlate(x, Y, stats, resamples=RESAMPLES, confidence=CONFIDENCE, seed=DEFAULT_SEED, batch_size=BATCH_SIZE):
+    x = np.asarray(x, dtype='float64')
+    Y = np.asarray(Y, dtype='float64')
+    # Spearman: ranks of the values as they are (centering could merge close values), stats with the same missing values share
+    # the weights and the ranks of the metric
+    x_structure = rank_structure(x)
+    y_structures = [rank_structure(column) for column in Y.T]
+    masks = (~np.isnan(x))[:, None] & ~np.isnan(Y)
+    patterns = {}
+    for column in range(Y.shape[1]):
+        patterns.setdefault(masks[:, column].tobytes(), []).append(column)
+    patterns = [(masks[:, columns[0]], columns) for columns in patterns.values()]
+    # Pearson and least squares: x and Y centered (by the mean of their values) for precision
+    x_mean = np.nanmean(x) if np.isfinite(x).any() else 0.0
+    y_mean = np.array([np.nanmean(column) if np.isfinite(column).any() else 0.0 for column in Y.T])
+    x = x - x_mean
+    Y = Y - y_mean
+
+    # point estimates: all players with weight 1
+    ones = np.ones((len(x), 1))
+    n, sx, sy, sxx, syy, sxy = (values[:, 0] for values in _pearson_sums(x, Y, ones))
+    pearson = _pearson(n, sx, sy, sxx, syy, sxy)
+    spearman = _spearman(x_structure, y_structures, patterns, ones)[:, 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(n >= MIN_CORRELATION_PLAYERS, (sxy - sx * sy / n) / (sxx - sx * sx / n), np.nan)
+        intercept = sy / n + y_mean - slope * (sx / n + x_mean)
+        t = pearson * np.sqrt((n - 2) / ((1 - pearson) * (1 + pearson)))
+    from scipy import special
+    pearson_p = np.where(np.isnan(pearson), np.nan, 2 * special.stdtr(np.maximum(n - 2, 1), -np.abs(t)))
+
+    # bootstrap: resamples of the players of the position (with replacement) as weights (players x resamples: how often a player
+    # is drawn), in batches. float32: the weights and ranks are exact (integers / halves), the sums are precise to ~1e-6 of r
+    rng = np.random.default_rng(seed)
+    pearson_samples = []
+    spearman_samples = []
+    for start in range(0, resamples, batch_size):
+        size = min(batch_size, resamples - start)
+        draws = rng.integers(0, len(x), size=(size, len(x))) + (np.arange(size) * len(x))[:, None]
+        weights = np.bincount(draws.ravel(), minlength=size * len(x)).reshape(size, len(x)).T.astype('float32')
+        pearson_samples.append(_pearson(*_pearson_sums(x, Y, weights)))
+        spearman_samples.append(_spearman(x_structure, y_structures, patterns, weights))
+    bounds = [(1 - confidence) / 2, (1 + confidence) / 2]
+    pearson_low, pearson_high = _quantiles(np.concatenate(pearson_samples, axis=1), bounds)
+    spearman_low, spearman_high = _quantiles(np.concatenate(spearman_samples, axis=1), bounds)
+
+    return pd.DataFrame({'stat': list(stats), 'n': n.round().astype('int64'), 'pearson': pearson, 'pearson_low': pearson_low,
+                         'pearson_high': pearson_high, 'pearson_p': pearson_p, 'spearman': spearman, 'spearman_low': spearman_low,
+                         'spearman_high': spearman_high, 'slope': slope, 'intercept': intercept, 'r2': pearson ** 2})
+
+
+# Quantiles per stat of bootstrap samples (stats x resamples), NaN for stats without valid samples
+def _quantiles(samples, bounds):
+    valid = ~np.isnan(samples).all(axis=1)
+    result = np.full((len(bounds), len(samples)), np.nan)
+    result[:, valid] = np.nanquantile(samples[valid], bounds, axis=1)
+    return result
+
+
+# **********************************************************************************************************************************************************************
+# Process pool: the player tables of all positions are sent to every worker once (initializer), the tasks are (position, metric)
+# **********************************************************************************************************************************************************************
+
+_worker_tables = {}
+_worker_settings = {}
+
+
+def _init_worker(tables, settings):
+    _worker_tables.clear()
+    _worker_tables.update(tables)
+    _worker_settings.clear()
+    _worker_settings.update(settings)
+
+
+def _correlate_task(task):
+    position, metric = task
+    table, stats = _worker_tables[position]
+    settings = _worker_settings
+    result = correlate(table[metric].to_numpy(dtype='float64'), table[stats].to_numpy(dtype='float64'), stats, settings['resamples'],
+                       settings['confidence'], task_seed(settings['seed'], position, metric))
+    return result.assign(position=position, metric=metric)
+
+
+# Correlation matrix of the combine data (see nfl_sources.read_combine_source) and the seasonal data (all stat columns),
+# columns CORRELATION_COLUMNS sorted by position, metric, stat. stats: season stats (default: all numeric stats of the seasonal data)
+def build_correlations(combine, season, settings=None, stats=None, workers=None):
+    settings = correlation_settings() if settings is None else settings
+    stats = stat_columns(season) if stats is None else list(stats)
+    tables = {}
+    for position in sorted(combine['Pos'].dropna().unique()):
+        table = training_table(combine, season, position, stats, settings['metrics'])
+        if len(table) >= MIN_CORRELATION_PLAYERS:
+            tables[position] = (table, stats)
+    tasks = [(position, metric) for position in tables for metric in settings['metrics']]
+
+    if workers == 1:
+        _init_worker(tables, settings)
+        results = list(map(_correlate_task, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(tables, settings)) as pool:
+            results = list(pool.map(_correlate_task, tasks))
+
+    if not results:
+        return pd.DataFrame(columns=CORRELATION_COLUMNS)
+    return pd.concat(results, ignore_index=True)[CORRELATION_COLUMNS]
+
+
+def write_correlations(table, path, version, settings):
+    arrow_table = pa.Table.from_pandas(table, preserve_index=False)
+    metadata = json.dumps({'version': version, 'settings': settings}).encode()
+    arrow_table = arrow_table.replace_schema_metadata({**(arrow_table.schema.metadata or {}), METADATA_KEY: metadata})
+    pq.write_table(arrow_table, path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+
+# Dataset version of a stored correlation table (None if there is none)
+def stored_version(path):
+    if not os.path.exists(path):
+        return None
+    metadata = pq.read_schema(path).metadata or {}
+    return json.loads(metadata[METADATA_KEY])['version'] if METADATA_KEY in metadata else None
+
+
+# Stored table and its settings
+def read_correlations(path):
+    arrow_table = pq.read_table(path)
+    return arrow_table.to_pandas(), json.loads(arrow_table.schema.metadata[METADATA_KEY])['settings']
+
+
+def main():
+    # imported here: nfl_sources reads the table through this module
+    import nfl_sources
+
+    parser = argparse.ArgumentParser(description='Correlations of the combine metrics with the seasonal stats per position, with bootstrap intervals')
+    parser.add_argument('--data-dir', default=nfl_sources.DATA_DIR, help='directory of the dashboard data')
+    parser.add_argument('--resamples', type=int, default=RESAMPLES, help='bootstrap resamples')
+    parser.add_argument('--confidence', type=float, default=CONFIDENCE, help='coverage of the bootstrap intervals')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='base seed of the resamples')
+    parser.add_argument('--workers', type=int, default=None, help='processes computing (position, metric) tasks (default: number of CPUs)')
+    args = parser.parse_args()
+
+    combine_csv_path = os.path.join(args.data_dir, os.path.basename(nfl_sources.COMBINE_CSV))
+    season_csv_path = os.path.join(args.data_dir, os.path.basename(nfl_sources.SEASON_CSV))
+    settings = correlation_settings(args.resamples, args.confidence, args.seed)
+    table, version = nfl_sources.compute_correlations(combine_csv_path, season_csv_path, settings, args.workers)
+    path = nfl_sources.correlations_path(combine_csv_path)
+    print(f"{len(table):,} pairs ({table['position'].nunique()} positions), version {version} -> {path}")
+
+
+if __name__ == '__main__':
+    main()
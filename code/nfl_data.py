@@ -0,0 +1,52 @@
+# **********************************************************************************************************************************************************************
+# Data access layer for the NFL dashboard: the Streamlit-cached loaders over the data sources (see nfl_sources.py)
+# - the analytics engine and the combine vs. season correlation matrix of the current data version (the dashboard reads the data
+#   sets only through these, see nfl_sources.py for the readers)
+# - results are memoized across reruns and sessions via st.cache_resource, keyed by the content hash of the source files
+#   (the hash is only recomputed when the mtime or size of a file changes)
+# - the returned engine and frames are shared between all sessions: treat them as read-only
+# - tools without the dashboard (HTTP service, offline jobs, benchmarks) use nfl_sources.py directly and do not need Streamlit
+# **********************************************************************************************************************************************************************
+import streamlit as st
+
+from nfl_correlations import build_correlations, correlation_settings, read_correlations, stored_version
+from nfl_profile import stage
+from nfl_sources import (COMBINE_CSV, SEASON_CSV, build_engine, correlation_sources, correlations_path, engine_sources, read_combine_source,
+                         read_season_source, source_fingerprints)
+
+
+# **********************************************************************************************************************************************************************
+# Analytics engine (see nfl_engine.py and nfl_sources.build_engine)
+# **********************************************************************************************************************************************************************
+
+# Engine of the current data version, built once and shared across reruns and sessions like the frames
+# (the stages of the build are only recorded in the rerun that builds the engine, later reruns record the cache lookup only)
+def load_engine(combine_path=COMBINE_CSV, season_path=SEASON_CSV, season_columns=None):
+    with stage('load_engine'):
+        sources = engine_sources(combine_path, season_path)
+        return _load_engine(tuple(sorted(sources.items())), source_fingerprints(sources), None if season_columns is None else tuple(season_columns))
+
+
+@st.cache_resource(show_spinner="Loading data...", max_entries=4)
+def _load_engine(sources, fingerprints, season_columns):
+    return build_engine(dict(sources), None if season_columns is None else list(season_columns), version=(fingerprints, season_columns))
+
+
+# **********************************************************************************************************************************************************************
+# Combine vs. season correlation matrix (see nfl_correlations.py)
+# **********************************************************************************************************************************************************************
+
+# Correlation matrix of the current data for the dashboard: (table, settings, version). The stored table is used if its version
+# matches the data, else the matrix is computed in the dashboard process (without process pool) and kept for the data version
+def load_correlations(combine_path=COMBINE_CSV, season_path=SEASON_CSV):
+    with stage('load_correlations'):
+        combine, season, version = correlation_sources(combine_path, season_path)
+        return _load_correlations(correlations_path(combine_path), combine, season, version) + (version,)
+
+
+@st.cache_resource(show_spinner="Computing the correlations...", max_entries=4)
+def _load_correlations(path, combine, season, version):
+    if stored_version(path) == version:
+        return read_correlations(path)
+    settings = correlation_settings()
+    return build_correlations(read_combine_source(combine), read_season_source(season), settings, workers=1), settings
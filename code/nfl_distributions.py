@@ -0,0 +1,104 @@
+# **********************************************************************************************************************************************************************
+# Position-level distributions of the combine metrics
+# - summary table with one row per (position, metric): count, mean, quartiles, whiskers (1.5 IQR) and outliers,
+#   computed with matplotlib's cbook.boxplot_stats (the same statistics seaborn's boxplot computes on every call)
+#   over the players of the position with all metrics recorded (the population of the original boxplots: dropna over all metrics)
+# - the boxplots are drawn from the summaries with Axes.bxp, the raw rows are not needed for drawing
+# - the table is written by the ingest step (python code/nfl_ingest.py) and rebuilt from the data if no current table exists
+# - percentile ranks of single values are looked up in the sorted values of the position by binary search (O(log n)),
+#   among all players with a value of the metric
+# **********************************************************************************************************************************************************************
+import numpy as np
+import pandas as pd
+
+from nfl_index import group_rows
+from nfl_similarity import SIMILARITY_METRICS
+
+SUMMARY_COLUMNS = ['Pos', 'metric', 'count', 'mean', 'q1', 'med', 'q3', 'whislo', 'whishi', 'fliers']
+
+# Same whisker rule as sns.boxplot / plt.boxplot
+WHISKER_IQR = 1.5
+
+
+# Sorted non-missing values per (position, metric): {(position, metric): array}.
+# complete: only the players with all metrics recorded, else every player with a value of the metric
+def sorted_values(combine, metrics=SIMILARITY_METRICS, complete=False):
+    if complete:
+        combine = combine.dropna(subset=list(metrics))
+    values = {}
+    for position, rows in group_rows(combine['Pos']).items():
+        for metric in metrics:
+            column = combine[metric].to_numpy(dtype='float64')[rows]
+            values[(position, metric)] = np.sort(column[~np.isnan(column)])
+    return values
+
+
+# Summary table of the combine data (columns: SUMMARY_COLUMNS), positions or metrics without values are left out
+def build_summaries(combine, metrics=SIMILARITY_METRICS):
+    # matplotlib is only imported if no current summary table exists (it is not needed to look the summaries up)
+    from matplotlib import cbook
+
+    records = []
+    for (position, metric), values in sorted_values(combine, metrics, complete=True).items():
+        if len(values) == 0:
+            continue
+        stats = cbook.boxplot_stats(values, whis=WHISKER_IQR)[0]
+        records.append({
+            'Pos': position,
+            'metric': metric,
+            'count': len(values),
+            'mean': stats['mean'],
+            'q1': stats['q1'],
+            'med': stats['med'],
+            'q3': stats['q3'],
+            'whislo': stats['whislo'],
+            'whishi': stats['whishi'],
+            'fliers': np.asarray(stats['fliers'], dtype='float64'),
+        })
+    return pd.DataFrame.from_records(records, columns=SUMMARY_COLUMNS)
+
+
+class PositionDistributions:
+    # summaries: table from build_summaries (e.g. read from the ingest output), built from the combine data if None.
+    # A table whose counts are not the numbers of complete players per position (e.g. written before the boxplots were restricted
+    # to complete players) is rebuilt
+    def __init__(self, combine, summaries=None, metrics=SIMILARITY_METRICS):
+        self.metrics = list(metrics)
+        self._values = sorted_values(combine, self.metrics)
+        if summaries is not None:
+            complete = combine.dropna(subset=self.metrics)['Pos'].astype('object').value_counts()
+            if not (summaries['count'].to_numpy() == summaries['Pos'].map(complete).to_numpy()).all():
+                summaries = None
+        if summaries is None:
+            summaries = build_summaries(combine, self.metrics)
+        self.summaries = summaries
+        self._stats = {(record['Pos'], record['metric']): record for record in summaries.to_dict('records')}
+
+    # Statistics of a position and metric in the format of Axes.bxp, None without values
+    def box_stats(self, position, metric):
+        record = self._stats.get((position, metric))
+        if record is None:
+            return None
+        stats = {key: record[key] for key in ['mean', 'q1', 'med', 'q3', 'whislo', 'whishi']}
+        stats['fliers'] = np.asarray(record['fliers'], dtype='float64')
+        stats['label'] = position
+        return stats
+
+    # Percentile rank (0-100) of a value among the players of a position: share of smaller values, ties count half
+    # (like scipy.stats.percentileofscore(kind='mean')). NaN if the value is missing or the position has no values.
+    def percentile(self, position, metric, value):
+        values = self._values.get((position, metric))
+        if values is None or len(values) == 0 or value is None or np.isnan(value):
+            return np.nan
+        below = np.searchsorted(values, value, side='left')
+        below_or_equal = np.searchsorted(values, value, side='right')
+        return 100.0 * (below + below_or_equal) / (2 * len(values))
+
+
+# Percentile rank as ordinal text, e.g. 87.2 -> '87th percentile' (None for a missing value)
+def percentile_label(value):
+    if value is None or np.isnan(value):
+        return None
+    rank = int(round(value))
+    suffix = 'th' if 10 <= rank % 100 <= 20 else {1: 'st', 2: 'nd', 3: 'rd'}.get(rank % 10, 'th')
+    return f'{rank}{suffix} percentile'
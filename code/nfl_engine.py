@@ -0,0 +1,232 @@
+# **********************************************************************************************************************************************************************
+# Analytics engine: the computations of the dashboard without Streamlit
+# - holds the player index, the combine distributions, the season aggregates cube, the projection models, the all-players
+#   comparables table and the career-trajectory store of one data version
+#   (built by nfl_sources.build_engine, cached per data version by nfl_data.load_engine)
+# - used by the dashboard (main_nfl_app.py) and by the HTTP service (nfl_api.py), both only handle input and output
+# - the engine and its frames are shared between sessions / requests: treat them as read-only.
+#   Similarity engines (combine metrics or career vectors) are built on first use per position and settings and kept in a small
+#   LRU cache (thread-safe)
+# **********************************************************************************************************************************************************************
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import nfl_batch
+from nfl_careers import CAREER_YEARS
+from nfl_comparables import COMPARABLES_DISTANCE, COMPARABLES_K, COMPARABLES_MISSING, nearest_comparables
+from nfl_models import project_prospects
+from nfl_profile import stage
+from nfl_similarity import SIMILARITY_METRICS, SimilarityEngine
+
+# Similarity engines kept per engine (one per position and settings)
+SIMILARITY_CACHE_SIZE = 64
+
+
+class AnalyticsEngine:
+    # version: identifies the data the engine was built from (used in the keys of derived caches, e.g. rendered figures, API responses)
+    # comparables: precomputed comparables of all players (see nfl_comparables.py), None: computed per player on request
+    # careers: career-trajectory store (see nfl_careers.py), None: seasonal histories are taken from the seasonal data, no career search
+    def __init__(self, player_index, distributions, season_cube, projection_models=None, version=None, comparables=None, careers=None):
+        self.index = player_index
+        self.distributions = distributions
+        self.season_cube = season_cube
+        self.projection_models = projection_models
+        self.version = version
+        self.comparables = comparables
+        self.careers = careers
+        self.first_season, self.last_season = player_index.season_range
+        self._similarity_engines = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def positions(self):
+        return self.index.positions
+
+    def players(self, position):
+        return self.index.players(position)
+
+    def label(self, player):
+        return self.index.label(player)
+
+    # **************************************************************************************************************************************************************
+    # Combine data
+    # **************************************************************************************************************************************************************
+
+    # Combine values of a player at a position ({metric: value}, NaN for tests the player skipped), None without combine data
+    def combine_values(self, position, player, metrics=SIMILARITY_METRICS):
+        rows = self.index.combine_player(position, player)
+        if rows.empty:
+            return None
+        return {metric: float(rows[metric].to_numpy(dtype='float64')[0]) for metric in metrics}
+
+    # Percentile ranks of combine values within a position ({metric: percentile}, NaN for missing values)
+    def percentiles(self, position, values, metrics=SIMILARITY_METRICS):
+        return {metric: self.distributions.percentile(position, metric, values.get(metric, np.nan)) for metric in metrics}
+
+    # **************************************************************************************************************************************************************
+    # Similar players
+    # **************************************************************************************************************************************************************
+
+    # Similarity engine of a position and settings (see nfl_similarity.py), built on first use
+    def similarity_engine(self, position, metrics=SIMILARITY_METRICS, weights=None, distance='euclidean', missing='complete'):
+        key = (position, tuple(metrics), None if weights is None else tuple(sorted(weights.items())), distance, missing)
+
+        def build():
+            rows = self.index.combine_rows(position)
+            with stage('similarity_engine_build', rows=len(rows)):
+                return SimilarityEngine(rows, list(metrics), weights, distance, missing, values=self.index.metric_matrix(position, metrics))
+        return self._cached_engine(key, build)
+
+    # Engine of the LRU cache under key, built by build() on a miss
+    def _cached_engine(self, key, build):
+        with self._lock:
+            engine = self._similarity_engines.get(key)
+            if engine is not None:
+                self._similarity_engines.move_to_end(key)
+                return engine
+        engine = build()
+        with self._lock:
+            self._similarity_engines[key] = engine
+            while len(self._similarity_engines) > SIMILARITY_CACHE_SIZE:
+                self._similarity_engines.popitem(last=False)
+        return engine
+
+    # Top k players of a position most similar to the combine values of a new player ({metric: value}),
+    # columns Rank, player_key, player_name, label, Distance and the metrics
+    def find_similar_players(self, position, player, k=10, weights=None, distance='euclidean', missing='complete', metrics=SIMILARITY_METRICS):
+        engine = self.similarity_engine(position, metrics, weights, distance, missing)
+        with stage('similarity', rows=len(engine.players)):
+            similar_players = engine.query(player, k)
+        keys = similar_players['player_key'].to_numpy()
+        return similar_players.assign(label=[self.index.label(key) for key in keys])[
+            ['Rank', 'player_key', 'player_name', 'label', 'Distance'] + list(metrics)]
+
+    # Top k closest historical players of an existing player within the position (the player left out), columns as find_similar_players.
+    # Looked up in the precomputed table if it was built with the same settings and at least k comparables, else computed
+    def player_comparables(self, position, player, k=COMPARABLES_K, distance=COMPARABLES_DISTANCE, missing=COMPARABLES_MISSING,
+                           metrics=SIMILARITY_METRICS):
+        table = self.comparables
+        if table is not None and table.k >= k and (table.distance, table.missing) == (distance, missing) and list(metrics) == SIMILARITY_METRICS:
+            with stage('comparables_lookup'):
+                comparables = table.lookup(position, player).head(k)
+        else:
+            values = self.combine_values(position, player, metrics)
+            if values is None:
+                return None
+            engine = self.similarity_engine(position, metrics, None, distance, missing)
+            with stage('comparables', rows=len(engine.players)):
+                comparables = nearest_comparables(engine, engine.players['player_key'].to_numpy(), np.array([[values[metric] for metric in metrics]]),
+                                                  [player], k)
+        keys = comparables['neighbour_key'].to_numpy()
+        rows = self.index.combine_players(position, keys).reset_index(drop=True)
+        return rows.assign(Rank=comparables['rank'].to_numpy(), label=[self.index.label(key) for key in keys],
+                           Distance=comparables['distance'].to_numpy(dtype='float64'))[['Rank', 'player_key', 'player_name', 'label', 'Distance'] + list(metrics)]
+
+    # Top k comparables of every prospect of a draft class (see nfl_batch.score_prospects)
+    def score_prospects(self, prospects, k=10, weights=None, distance='euclidean', missing='complete', metrics=SIMILARITY_METRICS):
+        with stage('batch_similarity', rows=len(prospects)):
+            return nfl_batch.score_prospects(prospects, lambda position: self.similarity_engine(position, metrics, weights, distance, missing), k=k, metrics=metrics)
+
+    # **************************************************************************************************************************************************************
+    # Similar careers (see nfl_careers.py)
+    # **************************************************************************************************************************************************************
+
+    # Similarity engine over the career vectors of a position (first `years` career years of the stats), built on first use
+    def career_engine(self, position, years=CAREER_YEARS, stats=None, basis='per_game'):
+        stats = self.careers.search_stats(position) if stats is None else list(stats)
+
+        def build():
+            with stage('career_engine_build', rows=len(self.careers.position_players(position))):
+                return self.careers.similarity_engine(position, years, stats, basis)
+        return self._cached_engine(('careers', position, years, tuple(stats), basis), build)
+
+    # Top k players of the same position (position of their last season) whose first `years` career years are closest to those of a
+    # player (the player left out), columns Rank, player_key, label, First season, Seasons, Distance.
+    # None without a career store or without seasons of the player
+    def similar_careers(self, player, years=CAREER_YEARS, k=10, stats=None, basis='per_game'):
+        careers = self.careers
+        position = None if careers is None else careers.position(player)
+        if position is None:
+            return None
+        stats = careers.search_stats(position) if stats is None else list(stats)
+        engine = self.career_engine(position, years, stats, basis)
+        with stage('similar_careers', rows=len(engine.players)):
+            comparables = nearest_comparables(engine, engine.players['player_key'].to_numpy(), careers.career_vectors([player], years, stats, basis),
+                                              [player], k)
+        keys = comparables['neighbour_key'].to_numpy()
+        rows = careers.rows(keys)
+        return comparables.assign(player_key=keys, label=[self.index.label(key) for key in keys], **{
+            'First season': careers.first_season[rows], 'Seasons': careers.mask[rows].sum(axis=1),
+            'Distance': comparables['distance'].to_numpy(dtype='float64')}).rename(columns={'rank': 'Rank'})[
+            ['Rank', 'player_key', 'label', 'First season', 'Seasons', 'Distance']].reset_index(drop=True)
+
+    # **************************************************************************************************************************************************************
+    # Seasonal data
+    # **************************************************************************************************************************************************************
+
+    # Season rows of one or several players (seasons first..last, default: all) with the display labels as player_name.
+    # stats: only rows where these stats are recorded
+    def season_history(self, players, first=None, last=None, stats=None):
+        with stage('season_history') as record:
+            history = self.index.season_history(players, first, last)
+            if stats is not None:
+                history = history.dropna(subset=list(stats))
+            record.rows = len(history)
+            return self.index.with_labels(history)
+
+    # Season rows of players taken from the career store (player_key, season, career_year, games and the stats of the store) with the
+    # display labels as player_name; falls back to season_history without a store or for stats the store does not hold
+    def career_history(self, players, first=None, last=None, stats=None):
+        if self.careers is None or not set(stats or []) <= set(self.careers.stats):
+            return self.season_history(players, first, last, stats)
+        with stage('career_history') as record:
+            history = self.careers.history(players, first, last, stats)
+            record.rows = len(history)
+            return self.index.with_labels(history)
+
+    # Yearly aggregate of a stat over all player seasons of a position (columns season and <stat>, see nfl_aggregates.py)
+    def season_series(self, position, stat, aggregate='mean', first=None, last=None):
+        with stage('season_series'):
+            return self.season_cube.series(position, stat, aggregate, first, last)
+
+    def position_mean_per_year(self, position, stat, first=None, last=None):
+        return self.season_series(position, stat, 'mean', first, last)
+
+    # **************************************************************************************************************************************************************
+    # Player profile: combine values with percentiles per position and the seasonal stats
+    # **************************************************************************************************************************************************************
+
+    def player_profile(self, player, first=None, last=None):
+        name = self.index.name(player)
+        if name is None:
+            return None
+        combine = []
+        for position in self.positions:
+            values = self.combine_values(position, player)
+            if values is not None:
+                combine.append({'position': position, 'values': values, 'percentiles': self.percentiles(position, values)})
+        return {
+            'player_key': int(player),
+            'player_name': name,
+            'label': self.index.label(player),
+            'combine': combine,
+            'seasons': self.season_history(player, first, last),
+        }
+
+    # **************************************************************************************************************************************************************
+    # Projections (see nfl_models.py), None without trained models for the position
+    # **************************************************************************************************************************************************************
+
+    def project_player(self, position, values):
+        if self.projection_models is None or not self.projection_models.targets(position):
+            return None
+        with stage('projection', rows=1):
+            return self.projection_models.project_player(position, values)
+
+    def project_prospects(self, prospects):
+        if self.projection_models is None:
+            return None
+        with stage('projection', rows=len(prospects)):
+            return project_prospects(prospects, self.projection_models)
@@ -0,0 +1,144 @@
+# **********************************************************************************************************************************************************************
+# Ingestion pipeline for the seasonal stats (scripted version of 01_Data exploration/NFL_Data_seasonal.ipynb)
+# - fetches the seasonal stats and rosters per season via nfl_data_py (nfl.import_seasonal_data / nfl.import_seasonal_rosters)
+# - only seasons that are not stored yet are fetched, --refresh fetches stored seasons again (e.g. the running season after a new week)
+# - the rosters of a season are merged onto the stats of the same season, the rows are stored as merged: duplicate player seasons
+#   are resolved when the partitions are read, over all seasons with the same rule as the seasonal CSV (see nfl_sources.deduplicate_seasons);
+#   the collapsed duplicates are listed per season in seasons/season_<year>_duplicates.csv
+# - each season is written to its own partition (<data dir>/seasons/season_<year>.parquet), existing partitions are not rewritten
+# - the raw downloads are kept in a cache directory (<data dir>/raw). With --offline only this directory is read,
+#   so the pipeline runs without network against a local fixture with the same layout:
+#     seasonal_data_<year>.parquet (or .csv), seasonal_rosters_<year>.parquet (or .csv)
+# - afterwards the season aggregates cube is updated (only the changed seasons, see nfl_aggregates.py)
+#   and new players are added to the player dimension (see nfl_players.py)
+# - run via: python code/nfl_fetch.py [--first 2010] [--last 2023] [--offline] [--refresh 2024]
+# **********************************************************************************************************************************************************************
+import argparse
+import datetime
+import os
+
+import pandas as pd
+
+import nfl_sources
+from nfl_ingest import build_cube_table, build_dimension_table, write_duplicate_report
+
+# First season of the dashboard data
+FIRST_SEASON = 2010
+
+# Roster columns merged onto the seasonal stats
+ROSTER_COLUMNS = ['player_id', 'season', 'player_name', 'position', 'draft_number']
+
+
+# Most recent season that has started (the NFL season starts in September)
+def latest_season(today=None):
+    today = today or datetime.date.today()
+    return today.year if today.month >= 9 else today.year - 1
+
+
+def raw_path(cache_dir, kind, season, suffix='.parquet'):
+    return os.path.join(cache_dir, f'{kind}_{int(season)}{suffix}')
+
+
+def _download(kind, season):
+    import nfl_data_py as nfl
+    if kind == 'seasonal_data':
+        return nfl.import_seasonal_data([season])
+    return nfl.import_seasonal_rosters([season])
+
+
+# Raw data of one season from the cache directory, downloaded (and cached) if missing.
+# Returns None if the season is not available (offline and not cached).
+def fetch_raw(kind, season, cache_dir, offline=False, refresh=False):
+    cached = raw_path(cache_dir, kind, season)
+    if not refresh or offline:
+        if os.path.exists(cached):
+            return pd.read_parquet(cached)
+        if os.path.exists(raw_path(cache_dir, kind, season, '.csv')):
+            return pd.read_csv(raw_path(cache_dir, kind, season, '.csv'), dtype={'player_id': 'object'})
+    if offline:
+        return None
+
+    df = _download(kind, season)
+    os.makedirs(cache_dir, exist_ok=True)
+    df.to_parquet(cached, engine='pyarrow', index=False)
+    return df
+
+
+# Seasonal stats of one season with the roster information (player name, position, draft number) of that season
+# (a player listed with several roster entries keeps one row per entry)
+def merge_season(stats, rosters):
+    rosters = rosters[[column for column in ROSTER_COLUMNS if column in rosters.columns]].drop_duplicates()
+    stats = stats.drop(columns=[column for column in ROSTER_COLUMNS[2:] if column in stats.columns])
+    df = rosters.merge(stats, on=['player_id', 'season'], how='inner')
+    return nfl_sources.season_rows(df)
+
+
+# Write a season partition (written to a temporary file first, so readers never see a partial file)
+def write_partition(df, directory, season):
+    os.makedirs(directory, exist_ok=True)
+    path = nfl_sources.partition_path(directory, season)
+    df.to_parquet(path + '.tmp', engine='pyarrow', index=False)
+    os.replace(path + '.tmp', path)
+    return path
+
+
+# Fetch and store all seasons first..last that are not stored yet (plus the seasons in refresh). Returns the written seasons.
+def ingest_seasons(first, last, directory, cache_dir, offline=False, refresh=()):
+    stored = set(nfl_sources.stored_seasons(directory))
+    written = []
+    for season in range(first, last + 1):
+        if season in stored and season not in refresh:
+            continue
+        stats = fetch_raw('seasonal_data', season, cache_dir, offline, season in refresh)
+        rosters = fetch_raw('seasonal_rosters', season, cache_dir, offline, season in refresh)
+        if stats is None or rosters is None:
+            print(f'{season}: not available (offline, not in {cache_dir})')
+            continue
+        df = merge_season(stats, rosters)
+        path = write_partition(df, directory, season)
+        print(f'{season}: {len(df):,} rows -> {path}')
+        written.append(season)
+    if written:
+        write_duplicate_reports(directory)
+    return written
+
+
+# Duplicate reports of all stored seasons (a new season can change the position kept in other seasons of its players)
+def write_duplicate_reports(directory):
+    duplicates = nfl_sources.partition_duplicates(directory)
+    for season in nfl_sources.stored_seasons(directory):
+        report = duplicates[duplicates['season'] == season]
+        report_path = os.path.splitext(nfl_sources.partition_path(directory, season))[0] + '_duplicates.csv'
+        if len(report):
+            write_duplicate_report(report, report_path)
+        elif os.path.exists(report_path):
+            os.remove(report_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fetch the seasonal stats that are not stored yet and append them as season partitions')
+    parser.add_argument('--first', type=int, default=FIRST_SEASON, help='first season')
+    parser.add_argument('--last', type=int, default=latest_season(), help='last season (default: the latest started season)')
+    parser.add_argument('--refresh', type=int, nargs='*', default=[], help='seasons to fetch again even if stored')
+    parser.add_argument('--data-dir', default=nfl_sources.DATA_DIR, help='directory of the dashboard data')
+    parser.add_argument('--cache-dir', default=None, help='directory of the raw downloads (default: <data dir>/raw)')
+    parser.add_argument('--offline', action='store_true', help='only read the cache directory, no downloads')
+    args = parser.parse_args()
+
+    season_csv_path = os.path.join(args.data_dir, os.path.basename(nfl_sources.SEASON_CSV))
+    directory = nfl_sources.partition_dir(season_csv_path)
+    cache_dir = args.cache_dir or os.path.join(args.data_dir, 'raw')
+
+    written = ingest_seasons(args.first, args.last, directory, cache_dir, args.offline, set(args.refresh))
+    if written or not os.path.exists(nfl_sources.cube_path(season_csv_path)):
+        if nfl_sources.partition_files(directory):
+            build_cube_table(directory, season_csv_path)
+    if written:
+        combine_csv_path = os.path.join(args.data_dir, os.path.basename(nfl_sources.COMBINE_CSV))
+        combine_source = nfl_sources.resolve_source(combine_csv_path)
+        build_dimension_table(combine_source if os.path.exists(combine_source) else None, directory, combine_csv_path)
+    print(f'Stored seasons: {", ".join(map(str, nfl_sources.stored_seasons(directory))) or "none"}')
+
+
+if __name__ == '__main__':
+    main()
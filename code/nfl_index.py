@@ -0,0 +1,159 @@
+# **********************************************************************************************************************************************************************
+# In-memory lookup index for the combine and seasonal data
+# - built once per data version (see nfl_sources.build_engine, cached by nfl_data.load_engine), replaces the boolean masks over the full tables
+# - players are identified by the int32 player_key of the player dimension (see nfl_players.py), both tables get a player_key column;
+#   names are only used for display (labels are made unique for players sharing a name)
+# - every key (position / player) maps to an array of row positions; lookups are a dict access plus a take of the matching rows
+# - the combine rows are ordered by position when the index is built: the rows of a position are one contiguous block,
+#   combine_rows / metric_matrix return views of the shared frame and of the contiguous float64 matrix of the similarity metrics
+# - rows of the seasonal data are sorted by season within each key, season ranges are resolved with a binary search
+# - the index and its frames are shared by all sessions: the returned frames and arrays must not be modified
+# **********************************************************************************************************************************************************************
+import numpy as np
+import pandas as pd
+
+from nfl_players import build_player_dimension, player_keys
+from nfl_similarity import SIMILARITY_METRICS
+
+EMPTY_ROWS = np.empty(0, dtype='int64')
+
+
+# Row positions per key: {key: positions}. Keys keep their order of appearance, NaN keys are skipped.
+# With sort_by the positions of each key are ordered by that column, otherwise by their original order.
+def group_rows(keys, sort_by=None):
+    keys = np.asarray(keys)
+    codes, uniques = pd.factorize(keys if keys.dtype.kind in 'iu' else keys.astype('object'))
+    if sort_by is None:
+        order = np.argsort(codes, kind='stable')
+    else:
+        order = np.lexsort((np.asarray(sort_by), codes))
+    order = order[codes[order] >= 0]
+    if len(order) == 0:
+        return {}
+    groups = np.split(order, np.flatnonzero(np.diff(codes[order])) + 1)
+    return {uniques[codes[rows[0]]]: rows for rows in groups}
+
+
+class PlayerIndex:
+    # dimension: player dimension table (see nfl_players.py), built from both tables if None
+    # version: identifies the data the index was built from (used in the keys of derived caches, e.g. rendered figures)
+    def __init__(self, combine, season, dimension=None, version=None):
+        if dimension is None:
+            dimension = build_player_dimension([combine, season])
+        self.dimension = dimension
+        self.version = version
+
+        # Combine data ordered by position (order of appearance, rows without position last), with the player_key column:
+        # position -> slice of rows, (position, player_key) -> rows
+        by_position = group_rows(combine['Pos'])
+        ordered = np.concatenate(list(by_position.values()) + [EMPTY_ROWS])
+        order = np.concatenate([ordered, np.setdiff1d(np.arange(len(combine)), ordered)])
+        self.combine = combine.take(order).reset_index(drop=True)
+        self.combine['player_key'] = player_keys(combine, dimension)[order]
+        self._combine_by_position = {}
+        start = 0
+        for position, rows in by_position.items():
+            self._combine_by_position[position] = slice(start, start + len(rows))
+            start += len(rows)
+        self._metrics = None
+        if set(SIMILARITY_METRICS) <= set(self.combine.columns):
+            self._metrics = np.ascontiguousarray(self.combine[SIMILARITY_METRICS].to_numpy(dtype='float64'))
+            self._metrics.flags.writeable = False
+
+        # shallow copy with the player_key column, the (shared) source frame is not modified
+        self.season = season.copy(deep=False)
+        self.season['player_key'] = player_keys(season, dimension)
+        self._seasons = season['season'].to_numpy()
+
+        # Display names per key, players sharing a name are told apart by their player_id
+        names = dimension['player_name'].astype('object').to_numpy()
+        labels = names.copy()
+        shared = dimension['player_name'].duplicated(keep=False).to_numpy()
+        labels[shared] = [f'{name} ({player_id})' for name, player_id in zip(names[shared], dimension['player_id'].to_numpy()[shared])]
+        self._names = dict(zip(dimension['player_key'], names))
+        self._labels = dict(zip(dimension['player_key'], labels))
+
+        self._combine_by_player = {}
+        self._players_by_position = {}
+        keys = self.combine['player_key'].to_numpy()
+        for position, rows in self._combine_by_position.items():
+            by_player = group_rows(keys[rows])
+            by_player.pop(-1, None)
+            self._players_by_position[position] = [int(player) for player in by_player]
+            for player, player_rows in by_player.items():
+                self._combine_by_player[(position, player)] = player_rows + rows.start
+
+        # Seasonal data: player_key -> rows and position -> rows, each sorted by season
+        self._season_by_player = group_rows(self.season['player_key'], sort_by=self._seasons)
+        self._season_by_player.pop(-1, None)
+        self._season_by_position = group_rows(season['position'], sort_by=self._seasons)
+
+    # First and last season of the seasonal data (None, None without data)
+    @property
+    def season_range(self):
+        if len(self._seasons) == 0:
+            return None, None
+        return int(self._seasons.min()), int(self._seasons.max())
+
+    # Positions with combine data (order of appearance, without NaN)
+    @property
+    def positions(self):
+        return list(self._combine_by_position)
+
+    # Keys of the players of a position (order of appearance)
+    def players(self, position):
+        return self._players_by_position.get(position, [])
+
+    # Name of a player
+    def name(self, player):
+        return self._names.get(player)
+
+    # Unique display name of a player (name, with the player_id if another player has the same name)
+    def label(self, player):
+        return self._labels.get(player, str(player))
+
+    # Keys of the players in the rows of another frame with player_id / player_name (e.g. similar players), -1 if unknown
+    def player_keys(self, frame):
+        return player_keys(frame, self.dimension)
+
+    # The frame with the display labels in the player_name column (e.g. as hue of a plot, so players sharing a name stay apart)
+    def with_labels(self, frame):
+        return frame.assign(player_name=frame['player_key'].map(self._labels))
+
+    # Combine rows of all players of a position (a view of the shared frame)
+    def combine_rows(self, position):
+        return self.combine.iloc[self._combine_by_position.get(position, slice(0, 0))]
+
+    # Values of the metrics of all players of a position (rows as in combine_rows, columns in the order of metrics), float64.
+    # The similarity metrics are a view of the shared contiguous matrix, other metrics are taken from the frame
+    def metric_matrix(self, position, metrics=SIMILARITY_METRICS):
+        if self._metrics is not None and list(metrics) == SIMILARITY_METRICS:
+            return self._metrics[self._combine_by_position.get(position, slice(0, 0))]
+        return self.combine_rows(position)[list(metrics)].to_numpy(dtype='float64')
+
+    # Combine row(s) of a single player
+    def combine_player(self, position, player):
+        return self.combine.take(self._combine_by_player.get((position, player), EMPTY_ROWS))
+
+    # Combine rows of several players of a position (first row of each player, in the given order, unknown players are skipped)
+    def combine_players(self, position, players):
+        rows = [self._combine_by_player[(position, player)][0] for player in players if (position, player) in self._combine_by_player]
+        return self.combine.take(np.asarray(rows, dtype='int64'))
+
+    # Season rows of one or several players (keys), optionally limited to the seasons first..last (inclusive)
+    def season_history(self, players, first=None, last=None):
+        if np.ndim(players) == 0:
+            players = [players]
+        rows = [self._season_range(self._season_by_player.get(player, EMPTY_ROWS), first, last) for player in dict.fromkeys(players)]
+        return self.season.take(np.concatenate(rows) if rows else EMPTY_ROWS)
+
+    # Season rows of all players of a position, optionally limited to the seasons first..last (inclusive)
+    def position_seasons(self, position, first=None, last=None):
+        return self.season.take(self._season_range(self._season_by_position.get(position, EMPTY_ROWS), first, last))
+
+    # rows are sorted by season, so the range is found by binary search
+    def _season_range(self, rows, first, last):
+        seasons = self._seasons[rows]
+        start = 0 if first is None else np.searchsorted(seasons, first, side='left')
+        stop = len(rows) if last is None else np.searchsorted(seasons, last, side='right')
+        return rows[start:stop]
@@ -0,0 +1,88 @@
+# **********************************************************************************************************************************************************************
+# Ingest: build the Parquet snapshots the dashboard loads at startup
+# - reads the raw CSVs, cleans them and converts the combine values to metric units (see nfl_sources.py)
+# - writes <name>.parquet next to each CSV: season as int16, Pos/position/player_name as categoricals
+# - the seasonal data is reduced to one row per (player_id, season) (rule: see nfl_sources.deduplicate_seasons),
+#   the collapsed duplicates are listed in <name>_duplicates.csv
+# - writes the summary table of the combine distributions per position next to the combine data (<name>_distributions.parquet)
+# - writes the season aggregates cube next to the seasonal data (<name>_aggregates.parquet), an existing cube is updated
+#   incrementally (only new or changed seasons are aggregated again)
+# - if the season partitions of the ingestion pipeline exist (see nfl_fetch.py), they are the source of the seasonal data:
+#   the seasonal CSV is not converted and the cube is built from the partitions
+# - writes/extends the player dimension (players_dimension.parquet, see nfl_players.py): existing players keep their keys
+# - run via: python code/nfl_ingest.py [--data-dir 00_Data]
+# **********************************************************************************************************************************************************************
+import argparse
+import os
+
+import nfl_sources
+from nfl_aggregates import build_season_cube, update_season_cube
+from nfl_distributions import build_summaries
+
+
+def build_snapshot(csv_path, df):
+    parquet_path = nfl_sources.snapshot_path(csv_path)
+    df.to_parquet(parquet_path, engine='pyarrow', index=False)
+    print(f'{csv_path} -> {parquet_path} ({len(df):,} rows, {len(df.columns)} columns)')
+    return parquet_path
+
+
+def write_duplicate_report(report, path):
+    report.to_csv(path, index=False)
+    print(f'{len(report):,} (player_id, season) with duplicate rows collapsed ({int(report["rows"].sum()) - len(report):,} rows dropped) -> {path}')
+    return path
+
+
+def build_summary_table(combine_snapshot, combine_csv_path):
+    summaries = build_summaries(nfl_sources.read_parquet(combine_snapshot))
+    path = nfl_sources.summary_path(combine_csv_path)
+    summaries.to_parquet(path, engine='pyarrow', index=False)
+    print(f'{combine_snapshot} -> {path} ({len(summaries):,} position/metric summaries)')
+    return path
+
+
+def build_cube_table(season_source, season_csv_path):
+    season = nfl_sources.read_season_source(season_source)
+    path = nfl_sources.cube_path(season_csv_path)
+    if os.path.exists(path):
+        cube, seasons = update_season_cube(nfl_sources.read_parquet(path), season)
+    else:
+        cube, seasons = build_season_cube(season), sorted(season['season'].unique())
+    cube.to_parquet(path, engine='pyarrow', index=False)
+    print(f'{season_source} -> {path} ({len(cube):,} aggregates, seasons aggregated: {", ".join(map(str, seasons)) or "none"})')
+    return path
+
+
+def build_dimension_table(combine_source, season_source, combine_csv_path):
+    columns = ['player_id', 'player_name']
+    frames = [nfl_sources.read_combine_source(combine_source)[columns] if combine_source else None,
+              nfl_sources.read_season_source(season_source, columns + ['season']) if season_source else None]
+    path = nfl_sources.dimension_path(combine_csv_path)
+    known = len(nfl_sources.read_parquet(path)) if os.path.exists(path) else 0
+    dimension = nfl_sources.update_player_dimension([frame for frame in frames if frame is not None], path)
+    dimension.to_parquet(path, engine='pyarrow', index=False)
+    print(f'player dimension -> {path} ({len(dimension):,} players, {len(dimension) - known:,} new)')
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert the raw NFL CSVs into cleaned Parquet snapshots')
+    parser.add_argument('--data-dir', default=nfl_sources.DATA_DIR, help='directory containing the raw CSV files')
+    args = parser.parse_args()
+
+    combine_csv_path = os.path.join(args.data_dir, os.path.basename(nfl_sources.COMBINE_CSV))
+    combine_snapshot = build_snapshot(combine_csv_path, nfl_sources.read_combine_csv(combine_csv_path))
+    build_summary_table(combine_snapshot, combine_csv_path)
+    season_csv_path = os.path.join(args.data_dir, os.path.basename(nfl_sources.SEASON_CSV))
+    if nfl_sources.partition_files(nfl_sources.partition_dir(season_csv_path)):
+        season_source = nfl_sources.partition_dir(season_csv_path)
+    else:
+        season, duplicates = nfl_sources.read_season_csv(season_csv_path, report=True)
+        season_source = build_snapshot(season_csv_path, season)
+        write_duplicate_report(duplicates, nfl_sources.duplicate_report_path(season_csv_path))
+    build_cube_table(season_source, season_csv_path)
+    build_dimension_table(combine_snapshot, season_source, combine_csv_path)
+
+
+if __name__ == '__main__':
+    main()
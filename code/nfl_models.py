@@ -0,0 +1,181 @@
+# **********************************************************************************************************************************************************************
+# Performance projections: combine metrics -> seasonal stats (scripted version of the RandomForestRegressor of the exploration notebook)
+# Training (offline, run via: python code/nfl_train.py [--data-dir 00_Data] [--workers 4] [--seed 42]):
+# - one RandomForestRegressor per (position, target stat), features: the combine metrics of the similarity search (metric units),
+#   target: the average of the stat over the seasons of a player (like the player averages of the notebook)
+# - the models are fitted in parallel by a process pool (see nfl_train.py), each with its own seed derived from --seed, position and stat,
+#   so a run with the same data and settings gives the same models
+# - prediction interval: quantiles of the out-of-bag residuals of the training players, stored with the model
+# - output: <data dir>/models/<version>/<position>_<stat>.joblib plus manifest.json (data fingerprints, settings, quality),
+#   the version is a hash over data and settings, <data dir>/models/LATEST names the version the dashboard loads
+# Inference (dashboard / batch):
+# - ProjectionModels loads a model on first use and keeps it for the process (built with the engine, see nfl_sources.build_engine)
+# - all rows of a position are projected with one predict call per model
+# **********************************************************************************************************************************************************************
+import hashlib
+import json
+import os
+import threading
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from nfl_index import group_rows
+from nfl_similarity import SIMILARITY_METRICS
+
+# Target stats per position
+PROJECTION_TARGETS = {
+    'WR': ['receptions', 'receiving_yards', 'receiving_tds', 'receiving_yards_after_catch'],
+    'RB': ['carries', 'rushing_yards', 'rushing_tds', 'receptions'],
+}
+
+# Settings of the random forests (n_estimators / random_state as in the notebook)
+MODEL_PARAMS = {'n_estimators': 100, 'min_samples_leaf': 3, 'max_features': 1.0}
+DEFAULT_SEED = 42
+
+# Coverage of the prediction interval (10% / 90% quantile of the out-of-bag residuals)
+INTERVAL = 0.8
+
+# Positions/stats with fewer training players get no model
+MIN_TRAINING_PLAYERS = 30
+
+MANIFEST = 'manifest.json'
+LATEST = 'LATEST'
+
+
+# Version the dashboard loads (None if no models were trained)
+def latest_version(directory):
+    path = os.path.join(directory, LATEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        version = file.read().strip()
+    return version if os.path.exists(os.path.join(directory, version, MANIFEST)) else None
+
+
+# **********************************************************************************************************************************************************************
+# Training
+# **********************************************************************************************************************************************************************
+
+# Training table of a position: one row per player with combine values and seasonal stats (features + average of each target)
+def training_table(combine, season, position, targets, features=SIMILARITY_METRICS):
+    players = combine[(combine['Pos'] == position) & combine['player_id'].notna()]
+    players = players.drop_duplicates('player_id').set_index('player_id')[list(features)]
+    averages = season[season['player_id'].isin(players.index)].groupby('player_id', sort=False)[list(targets)].mean()
+    return players.join(averages, how='inner').sort_index()
+
+
+# Seed of one model (independent of the order and the number of workers)
+def model_seed(seed, position, target):
+    return (seed + zlib.crc32(f'{position}/{target}'.encode())) % 2**32
+
+
+# Fit one model and write it. task: (position, target, X, y, seed, params, path). Returns the manifest entry
+def fit_model(task):
+    import joblib
+    from sklearn.ensemble import RandomForestRegressor
+
+    position, target, X, y, seed, params, path = task
+    model = RandomForestRegressor(random_state=seed, oob_score=True, n_jobs=1, **params).fit(X, y)
+    residuals = y - model.oob_prediction_
+    low, high = np.nanquantile(residuals, [(1 - INTERVAL) / 2, (1 + INTERVAL) / 2])
+    joblib.dump({'model': model, 'residual_low': float(low), 'residual_high': float(high)}, path)
+    return {
+        'position': position,
+        'target': target,
+        'file': os.path.basename(path),
+        'seed': int(seed),
+        'n_train': int(len(y)),
+        'oob_r2': float(model.oob_score_),
+        'residual_low': float(low),
+        'residual_high': float(high),
+    }
+
+
+def model_version(data_fingerprints, positions, seed, params, features):
+    import sklearn
+    settings = {'data': data_fingerprints, 'targets': {position: PROJECTION_TARGETS[position] for position in positions},
+                'seed': seed, 'params': params, 'features': list(features), 'interval': INTERVAL, 'sklearn': sklearn.__version__}
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:12], settings
+
+
+# **********************************************************************************************************************************************************************
+# Inference
+# **********************************************************************************************************************************************************************
+
+class ProjectionModels:
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST)) as file:
+            self.manifest = json.load(file)
+        self.version = self.manifest['version']
+        self.features = self.manifest['features']
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def positions(self):
+        return list(self.manifest['models'])
+
+    # Target stats with a model, in the order of PROJECTION_TARGETS at training time
+    def targets(self, position):
+        models = self.manifest['models'].get(position, {})
+        return [target for target in self.manifest['targets'].get(position, []) if target in models]
+
+    # Model of (position, target), loaded on first use (shared by all sessions, predict does not change it)
+    def _model(self, position, target):
+        key = (position, target)
+        if key not in self._models:
+            with self._lock:
+                if key not in self._models:
+                    # joblib (and sklearn with the model) is only imported once a projection is requested
+                    import joblib
+                    self._models[key] = joblib.load(os.path.join(self.directory, self.manifest['models'][position][target]['file']))
+        return self._models[key]
+
+    # Projections for the rows of values (frame with the feature columns, or a dict for one player):
+    # frame with <stat>, <stat>_low and <stat>_high per target of the position (same index as values).
+    # Counting stats are not negative, the bounds are clipped at 0.
+    def project(self, position, values):
+        values = pd.DataFrame([values]) if isinstance(values, dict) else values
+        X = values.reindex(columns=self.features).to_numpy(dtype='float64')
+        projections = {}
+        for target in self.targets(position):
+            stored = self._model(position, target)
+            predicted = stored['model'].predict(X) if len(X) else np.empty(0)
+            projections[target] = predicted
+            projections[f'{target}_low'] = np.maximum(predicted + stored['residual_low'], 0.0)
+            projections[f'{target}_high'] = np.maximum(predicted + stored['residual_high'], 0.0)
+        return pd.DataFrame(projections, index=values.index)
+
+    # Projections of one player as table: one row per target stat
+    def project_player(self, position, values):
+        projections = self.project(position, values).iloc[0]
+        return pd.DataFrame({
+            'Stat': self.targets(position),
+            'Projection': [projections[target] for target in self.targets(position)],
+            'Low': [projections[f'{target}_low'] for target in self.targets(position)],
+            'High': [projections[f'{target}_high'] for target in self.targets(position)],
+        })
+
+
+# Projections for a draft class (same input as nfl_batch.score_prospects): one row per prospect of a position with models,
+# columns prospect, prospect_name, position and the projections of the position's targets
+def project_prospects(prospects, models):
+    position_column = 'position' if 'position' in prospects.columns else 'Pos'
+    if position_column not in prospects.columns:
+        raise ValueError("The prospects need one of the columns ['position', 'Pos']")
+    name_column = next((column for column in ['player_name', 'name'] if column in prospects.columns), None)
+
+    results = []
+    for position, rows in group_rows(prospects[position_column]).items():
+        if not models.targets(position):
+            continue
+        projected = models.project(position, prospects.iloc[rows]).reset_index(drop=True)
+        projected.insert(0, 'position', position)
+        projected.insert(0, 'prospect_name', prospects[name_column].to_numpy()[rows] if name_column else None)
+        projected.insert(0, 'prospect', rows)
+        results.append(projected)
+    if not results:
+        return pd.DataFrame(columns=['prospect', 'prospect_name', 'position'])
+    return pd.concat(results, ignore_index=True).sort_values('prospect', kind='stable').reset_index(drop=True)
@@ -0,0 +1,120 @@
+# **********************************************************************************************************************************************************************
+# Player dimension: one row per player with a stable integer key
+# - player_key: int32, 0..n-1 in order of first appearance, kept across data updates (the ingest step stores the table,
+#   new players are appended with the next keys)
+# - player_id: gsis id of nfl_data_py where available, player_name: display name, name_key: normalized name for matching
+# - both fact tables (combine data / seasonal stats) are keyed by player_key (see nfl_index.py), filtering and joins
+#   run on the int32 keys, names are only used for display
+# Matching of a row to a player:
+#   1. by player_id
+#   2. rows without player_id: by normalized name to a player without player_id of that name,
+#      else to the only player with that name, else to the closest name with difflib (ratio >= NAME_MATCH_CUTOFF, unique best match)
+#   3. unmatched rows get a new player (without player_id)
+# **********************************************************************************************************************************************************************
+import difflib
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+DIMENSION_COLUMNS = ['player_key', 'player_id', 'player_name', 'name_key']
+
+# Minimum difflib similarity of two normalized names to count as the same player
+NAME_MATCH_CUTOFF = 0.92
+
+NAME_SUFFIXES = {'jr', 'sr', 'ii', 'iii', 'iv', 'v'}
+
+
+# Normalized name: lower case, without accents, punctuation and suffixes ("D.K. Metcalf Jr." -> "dk metcalf")
+def normalize_name(name):
+    if not isinstance(name, str):
+        return None
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode().lower()
+    name = re.sub(r"[.'`]", '', name)
+    words = [word for word in re.split(r'[^a-z0-9]+', name) if word and word not in NAME_SUFFIXES]
+    return ' '.join(words) or None
+
+
+# normalize_name for a column (each distinct name is normalized once)
+def normalize_names(names):
+    codes, uniques = pd.factorize(np.asarray(names, dtype='object'))
+    normalized = np.array([normalize_name(name) for name in uniques] + [None], dtype='object')
+    return normalized[codes]
+
+
+def empty_dimension():
+    return pd.DataFrame({
+        'player_key': pd.Series(dtype='int32'),
+        'player_id': pd.Series(dtype='object'),
+        'player_name': pd.Series(dtype='object'),
+        'name_key': pd.Series(dtype='object'),
+    })
+
+
+# Player keys of name keys without player_id (see matching rules above), -1 if none
+def match_names(name_keys, dimension):
+    keys = np.full(len(name_keys), -1, dtype='int32')
+    if len(dimension) == 0:
+        return keys
+    without_id = dimension[dimension['player_id'].isna()]
+    key_without_id = dict(zip(without_id['name_key'], without_id['player_key']))
+    counts = dimension['name_key'].value_counts()
+    unique_names = dimension[dimension['name_key'].isin(counts.index[counts == 1])]
+    key_of_name = dict(zip(unique_names['name_key'], unique_names['player_key']))
+    candidates = list(key_of_name)
+
+    for name, rows in pd.Series(np.arange(len(name_keys))).groupby(pd.Series(name_keys, dtype='object')).groups.items():
+        rows = np.asarray(rows)
+        if name in key_without_id:
+            keys[rows] = key_without_id[name]
+        elif name in key_of_name:
+            keys[rows] = key_of_name[name]
+        elif name not in counts.index:
+            matches = difflib.get_close_matches(name, candidates, n=2, cutoff=NAME_MATCH_CUTOFF)
+            # only a unique best match counts (two equally close names are ambiguous)
+            if len(matches) == 1 or (len(matches) == 2 and difflib.SequenceMatcher(None, name, matches[0]).ratio()
+                                     > difflib.SequenceMatcher(None, name, matches[1]).ratio()):
+                keys[rows] = key_of_name[matches[0]]
+    return keys
+
+
+# Player keys of the rows of a frame with player_id and/or player_name (int32, -1 for rows that match no player)
+# (rows with an unknown player_id are not matched by name: another player may share the name)
+def player_keys(frame, dimension):
+    keys = np.full(len(frame), -1, dtype='int32')
+    if 'player_id' in frame.columns:
+        ids = np.asarray(frame['player_id'], dtype='object')
+        with_id = dimension[dimension['player_id'].notna()]
+        positions = pd.Index(with_id['player_id']).get_indexer(ids)
+        found = positions >= 0
+        keys[found] = with_id['player_key'].to_numpy()[positions[found]]
+        missing = np.flatnonzero(pd.isna(ids))
+    else:
+        missing = np.arange(len(frame))
+    if len(missing) and 'player_name' in frame.columns:
+        keys[missing] = match_names(normalize_names(np.asarray(frame['player_name'], dtype='object')[missing]), dimension)
+    return keys
+
+
+# Dimension covering the players of all frames: the existing table (e.g. read from the ingest output) extended by new players
+def build_player_dimension(frames, existing=None):
+    dimension = empty_dimension() if existing is None else existing[DIMENSION_COLUMNS].reset_index(drop=True)
+    for frame in frames:
+        keys = player_keys(frame, dimension)
+        unmatched = frame[keys < 0]
+        if 'player_name' not in unmatched.columns:
+            continue
+        new = pd.DataFrame({
+            'player_id': np.asarray(unmatched['player_id'], dtype='object') if 'player_id' in unmatched.columns else None,
+            'player_name': np.asarray(unmatched['player_name'], dtype='object'),
+        })
+        new['name_key'] = normalize_names(new['player_name'])
+        new = new[new['player_id'].notna() | new['name_key'].notna()]
+        # one player per id, players without id once per name
+        new = pd.concat([new[new['player_id'].notna()].drop_duplicates('player_id'),
+                         new[new['player_id'].isna()].drop_duplicates('name_key')])
+        new.insert(0, 'player_key', np.arange(len(dimension), len(dimension) + len(new), dtype='int32'))
+        dimension = pd.concat([dimension, new], ignore_index=True)
+    dimension['player_key'] = dimension['player_key'].astype('int32')
+    return dimension[DIMENSION_COLUMNS]
@@ -0,0 +1,277 @@
+# **********************************************************************************************************************************************************************
+# Per-rerun instrumentation of the dashboard
+# - the hot paths (data load, conversions, filters, similarity search, aggregation, figures) are wrapped in stage(name) blocks,
+#   each records wall time, rows processed and memory allocated (net and peak, via tracemalloc) of the stage
+# - off by default: a stage is then a no-op. Switched on per rerun by the environment variable NFL_PROFILE or the query parameter
+#   ?profile=... of the dashboard URL: 1 = stage timings, cprofile / pyinstrument = stage timings plus a profile of the whole rerun
+# - the stages of a rerun are shown in a sidebar panel (see main_nfl_app.py) and can be downloaded as JSON lines or Prometheus text.
+#   For monitoring, every profiled rerun is appended to the JSON lines file NFL_PROFILE_LOG and the totals per stage are written
+#   to the Prometheus text file NFL_PROFILE_PROM (e.g. for the node_exporter textfile collector)
+# - the rerun being profiled is kept per thread (Streamlit runs each session's script in its own thread). tracemalloc is process-wide:
+#   it runs while at least one rerun is profiled, the peaks are approximate when several sessions are profiled at the same time
+# **********************************************************************************************************************************************************************
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+
+PROFILE_ENV = 'NFL_PROFILE'
+PROFILE_LOG_ENV = 'NFL_PROFILE_LOG'
+PROFILE_PROM_ENV = 'NFL_PROFILE_PROM'
+PROFILE_MODES = ['timing', 'cprofile', 'pyinstrument']
+
+_current = threading.local()
+
+# Profiled reruns of all threads: {thread: profile}. A rerun interrupted by Streamlit (e.g. by a new widget value) never reaches end(),
+# it is dropped by discard() at the start of the next rerun of its session, or as soon as its thread has finished
+_active = {}
+_active_lock = threading.Lock()
+
+
+# Profiling mode of a rerun (None: off): the query parameter wins over the environment variable
+def profile_mode(query_value=None):
+    value = (query_value if query_value is not None else os.environ.get(PROFILE_ENV, '')).strip().lower()
+    if value in ('', '0', 'false', 'off'):
+        return None
+    return value if value in PROFILE_MODES else 'timing'
+
+
+class StageRecord:
+    def __init__(self, name, depth):
+        self.name = name
+        self.depth = depth
+        self.rows = None
+        self.detail = None
+        self.seconds = 0.0
+        self.allocated = 0
+        self.peak = 0
+        self._start_memory = 0
+        self._child_peak = 0
+
+    def as_dict(self):
+        return {'stage': self.name, 'depth': self.depth, 'seconds': self.seconds, 'rows': self.rows, 'allocated_bytes': self.allocated,
+                'peak_bytes': self.peak, 'detail': self.detail}
+
+
+# Stand-in for a StageRecord when profiling is off (attributes set by the caller are ignored)
+class _NoStage:
+    rows = None
+    detail = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NO_STAGE = _NoStage()
+
+
+class RerunProfile:
+    def __init__(self, mode, labels=None):
+        self.mode = mode
+        self.labels = labels or {}
+        self.records = []
+        self.started = time.time()
+        self.seconds = None
+        self.report = None
+        self._stack = []
+        self._profiler = None
+
+    # Context manager of one stage (stages can be nested, the records keep the order in which the stages started)
+    def stage(self, name, rows=None):
+        return _Stage(self, name, rows)
+
+
+class _Stage:
+    def __init__(self, profile, name, rows):
+        self.profile = profile
+        self.record = StageRecord(name, len(profile._stack))
+        self.record.rows = rows
+
+    def __enter__(self):
+        record = self.record
+        self.profile.records.append(record)
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if self.profile._stack:
+                parent = self.profile._stack[-1]
+                parent._child_peak = max(parent._child_peak, peak)
+            tracemalloc.reset_peak()
+            record._start_memory = current
+        self.profile._stack.append(record)
+        self._start = time.perf_counter()
+        return record
+
+    def __exit__(self, *exc):
+        record = self.record
+        record.seconds = time.perf_counter() - self._start
+        self.profile._stack.pop()
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, record._child_peak)
+            record.allocated = current - record._start_memory
+            record.peak = peak - record._start_memory
+            if self.profile._stack:
+                parent = self.profile._stack[-1]
+                parent._child_peak = max(parent._child_peak, peak)
+            tracemalloc.reset_peak()
+        return False
+
+
+# Stage of the rerun profiled in this thread (no-op if the rerun is not profiled)
+def stage(name, rows=None):
+    profile = getattr(_current, 'profile', None)
+    if profile is None:
+        return _NO_STAGE
+    return profile.stage(name, rows)
+
+
+def current_profile():
+    return getattr(_current, 'profile', None)
+
+
+# Drop the profile an interrupted rerun left on this thread (its call profiler is stopped, nothing is exported) and the profiles of
+# finished threads; tracemalloc stops when no rerun is profiled anymore. Called at the start of every rerun, profiled or not
+def discard():
+    profile = getattr(_current, 'profile', None)
+    _current.profile = None
+    if profile is not None and profile.mode == 'cprofile':
+        profile._profiler.disable()
+    elif profile is not None and profile._profiler is not None:
+        profile._profiler.stop()
+    with _active_lock:
+        _active.pop(threading.current_thread(), None)
+        for thread in [thread for thread in _active if not thread.is_alive()]:
+            del _active[thread]
+        if not _active and tracemalloc.is_tracing():
+            tracemalloc.stop()
+    return profile
+
+
+# Start profiling the rerun of this thread (mode: see profile_mode), labels are added to the exported records (e.g. the page)
+def begin(mode, labels=None):
+    discard()
+    profile = RerunProfile(mode, labels)
+    with _active_lock:
+        if not _active and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _active[threading.current_thread()] = profile
+    if mode == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+            profile._profiler = Profiler()
+        except ImportError:
+            profile.mode = 'cprofile'
+    if profile.mode == 'cprofile':
+        profile._profiler = cProfile.Profile()
+        profile._profiler.enable()
+    elif profile._profiler is not None:
+        profile._profiler.start()
+    _current.profile = profile
+    return profile
+
+
+# Stop profiling the rerun of this thread: the call profile becomes .report (text), the rerun is exported if configured
+def end():
+    profile = getattr(_current, 'profile', None)
+    if profile is None:
+        return None
+    _current.profile = None
+    profile.seconds = time.time() - profile.started
+    if profile.mode == 'cprofile':
+        profile._profiler.disable()
+        output = io.StringIO()
+        pstats.Stats(profile._profiler, stream=output).sort_stats('cumulative').print_stats(40)
+        profile.report = output.getvalue()
+    elif profile.mode == 'pyinstrument':
+        profile._profiler.stop()
+        profile.report = profile._profiler.output_text(unicode=False, color=False)
+    with _active_lock:
+        _active.pop(threading.current_thread(), None)
+        if not _active:
+            tracemalloc.stop()
+
+    STAGE_TOTALS.add(profile)
+    if os.environ.get(PROFILE_LOG_ENV):
+        with open(os.environ[PROFILE_LOG_ENV], 'a') as file:
+            file.write(to_jsonl(profile))
+    if os.environ.get(PROFILE_PROM_ENV):
+        path = os.environ[PROFILE_PROM_ENV]
+        with open(path + '.tmp', 'w') as file:
+            file.write(STAGE_TOTALS.to_prometheus())
+        os.replace(path + '.tmp', path)
+    return profile
+
+
+# **********************************************************************************************************************************************************************
+# Export
+# **********************************************************************************************************************************************************************
+
+# One JSON object per stage (with the labels and the start time of the rerun)
+def to_jsonl(profile):
+    return ''.join(json.dumps(dict(profile.labels, rerun_started=profile.started, **record.as_dict())) + '\n' for record in profile.records)
+
+
+def _prometheus_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Totals per stage over all profiled reruns of the process (Prometheus counters)
+class StageTotals:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reruns = 0
+        self.count = defaultdict(int)
+        self.seconds = defaultdict(float)
+        self.rows = defaultdict(int)
+        self.allocated = defaultdict(int)
+
+    def add(self, profile):
+        with self._lock:
+            self.reruns += 1
+            for record in profile.records:
+                self.count[record.name] += 1
+                self.seconds[record.name] += record.seconds
+                self.rows[record.name] += record.rows or 0
+                self.allocated[record.name] += max(record.allocated, 0)
+
+    def to_prometheus(self):
+        with self._lock:
+            lines = ['# HELP nfl_profiled_reruns_total Profiled reruns of the dashboard', '# TYPE nfl_profiled_reruns_total counter',
+                     f'nfl_profiled_reruns_total {self.reruns}']
+            for metric, values, help_text in [('nfl_stage_runs_total', self.count, 'Runs of the stage'),
+                                              ('nfl_stage_seconds_total', self.seconds, 'Wall time of the stage'),
+                                              ('nfl_stage_rows_total', self.rows, 'Rows processed by the stage'),
+                                              ('nfl_stage_allocated_bytes_total', self.allocated, 'Memory allocated (net) by the stage')]:
+                lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} counter']
+                lines += [f'{metric}{{stage="{_prometheus_label(name)}"}} {value}' for name, value in sorted(values.items())]
+        return '\n'.join(lines) + '\n'
+
+
+STAGE_TOTALS = StageTotals()
+
+
+# Stages of one rerun in the Prometheus text format (gauges, e.g. for a push gateway)
+def to_prometheus(profile):
+    labels = ''.join(f',{key}="{_prometheus_label(value)}"' for key, value in profile.labels.items())
+    lines = []
+    for metric, attribute, help_text in [('nfl_rerun_stage_seconds', 'seconds', 'Wall time of the stage in the last profiled rerun'),
+                                         ('nfl_rerun_stage_rows', 'rows', 'Rows processed by the stage in the last profiled rerun'),
+                                         ('nfl_rerun_stage_allocated_bytes', 'allocated', 'Memory allocated (net) by the stage in the last profiled rerun')]:
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} gauge']
+        # stages running several times in a rerun (e.g. one per figure) are summed up
+        totals = defaultdict(float)
+        for record in profile.records:
+            totals[record.name] += getattr(record, attribute) or 0
+        lines += [f'{metric}{{stage="{_prometheus_label(name)}"{labels}}} {value:g}' for name, value in totals.items()]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,172 @@
+# **********************************************************************************************************************************************************************
+# Rendering layer for the dashboard figures
+# - every figure is drawn with matplotlib/seaborn, rasterised once to PNG bytes and closed explicitly (no figures stay alive)
+# - the PNG bytes are kept in a size-bounded LRU cache shared by all sessions, keyed by the inputs of the figure
+#   (data version, position, players, metric), so repeated comparisons are served without drawing
+# - pyplot keeps global state, drawing is therefore serialized with a lock (sessions run in parallel threads)
+# - matplotlib and seaborn are imported when the first figure of the process is drawn (see plotting()): they account for most of the
+#   start-up time, and pages without figures or with cached figures never need them
+# **********************************************************************************************************************************************************************
+import colorsys
+import functools
+import io
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+from nfl_profile import stage
+
+# Default upper bound of the cached PNG bytes
+FIGURE_CACHE_BYTES = 64 * 2**20
+
+# Same resolution as st.pyplot
+FIGURE_DPI = 200
+
+_RENDER_LOCK = threading.Lock()
+
+
+# pyplot and seaborn (with the style of the dashboard), imported on first use
+@functools.lru_cache(maxsize=None)
+def plotting():
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.set_style("darkgrid")
+    return plt, sns
+
+
+# Rasterise a figure to PNG bytes and close it
+def render_png(fig, dpi=FIGURE_DPI):
+    plt, _ = plotting()
+    try:
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+
+class FigureCache:
+    def __init__(self, max_bytes=FIGURE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    # PNG bytes of the figure identified by key, draw() (returning a matplotlib figure) is only called on a cache miss
+    def get_or_render(self, key, draw):
+        with stage(f'figure {key[0]}') as record:
+            return self._get_or_render(key, draw, record)
+
+    def _get_or_render(self, key, draw, record):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                record.detail = 'cached'
+                return self._entries[key]
+            self.misses += 1
+
+        # waiting for the render lock is part of the figure stage, but neither of its sub-stages
+        with _RENDER_LOCK:
+            with stage('draw'):
+                fig = draw()
+            with stage('render_png'):
+                image = render_png(fig)
+        record.detail = f'rendered, {len(image) / 1024:.0f} KB'
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = image
+                self.size += len(image)
+            # evict the least recently used figures until the cache fits again
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+        return image
+
+
+# One cache per server process, shared by all sessions
+@st.cache_resource
+def get_figure_cache():
+    return FigureCache()
+
+
+# **********************************************************************************************************************************************************************
+# Figures
+# **********************************************************************************************************************************************************************
+
+# Boxplot of a combine metric for a position, with the values of the compared players as points
+# box_stats: precomputed statistics of the position (see nfl_distributions.py), drawn with Axes.bxp in the style of sns.boxplot
+# players: list of (name, value, color), missing values are skipped
+def draw_combine_boxplot(box_stats, position, metric, players):
+    import matplotlib.colors as mcolors
+
+    plt, sns = plotting()
+    fig, ax = plt.subplots(figsize=(7, 5))
+    color = sns.color_palette()[0]
+    lightness = colorsys.rgb_to_hls(*mcolors.to_rgb(color))[1] * .6
+    linecolor = (lightness, lightness, lightness)
+    ax.bxp([box_stats], positions=[0], widths=0.8, patch_artist=True, manage_ticks=False,
+           boxprops={'facecolor': color, 'edgecolor': linecolor},
+           medianprops={'color': linecolor, 'solid_capstyle': 'butt'},
+           whiskerprops={'color': linecolor, 'solid_capstyle': 'butt'},
+           capprops={'color': linecolor},
+           flierprops={'markeredgecolor': linecolor, 'markersize': 5})
+    ax.set_xticks([0], [position])
+    ax.set_xlim(-0.5, 0.5)
+
+    for name, value, color in players:
+        if value is not None and value == value:
+            ax.scatter([0], [value], color=color, s=100, zorder=5, label=name)
+
+    # Set the legend to the upper right
+    ax.legend(loc="upper right")
+
+    ax.set_title(f'{metric} Comparison', fontsize=14)
+    ax.set_xlabel("Position", fontsize=12)
+    ax.set_ylabel(metric, fontsize=12)
+    return fig
+
+
+# 2x2 grid of seasonal line plots, one per stat: stats is a list of (column, title, axis label)
+def draw_seasonal_grid(season_data, stats):
+    # Only the selected players appear in the legend (player_name is categorical)
+    hue_order = list(season_data['player_name'].unique())
+
+    plt, sns = plotting()
+    fig, axes = plt.subplots(2, 2, figsize=(14, 12))
+    for ax, (stat, title, label) in zip(axes.flat, stats):
+        sns.lineplot(x='season', y=stat, hue='player_name', hue_order=hue_order, data=season_data, ax=ax)
+        ax.set_title(title)
+        ax.set_xlabel('Season')
+        ax.set_ylabel(label)
+        ax.xaxis.set_major_locator(plt.MaxNLocator(integer=True))  # Force x-axis to show only integer years (2010 instead 2010.00)
+
+    # Adjust layout
+    fig.tight_layout()
+    return fig
+
+
+# Line plot of one seasonal stat for the selected players, with the yearly mean of their position as dashed line
+def draw_seasonal_stat(season_data, position_mean_per_year, stat, position):
+    stat_title = stat.replace('_', ' ').title()
+
+    plt, sns = plotting()
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.lineplot(x='season', y=stat, hue='player_name', hue_order=list(season_data['player_name'].unique()), data=season_data, ax=ax)
+
+    # Plot the yearly mean values for the selected position
+    sns.lineplot(x='season', y=stat, data=position_mean_per_year, ax=ax, color='gray', linestyle='--', label=f'Mean {stat_title} for {position}')
+
+    ax.set_title(f'Seasonal {stat_title} Performance', fontsize=16)
+    ax.set_xlabel('Season', fontsize=14)
+    ax.set_ylabel(stat_title, fontsize=14)
+    ax.legend()
+    return fig
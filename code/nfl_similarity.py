@@ -0,0 +1,234 @@
+# **********************************************************************************************************************************************************************
+# Similarity engine for the combine metrics
+# How does it work:
+# - one engine per position, built once per data version (see AnalyticsEngine.similarity_engine, the engine of a data version is built by nfl_sources.build_engine)
+# - the metrics are standardized like sklearn's StandardScaler (mean / population std of the position, missing values ignored)
+# - optional per-metric weights scale the standardized differences, the Mahalanobis distance whitens the standardized values instead
+# - the transformed values of the players are kept as one contiguous matrix, so a query only transforms the new player(s)
+#   and searches the matrix: chunked argpartition for small positions, a KD-tree for large ones
+# Missing combine values (many players skipped bench or vertical), selected with missing=...:
+# - 'complete': only players with all metrics get a distance, the others are listed after them (same as sorting NaN distances last)
+# - 'masked':   the distance only uses the metrics observed for both players, re-normalised by the number of shared metrics
+#               (d^2 = sum over shared metrics * n_metrics / n_shared), so it stays comparable to the full distance
+# - 'impute':   missing values (of the players and of the query) are filled with the conditional mean of a multivariate normal model,
+#               fitted once per position (see GaussianImputer)
+# **********************************************************************************************************************************************************************
+import numpy as np
+import pandas as pd
+
+# Combine metrics used for the comparison (the engine accepts any list of numeric columns)
+SIMILARITY_METRICS = ['Height_cm', 'Weight_kg', '40yd', 'Vertical_cm', 'BroadJump_m', 'Bench']
+DISTANCES = ['euclidean', 'mahalanobis']
+MISSING_MODES = ['complete', 'masked', 'impute']
+
+# Above this number of players the engine searches a KD-tree instead of computing all distances
+KD_TREE_MIN_PLAYERS = 2_000
+
+
+# Conditional mean imputation: x_missing = mean_missing + cov_missing,observed @ cov_observed^-1 @ (x_observed - mean_observed)
+# The model (mean and covariance of the players with complete values) is fitted once, the regression coefficients are computed
+# once per pattern of missing values, and all rows sharing a pattern are imputed with one matrix product.
+class GaussianImputer:
+    def __init__(self, values):
+        values = np.array(values, dtype='float64', ndmin=2)
+        n_metrics = values.shape[1]
+        complete = values[~np.isnan(values).any(axis=1)]
+        self.mean = np.nanmean(values, axis=0) if len(values) else np.zeros(n_metrics)
+        self.mean = np.where(np.isnan(self.mean), 0.0, self.mean)
+        if len(complete) > n_metrics:
+            self.covariance = np.cov(complete, rowvar=False)
+        else:
+            # not enough complete players for a covariance: independent metrics, i.e. mean imputation
+            variance = np.nanvar(values, axis=0) if len(values) else np.ones(n_metrics)
+            self.covariance = np.diag(np.where(np.isnan(variance), 1.0, variance))
+        self._coefficients = {}
+
+    def _coefficients_for(self, missing):
+        key = missing.tobytes()
+        if key not in self._coefficients:
+            observed = ~missing
+            self._coefficients[key] = self.covariance[np.ix_(missing, observed)] @ np.linalg.pinv(self.covariance[np.ix_(observed, observed)])
+        return self._coefficients[key]
+
+    def transform(self, values):
+        values = np.array(values, dtype='float64', ndmin=2)
+        missing = np.isnan(values)
+        if not missing.any():
+            return values
+
+        patterns, pattern_of_row = np.unique(missing, axis=0, return_inverse=True)
+        pattern_of_row = pattern_of_row.ravel()
+        for pattern_number, pattern in enumerate(patterns):
+            if not pattern.any():
+                continue
+            rows = np.flatnonzero(pattern_of_row == pattern_number)
+            observed = ~pattern
+            deviation = values[np.ix_(rows, observed)] - self.mean[observed]
+            values[np.ix_(rows, pattern)] = self.mean[pattern] + deviation @ self._coefficients_for(pattern).T
+        return values
+
+
+class SimilarityEngine:
+    # values: metric matrix of the players (rows as in players, columns in the order of metrics, e.g. PlayerIndex.metric_matrix),
+    # taken from the players frame if None. Neither is modified or copied into the engine
+    def __init__(self, players, metrics=SIMILARITY_METRICS, weights=None, distance='euclidean', missing='complete', values=None):
+        if distance not in DISTANCES:
+            raise ValueError(f"Unknown distance '{distance}', expected one of {DISTANCES}")
+        if missing not in MISSING_MODES:
+            raise ValueError(f"Unknown handling of missing values '{missing}', expected one of {MISSING_MODES}")
+        if weights is not None and distance == 'mahalanobis':
+            raise ValueError("Weights have no effect on the Mahalanobis distance, it is invariant to scaling the metrics")
+        if missing == 'masked' and distance == 'mahalanobis':
+            raise ValueError("The Mahalanobis distance mixes the metrics and cannot be masked, impute the missing values instead")
+
+        self.players = players
+        self.metrics = list(metrics)
+        self.distance = distance
+        self.missing = missing
+        if values is None:
+            values = players[self.metrics].to_numpy(dtype='float64')
+
+        # Standardization parameters (like StandardScaler: NaN-aware, population std, constant metrics keep scale 1)
+        self.mean = np.nanmean(values, axis=0) if len(values) else np.zeros(len(self.metrics))
+        scale = np.nanstd(values, axis=0) if len(values) else np.ones(len(self.metrics))
+        self.scale = np.where((scale == 0) | np.isnan(scale), 1.0, scale)
+
+        self.imputer = None
+        if missing == 'impute':
+            self.imputer = GaussianImputer(values)
+            values = self.imputer.transform(values)
+
+        # Players taking part in the search: complete players, or everybody with at least one metric in masked mode
+        observed = ~np.isnan(values)
+        searchable = observed.any(axis=1) if missing == 'masked' else observed.all(axis=1)
+        self.rows = np.flatnonzero(searchable)
+        self.incomplete_rows = np.flatnonzero(~searchable)
+        standardized = (values[searchable] - self.mean) / self.scale
+
+        # Mapping of the standardized values, distances are Euclidean in the mapped space:
+        # per-metric weights scale each metric by sqrt(weight), the Mahalanobis distance applies a whitening matrix
+        self.weight_scale = None
+        self.transform = None
+        if distance == 'mahalanobis' and len(standardized) > 1:
+            # d(x, y)^2 = (x - y)^T VI (x - y) with VI = V diag(1 / eigenvalues) V^T  =>  d(x, y) = ||(x - y) V diag(eigenvalues^-1/2)||
+            # (directions without variance are dropped, i.e. the pseudo-inverse is used for a singular covariance)
+            eigenvalues, eigenvectors = np.linalg.eigh(np.atleast_2d(np.cov(standardized, rowvar=False)))
+            keep = eigenvalues > 1e-12 * max(eigenvalues.max(initial=0.0), 1.0)
+            self.transform = eigenvectors[:, keep] / np.sqrt(eigenvalues[keep])
+        elif weights is not None:
+            weights = [weights.get(metric, 1.0) for metric in self.metrics] if isinstance(weights, dict) else weights
+            self.weight_scale = np.sqrt(np.asarray(weights, dtype='float64'))
+
+        points = self._map(standardized)
+        self.tree = None
+        if missing == 'masked':
+            # missing values are stored as 0 together with a 0/1 mask, the masked sums are then plain matrix products
+            self.masks = np.ascontiguousarray(~np.isnan(points), dtype='float64')
+            self.points = np.ascontiguousarray(np.nan_to_num(points))
+            self._squared_points = self.points ** 2
+        else:
+            self.masks = None
+            self.points = np.ascontiguousarray(points)
+            self._squared_points = (self.points ** 2).sum(axis=1)
+            if len(self.points) >= KD_TREE_MIN_PLAYERS:
+                from scipy.spatial import cKDTree
+                self.tree = cKDTree(self.points)
+
+    def _map(self, standardized):
+        if self.transform is not None:
+            return standardized @ self.transform
+        if self.weight_scale is not None:
+            return standardized * self.weight_scale
+        return standardized
+
+    # Map raw metric values (dict, Series or array in metric order; one row or a matrix) into the search space
+    def transform_values(self, values):
+        if isinstance(values, (dict, pd.Series)):
+            values = [values[metric] for metric in self.metrics]
+        values = np.asarray(values, dtype='float64')
+        if self.imputer is not None:
+            values = self.imputer.transform(values).reshape(values.shape)
+        return self._map((values - self.mean) / self.scale)
+
+    # Squared distances between a block of query points and all players (shape: queries x players)
+    def _squared_distances(self, chunk):
+        if self.masks is None:
+            return (chunk ** 2).sum(axis=1)[:, None] + self._squared_points[None, :] - 2 * chunk @ self.points.T
+
+        # masked: sum over the shared metrics only, re-normalised by their number (no shared metric -> infinite distance)
+        chunk_masks = (~np.isnan(chunk)).astype('float64')
+        chunk = np.nan_to_num(chunk)
+        shared = chunk_masks @ self.masks.T
+        squared = (chunk ** 2) @ self.masks.T + chunk_masks @ self._squared_points.T - 2 * chunk @ self.points.T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(shared > 0, squared * (chunk.shape[1] / shared), np.inf)
+
+    # Exact distances between each query point and its candidate players (shape: queries x candidates), NaN without shared metrics
+    def _candidate_distances(self, chunk, candidates):
+        if self.masks is None:
+            return np.sqrt(((chunk[:, None, :] - self.points[candidates]) ** 2).sum(axis=2))
+
+        shared = (~np.isnan(chunk))[:, None, :] * self.masks[candidates]
+        squared = (((np.nan_to_num(chunk)[:, None, :] - self.points[candidates]) ** 2) * shared).sum(axis=2)
+        n_shared = shared.sum(axis=2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(n_shared > 0, np.sqrt(squared * (chunk.shape[1] / n_shared)), np.nan)
+
+    # Top k players closest to each row of metric values (one row or a matrix), sorted by distance.
+    # Returns (rows, distances), both of shape (n_values, min(k, number of players)): rows are positions in self.players.
+    # Without a KD-tree the distances are computed in chunks of chunk_size rows, so memory stays bounded for large batches.
+    # Query rows with missing values cannot be searched in the KD-tree, they take the chunked path (NaN distances in 'complete' mode)
+    def nearest(self, values, k=10, chunk_size=1024):
+        points = np.atleast_2d(self.transform_values(values))
+        k_complete = min(k, len(self.points))
+
+        if k_complete == 0:
+            nearest = np.empty((len(points), 0), dtype='int64')
+            distances = np.empty((len(points), 0))
+        elif self.tree is not None:
+            nearest = np.empty((len(points), k_complete), dtype='int64')
+            distances = np.empty((len(points), k_complete))
+            finite = np.isfinite(points).all(axis=1)
+            if finite.any():
+                tree_distances, tree_nearest = self.tree.query(points[finite], k=k_complete)
+                nearest[finite] = tree_nearest.reshape(-1, k_complete)
+                distances[finite] = tree_distances.reshape(-1, k_complete)
+            if not finite.all():
+                nearest[~finite], distances[~finite] = self._nearest_chunked(points[~finite], k_complete, chunk_size)
+        else:
+            nearest, distances = self._nearest_chunked(points, k_complete, chunk_size)
+
+        rows = self.rows[nearest]
+        if k > k_complete and len(self.incomplete_rows):
+            # fewer searchable players than requested: fill up with players that have missing metrics (no distance)
+            extra = self.incomplete_rows[:k - k_complete]
+            rows = np.hstack([rows, np.broadcast_to(extra, (len(points), len(extra)))])
+            distances = np.hstack([distances, np.full((len(points), len(extra)), np.nan)])
+        return rows, distances
+
+    # Top k searchable players of each point (k <= number of searchable players): argpartition of the squared distances per chunk,
+    # then exact distances of the candidates only, sorted
+    def _nearest_chunked(self, points, k, chunk_size):
+        nearest = np.empty((len(points), k), dtype='int64')
+        distances = np.empty((len(points), k))
+        for start in range(0, len(points), chunk_size):
+            chunk = points[start:start + chunk_size]
+            squared = self._squared_distances(chunk)
+            if k < len(self.points):
+                candidates = np.argpartition(squared, k - 1, axis=1)[:, :k]
+            else:
+                candidates = np.broadcast_to(np.arange(len(self.points)), squared.shape)
+            exact = self._candidate_distances(chunk, candidates)
+            order = np.argsort(exact, axis=1, kind='stable')
+            nearest[start:start + chunk_size] = np.take_along_axis(candidates, order, axis=1)
+            distances[start:start + chunk_size] = np.take_along_axis(exact, order, axis=1)
+        return nearest, distances
+
+    # Top k players closest to the given metric values, sorted by distance.
+    # Returns a new frame (the players' rows with Rank and Distance columns), the source frames are not modified.
+    def query(self, values, k=10):
+        rows, distances = self.nearest(values, k)
+        similar_players = self.players.take(rows[0]).reset_index(drop=True)
+        similar_players['Distance'] = distances[0]
+        similar_players.insert(0, 'Rank', range(1, len(similar_players) + 1))
+        return similar_players
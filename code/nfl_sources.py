@@ -0,0 +1,490 @@
+# **********************************************************************************************************************************************************************
+# Data sources of the NFL dashboard, without Streamlit (used by the dashboard through the Streamlit-cached loaders of nfl_data.py, by the HTTP service and the offline jobs)
+# - locations of the sources and of the derived files (Parquet snapshots, season partitions, distributions, cube, models, comparables, ...)
+# - readers per data set (combine data / seasonal stats), reading the Parquet snapshot if available; the seasonal stats are read from
+#   the season partitions of the ingestion pipeline (see nfl_fetch.py) if they exist
+# - explicit dtypes, cleaning, unit conversion and the resolution of duplicate player seasons
+# - content fingerprints of the source files (the hash is only recomputed when the mtime or size of the file changes)
+# - the analytics engine of one data version (build_engine) and the combine vs. season correlation matrix
+# **********************************************************************************************************************************************************************
+import functools
+import hashlib
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+import nfl_engine
+from nfl_aggregates import SeasonCube, build_season_cube
+from nfl_careers import CAREER_STATS, GAMES_COLUMN, CareerStore
+from nfl_comparables import read_comparables
+from nfl_correlations import build_correlations, correlation_settings, correlation_version, write_correlations
+from nfl_distributions import PositionDistributions
+from nfl_index import PlayerIndex
+from nfl_models import MANIFEST, ProjectionModels, latest_version
+from nfl_players import build_player_dimension
+from nfl_profile import stage
+
+# Default locations of the data sources (relative to the directory the app is started from)
+DATA_DIR = '00_Data'
+COMBINE_CSV = os.path.join(DATA_DIR, 'players_unique_2010_2023.csv')
+SEASON_CSV = os.path.join(DATA_DIR, 'players_2010_2023.csv')
+
+# Columns of the seasonal data held in memory by the dashboard: the identifiers, the games and the stats of the career store
+# (the KPIs of the dashboard are among them, see main_nfl_app.py)
+DASHBOARD_SEASON_COLUMNS = ['player_id', 'player_name', 'position', 'season', GAMES_COLUMN] + CAREER_STATS
+
+# Explicit dtypes for the columns we know about (columns not present in the file are ignored by pandas)
+COMBINE_DTYPES = {
+    'player_id': 'object',
+    'player_name': 'object',
+    'Pos': 'object',
+    'School': 'object',
+    'Height': 'object',
+    'Weight': 'float64',
+    '40yd': 'float64',
+    'Vertical': 'float64',
+    'Bench': 'float64',
+    'Broad Jump': 'float64',
+    '3Cone': 'float64',
+    'Shuttle': 'float64',
+    'Drafted': 'object',
+    'Round': 'float64',
+    'Pick': 'float64',
+}
+
+SEASON_DTYPES = {
+    'player_id': 'object',
+    'player_name': 'object',
+    'position': 'object',
+    'season_type': 'object',
+    'games': 'float64',
+    'receptions': 'float64',
+    'targets': 'float64',
+    'receiving_yards': 'float64',
+    'receiving_tds': 'float64',
+    'receiving_yards_after_catch': 'float64',
+    'carries': 'float64',
+    'rushing_yards': 'float64',
+    'rushing_tds': 'float64',
+}
+
+
+# **********************************************************************************************************************************************************************
+# File fingerprint used as cache key
+# **********************************************************************************************************************************************************************
+
+# For a directory of season partitions the fingerprint covers the names and contents of all partition files
+def file_fingerprint(path):
+    if os.path.isdir(path):
+        digest = hashlib.sha256()
+        for partition in partition_files(path):
+            digest.update(f'{os.path.basename(partition)}:{file_fingerprint(partition)};'.encode())
+        return digest.hexdigest()
+    stat = os.stat(path)
+    return _file_digest(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+# Last modification of a source (for a directory of partitions: of its newest partition file)
+def source_mtime(path):
+    if os.path.isdir(path):
+        return max((os.path.getmtime(partition) for partition in partition_files(path)), default=os.path.getmtime(path))
+    return os.path.getmtime(path)
+
+# The digest is memoized on (path, mtime, size): a rerun only costs one os.stat, an unchanged file is never re-hashed
+@functools.lru_cache(maxsize=64)
+def _file_digest(path, mtime_ns, size):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# **********************************************************************************************************************************************************************
+# Conversion of values
+# - only used for combine measurement values (easier to interpret in Europe).
+# - KPIs for seasonal performance remain in the original unit
+# **********************************************************************************************************************************************************************
+
+# Feet-inches strings such as "6-2" (whitespace around the parts is tolerated, anything else counts as not recorded)
+HEIGHT_PATTERN = r'^\s*(\d+)\s*-\s*(\d+)\s*$'
+
+# Vectorized equivalent of Python's round(x, ndigits) for float arrays.
+# np.round multiplies by 10**ndigits before rounding, which flips results that sit close to a half
+# (e.g. 125 inches -> 3.175 m: round() gives 3.17, np.round gives 3.18). To stay identical to round(),
+# the exact rounding error of the multiplication is recovered (Dekker's two-product) and used to break near-ties;
+# exact ties are rounded half to even like in Python.
+def round_like_python(values, ndigits=2):
+    values = np.asarray(values, dtype='float64')
+    scale = 10.0 ** ndigits
+    scaled = values * scale
+
+    # split values into a high and low part of 26 bits each, so high * scale and low * scale are exact
+    split = values * 134217729.0
+    high = split - (split - values)
+    low = values - high
+    error = (high * scale - scaled) + low * scale
+
+    floor = np.floor(scaled)
+    fraction = scaled - floor
+    round_up = (fraction > 0.5) | ((fraction == 0.5) & ((error > 0) | ((error == 0) & (np.fmod(floor, 2) != 0))))
+    return np.where(round_up, floor + 1, floor) / scale
+
+# Conversion of the combine metrics for us in eu metrics, performed on whole columns.
+# Produces the same values as the former per-row helpers (feet_inches_to_cm, pounds_to_kg, inches_to_m, inches_to_cm):
+# rounded to two decimals, NaN where the source value is missing or the height is not in feet-inches format
+def convert_combine_units(df):
+    # only a few dozen distinct heights exist: parse the unique strings and broadcast them back via the factorized codes
+    codes, heights = pd.factorize(df['Height'])
+    feet_inches = pd.Series(heights, dtype='object').astype('string').str.extract(HEIGHT_PATTERN).astype('float64')
+    unique_inches = np.append(feet_inches[0].to_numpy() * 12 + feet_inches[1].to_numpy(), np.nan)
+    height_inches = unique_inches[codes]
+
+    df['Height_cm'] = round_like_python(height_inches * 2.54)
+    df['Weight_kg'] = round_like_python(df['Weight'].to_numpy(dtype='float64') * 0.453592)
+    df['BroadJump_m'] = round_like_python(df['Broad Jump'].to_numpy(dtype='float64') * 0.0254)
+    df['Vertical_cm'] = round_like_python(df['Vertical'].to_numpy(dtype='float64') * 2.54)
+    return df
+
+
+# **********************************************************************************************************************************************************************
+# Cleaning
+# - shared by the ingest step (CSV -> Parquet snapshot) and the CSV fallback of the loaders, so both paths yield the same schema
+# **********************************************************************************************************************************************************************
+
+# Low-cardinality / repeated string columns are stored as categoricals
+COMBINE_CATEGORICALS = ['Pos', 'player_name']
+SEASON_CATEGORICALS = ['position', 'player_name']
+
+def clean_combine_data(df):
+    # 'season' as int16 like in the seasonal data, rows without a valid season are dropped
+    if 'season' in df.columns:
+        df['season'] = pd.to_numeric(df['season'], errors='coerce')
+        df = df.dropna(subset=['season']).reset_index(drop=True)
+        df = df.assign(season=df['season'].astype('int16'))
+    with stage('convert_units', rows=len(df)):
+        df = convert_combine_units(df)
+    for column in COMBINE_CATEGORICALS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    return df
+
+# Seasonal rows with a valid season (int16), duplicates are kept (e.g. the rows of a season partition, see nfl_fetch.py)
+def season_rows(df):
+    # Ensure the 'season' column is an integer and handle any invalid data
+    df['season'] = pd.to_numeric(df['season'], errors='coerce')
+
+    # Drop rows where 'season' is NaN or invalid
+    df = df.dropna(subset=['season'])
+    return df.assign(season=df['season'].astype('int16'))
+
+# report=True returns (df, report of the collapsed duplicates, see deduplicate_seasons)
+def clean_season_data(df, report=False):
+    df, duplicates = deduplicate_seasons(season_rows(df))
+    for column in SEASON_CATEGORICALS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    df = df.reset_index(drop=True)
+    return (df, duplicates) if report else df
+
+def read_combine_csv(path=COMBINE_CSV):
+    return clean_combine_data(pd.read_csv(path, dtype=COMBINE_DTYPES))
+
+def read_season_csv(path=SEASON_CSV, columns=None, report=False):
+    usecols = None if columns is None else (lambda column: column in columns)
+    return clean_season_data(pd.read_csv(path, dtype=SEASON_DTYPES, usecols=usecols), report)
+
+# Report of the duplicates collapsed by the ingest step, written next to the data
+def duplicate_report_path(csv_path=SEASON_CSV):
+    return os.path.splitext(csv_path)[0] + '_duplicates.csv'
+
+
+# **********************************************************************************************************************************************************************
+# Deduplication of the seasonal data: one canonical row per (player_id, season)
+# The seasonal CSV merges the rosters of all seasons onto the stats by player_id, a player listed with several
+# positions / names / draft numbers therefore appears several times per season (usually with identical stats).
+# Rule for the rows of one (player_id, season):
+#   1. the row with the player's most frequent position wins (ties: alphabetical order of the positions)
+#   2. then the row with the most recorded values
+#   3. then the first row in file order
+# Rows without player_id are kept as they are. The report lists one row per collapsed (player_id, season).
+# **********************************************************************************************************************************************************************
+
+SEASON_KEY = ['player_id', 'season']
+DUPLICATE_REPORT_COLUMNS = SEASON_KEY + ['rows', 'kept_player_name', 'kept_position', 'dropped_positions', 'conflicting_columns']
+
+def deduplicate_seasons(df):
+    empty_report = pd.DataFrame(columns=DUPLICATE_REPORT_COLUMNS)
+    if 'player_id' not in df.columns:
+        return df, empty_report
+    duplicated = df['player_id'].notna() & df.duplicated(SEASON_KEY, keep=False)
+    if not duplicated.any():
+        return df, empty_report
+
+    rows = df[duplicated]
+    ranking = pd.DataFrame({
+        'player_id': rows['player_id'],
+        'season': rows['season'],
+        'modal_position': False,
+        'recorded': rows.notna().sum(axis=1),
+        'order': np.arange(len(rows)),
+    }, index=rows.index)
+    if 'position' in df.columns:
+        players = df[df['player_id'].isin(rows['player_id'].unique())]
+        counts = players.groupby(['player_id', 'position'], observed=True).size().rename('count').reset_index()
+        modal = counts.sort_values(['player_id', 'count'], ascending=[True, False], kind='stable').drop_duplicates('player_id')
+        ranking['modal_position'] = (rows['position'].astype('object').to_numpy()
+                                     == rows['player_id'].map(modal.set_index('player_id')['position']).astype('object').to_numpy())
+
+    ranking = ranking.sort_values(SEASON_KEY + ['modal_position', 'recorded', 'order'], ascending=[True, True, False, False, True], kind='stable')
+    kept = ranking.drop_duplicates(SEASON_KEY).index
+    dropped = rows.index.difference(kept)
+
+    # Report: columns with different values within each collapsed group
+    groups = rows.groupby(SEASON_KEY, sort=True)
+    differing = groups.nunique(dropna=False) > 1
+    canonical = rows.loc[kept].set_index(SEASON_KEY).sort_index()
+    report = pd.DataFrame({
+        'rows': groups.size(),
+        'kept_player_name': canonical['player_name'] if 'player_name' in rows.columns else None,
+        'kept_position': canonical['position'] if 'position' in rows.columns else None,
+        'dropped_positions': (rows.loc[dropped, 'position'].astype(str) + ', ').groupby([rows.loc[dropped, key] for key in SEASON_KEY]).sum().str[:-2]
+                             if 'position' in rows.columns else None,
+        # joined names of the differing columns (bool x str: the name or '')
+        'conflicting_columns': differing.dot(differing.columns + ', ').str[:-2].fillna(''),
+    }).reset_index()
+    return df.drop(index=dropped), report[DUPLICATE_REPORT_COLUMNS]
+
+
+# **********************************************************************************************************************************************************************
+# Parquet snapshots
+# - pre-cleaned and pre-converted copies of the CSVs, written by: python code/nfl_ingest.py
+# - stored next to the CSV with the same name and a .parquet suffix
+# **********************************************************************************************************************************************************************
+
+def snapshot_path(csv_path):
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+# Summary table of the position distributions of the combine data (see nfl_distributions.py), also written by the ingest step
+def summary_path(csv_path=COMBINE_CSV):
+    return os.path.splitext(csv_path)[0] + '_distributions.parquet'
+
+# Season aggregates cube of the seasonal data (see nfl_aggregates.py), also written by the ingest step
+def cube_path(csv_path=SEASON_CSV):
+    return os.path.splitext(csv_path)[0] + '_aggregates.parquet'
+
+# Player dimension with the stable int32 player keys (see nfl_players.py), written by the ingest step
+def dimension_path(csv_path=COMBINE_CSV):
+    return os.path.join(os.path.dirname(csv_path), 'players_dimension.parquet')
+
+# Versions of the projection models (see nfl_models.py), written by: python code/nfl_train.py
+def models_dir(csv_path=COMBINE_CSV):
+    return os.path.join(os.path.dirname(csv_path), 'models')
+
+# All-players comparables table (see nfl_comparables.py), written by: python code/nfl_comparables.py
+def comparables_path(csv_path=COMBINE_CSV):
+    return os.path.splitext(csv_path)[0] + '_comparables.parquet'
+
+def correlations_path(csv_path=COMBINE_CSV):
+    return os.path.splitext(csv_path)[0] + '_correlations.parquet'
+
+# Stored player dimension extended by the players of the given frames (new players get the next keys)
+def update_player_dimension(frames, path):
+    existing = read_parquet(path) if os.path.exists(path) else None
+    return build_player_dimension(frames, existing)
+
+# A derived table is only used if it exists and is not older than the data it was built from
+def is_current(derived_path, source):
+    return os.path.exists(derived_path) and os.path.getmtime(derived_path) >= source_mtime(source)
+
+# A snapshot is only used if it exists and is not older than its CSV (otherwise the CSV was updated after the last ingest)
+def resolve_source(csv_path):
+    parquet_path = snapshot_path(csv_path)
+    if os.path.exists(parquet_path) and (not os.path.exists(csv_path) or os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)):
+        return parquet_path
+    return csv_path
+
+def read_parquet(path, columns=None):
+    if columns is not None:
+        available = pq.read_schema(path).names
+        columns = [column for column in available if column in columns]
+    return pd.read_parquet(path, engine='pyarrow', columns=columns)
+
+# Uncached reads of a resolved source (snapshot, CSV or season partitions), e.g. for command line tools
+def read_combine_source(source):
+    if source.endswith('.parquet'):
+        return read_parquet(source)
+    return read_combine_csv(source)
+
+def read_season_source(source, columns=None):
+    if os.path.isdir(source):
+        return read_partitions(source, columns)
+    if source.endswith('.parquet'):
+        return read_parquet(source, columns)
+    return read_season_csv(source, columns)
+
+
+# **********************************************************************************************************************************************************************
+# Season partitions
+# - written by the ingestion pipeline (python code/nfl_fetch.py): one Parquet file per season in <data dir>/seasons,
+#   so a new season (or an update of the running season) only writes its own file
+# - if the directory contains partitions, it replaces the seasonal CSV/snapshot as source of the seasonal stats
+# - the partitions hold the rows as fetched (duplicates included): duplicate player seasons are resolved when the partitions are
+#   read, over all seasons like for the CSV, so both sources yield the same rows for the same raw data
+# **********************************************************************************************************************************************************************
+
+def partition_dir(csv_path=SEASON_CSV):
+    return os.path.join(os.path.dirname(csv_path), 'seasons')
+
+def partition_path(directory, season):
+    return os.path.join(directory, f'season_{int(season)}.parquet')
+
+def partition_files(directory):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if re.fullmatch(r'season_\d+\.parquet', name))
+
+# Seasons stored as partitions (sorted)
+def stored_seasons(directory):
+    return [int(re.search(r'(\d+)', os.path.basename(path)).group(1)) for path in partition_files(directory)]
+
+# Rows of all partitions as stored (duplicates included)
+def _partition_rows(directory, columns=None):
+    frames = [read_parquet(path, None if columns is None else set(columns) | {'player_id', 'season'}) for path in partition_files(directory)]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame({'season': pd.Series(dtype='int16')})
+
+# All partitions as one frame (same schema as the cleaned seasonal CSV, first_year = first stored season of the player)
+def read_partitions(directory, columns=None):
+    df = _partition_rows(directory, columns)
+    if (columns is None or 'first_year' in columns) and 'player_id' in df.columns:
+        df['first_year'] = df.groupby('player_id')['season'].transform('min')
+    if columns is not None:
+        df = df[[column for column in df.columns if column in columns]]
+    # categories differ between the partitions, they are unified here
+    return clean_season_data(df)
+
+# Report of the duplicates collapsed when the partitions are read (see deduplicate_seasons)
+def partition_duplicates(directory):
+    return deduplicate_seasons(_partition_rows(directory))[1]
+
+# Seasonal source: the season partitions if present, otherwise the snapshot or CSV
+def resolve_season_source(csv_path=SEASON_CSV):
+    directory = partition_dir(csv_path)
+    if partition_files(directory):
+        return directory
+    return resolve_source(csv_path)
+
+
+# **********************************************************************************************************************************************************************
+# Compact in-memory representation of the frames held by the engine (one read-only copy per process, shared by all sessions)
+# - repeated strings (positions, names and player_ids of the seasonal data, ...) become categoricals, numeric columns are downcast where no value changes:
+#   integral floats (counts like yards, receptions, bench reps) -> float32 (exact up to 2^24), integers -> smallest int type
+# - measurements with decimals (e.g. 40yd, Height_cm) stay float64, so displayed values and distances are unchanged
+# - only applied to the frames of the engine: snapshots, the ingest step and the training read the data unchanged
+# **********************************************************************************************************************************************************************
+
+# String columns with at most this share of distinct values become categoricals
+CATEGORY_MAX_SHARE = 0.5
+
+FLOAT32_EXACT_INTEGERS = 2**24
+
+
+def compact_frame(df):
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        if values.dtype == 'object':
+            if values.nunique() <= CATEGORY_MAX_SHARE * len(values):
+                columns[column] = values.astype('category')
+        elif values.dtype == 'float64':
+            array = values.to_numpy()
+            finite = array[~np.isnan(array)]
+            if np.array_equal(finite, np.round(finite)) and (len(finite) == 0 or np.abs(finite).max() <= FLOAT32_EXACT_INTEGERS):
+                columns[column] = values.astype('float32')
+        elif values.dtype.kind in 'iu':
+            columns[column] = pd.to_numeric(values, downcast='integer' if values.dtype.kind == 'i' else 'unsigned')
+    return df.assign(**columns) if columns else df
+
+
+# **********************************************************************************************************************************************************************
+# Analytics engine (see nfl_engine.py): player index, combine distributions, season aggregates cube and projection models of one data version
+# **********************************************************************************************************************************************************************
+
+# Files the engine is built from. Derived tables (summaries, cube) are only used if they are current, else they are None
+# and built from the data; the projection models are the latest trained version (None if none was trained)
+def engine_sources(combine_path=COMBINE_CSV, season_path=SEASON_CSV):
+    combine = resolve_source(combine_path)
+    season = resolve_season_source(season_path)
+    dimension = dimension_path(combine_path)
+    models = models_dir(combine_path)
+    version = latest_version(models)
+    return {
+        'combine': combine,
+        'season': season,
+        'dimension': dimension if os.path.exists(dimension) else None,
+        'summaries': summary_path(combine_path) if is_current(summary_path(combine_path), combine) else None,
+        'cube': cube_path(season_path) if is_current(cube_path(season_path), season) else None,
+        'models': None if version is None else os.path.join(models, version),
+        'comparables': comparables_path(combine_path) if is_current(comparables_path(combine_path), combine)
+                       and (not os.path.exists(dimension) or is_current(comparables_path(combine_path), dimension)) else None,
+    }
+
+
+# Fingerprint of every source (None for missing sources), identifies the data version of an engine
+def source_fingerprints(sources):
+    return tuple((name, None if path is None else file_fingerprint(os.path.join(path, MANIFEST) if name == 'models' else path))
+                 for name, path in sorted(sources.items()))
+
+
+# Engine over the sources (see engine_sources). season_columns: columns of the seasonal data held in memory (None: all)
+# The player keys come from the stored player dimension if present (stable keys), players missing there are added in memory
+def build_engine(sources, season_columns=None, version=None):
+    with stage('load_combine') as record:
+        combine = compact_frame(read_combine_source(sources['combine']))
+        record.rows = len(combine)
+    with stage('load_seasons') as record:
+        season = compact_frame(read_season_source(sources['season'], season_columns))
+        record.rows = len(season)
+    with stage('player_dimension'):
+        dimension = build_player_dimension([combine, season], None if sources['dimension'] is None else read_parquet(sources['dimension']))
+    with stage('index_build', rows=len(combine) + len(season)):
+        player_index = PlayerIndex(combine, season, dimension, version)
+    with stage('distributions', rows=len(combine)):
+        distributions = PositionDistributions(player_index.combine, None if sources['summaries'] is None else read_parquet(sources['summaries']))
+    with stage('season_cube') as record:
+        if sources['cube'] is None:
+            # all stats are aggregated, the full seasonal data is only held while building the cube
+            cube = build_season_cube(read_season_source(sources['season']))
+        else:
+            cube = read_parquet(sources['cube'])
+        record.rows = len(cube)
+    with stage('projection_models'):
+        models = None if sources['models'] is None else ProjectionModels(sources['models'])
+    with stage('comparables'):
+        comparables = None if sources['comparables'] is None else read_comparables(sources['comparables'])
+    with stage('career_store', rows=len(player_index.season)):
+        # stats of the store that are in the loaded seasonal columns (see CareerStore)
+        careers = CareerStore(player_index.season)
+    return nfl_engine.AnalyticsEngine(player_index, distributions, SeasonCube(cube), models, version, comparables, careers)
+
+
+# **********************************************************************************************************************************************************************
+# Combine vs. season correlation matrix (see nfl_correlations.py), keyed by the dataset version of the combine and seasonal data
+# **********************************************************************************************************************************************************************
+
+# Sources of the correlation matrix and their dataset version
+def correlation_sources(combine_path=COMBINE_CSV, season_path=SEASON_CSV):
+    combine = resolve_source(combine_path)
+    season = resolve_season_source(season_path)
+    return combine, season, correlation_version({'combine': file_fingerprint(combine), 'season': file_fingerprint(season)})
+
+
+# Compute the correlation matrix of the current data and store it next to the combine data. Returns (table, version)
+def compute_correlations(combine_path=COMBINE_CSV, season_path=SEASON_CSV, settings=None, workers=None):
+    settings = correlation_settings() if settings is None else settings
+    combine, season, version = correlation_sources(combine_path, season_path)
+    table = build_correlations(read_combine_source(combine), read_season_source(season), settings, workers=workers)
+    write_correlations(table, correlations_path(combine_path), version, settings)
+    return table, version
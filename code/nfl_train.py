@@ -0,0 +1,79 @@
+# **********************************************************************************************************************************************************************
+# Training of the projection models (see nfl_models.py)
+# - reads the combine data and the seasonal stats like the dashboard (snapshot / season partitions if present, else the CSVs)
+# - fits one model per (position, target stat) in a process pool and writes them to <data dir>/models/<version>/,
+#   afterwards <data dir>/models/LATEST points to the new version (the dashboard picks it up on the next rerun)
+# - the same data and settings give the same version and the same models
+# - run via: python code/nfl_train.py [--data-dir 00_Data] [--positions WR RB] [--seed 42] [--estimators 100] [--workers 4]
+# **********************************************************************************************************************************************************************
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import nfl_sources
+from nfl_models import (DEFAULT_SEED, LATEST, MANIFEST, MIN_TRAINING_PLAYERS, MODEL_PARAMS, PROJECTION_TARGETS, fit_model, model_seed,
+                        model_version, training_table)
+from nfl_similarity import SIMILARITY_METRICS
+
+
+# Train all models of the positions and write them to directory/<version>. Returns the version directory
+def train_models(combine_source, season_source, directory, positions=tuple(PROJECTION_TARGETS), seed=DEFAULT_SEED, params=MODEL_PARAMS,
+                 workers=None, features=SIMILARITY_METRICS):
+    targets = sorted({target for position in positions for target in PROJECTION_TARGETS[position]})
+    combine = nfl_sources.read_combine_source(combine_source)
+    season = nfl_sources.read_season_source(season_source, ['player_id', 'season'] + targets)
+
+    data = {'combine': nfl_sources.file_fingerprint(combine_source), 'season': nfl_sources.file_fingerprint(season_source)}
+    version, settings = model_version(data, positions, seed, params, features)
+    version_dir = os.path.join(directory, version)
+    os.makedirs(version_dir, exist_ok=True)
+
+    tasks = []
+    for position in positions:
+        table = training_table(combine, season, position, PROJECTION_TARGETS[position], features)
+        for target in PROJECTION_TARGETS[position]:
+            rows = table[target].notna().to_numpy()
+            if rows.sum() < MIN_TRAINING_PLAYERS:
+                print(f'{position} {target}: {rows.sum()} players, no model (minimum {MIN_TRAINING_PLAYERS})')
+                continue
+            tasks.append((position, target, table[list(features)].to_numpy(dtype='float64')[rows], table[target].to_numpy(dtype='float64')[rows],
+                          model_seed(seed, position, target), dict(params), os.path.join(version_dir, f'{position}_{target}.joblib')))
+
+    if workers == 1:
+        entries = list(map(fit_model, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            entries = list(pool.map(fit_model, tasks))
+
+    manifest = dict(settings, version=version, models={})
+    for entry in entries:
+        manifest['models'].setdefault(entry.pop('position'), {})[entry.pop('target')] = entry
+        print(f"{os.path.join(version_dir, entry['file'])}: {entry['n_train']:,} players, out-of-bag R^2 {entry['oob_r2']:.3f}")
+    with open(os.path.join(version_dir, MANIFEST), 'w') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    with open(os.path.join(directory, LATEST + '.tmp'), 'w') as file:
+        file.write(version)
+    os.replace(os.path.join(directory, LATEST + '.tmp'), os.path.join(directory, LATEST))
+    return version_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the projection models (combine metrics -> seasonal stats) per position and stat')
+    parser.add_argument('--data-dir', default=nfl_sources.DATA_DIR, help='directory of the dashboard data')
+    parser.add_argument('--positions', nargs='+', default=list(PROJECTION_TARGETS), choices=list(PROJECTION_TARGETS))
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='base seed of the models')
+    parser.add_argument('--estimators', type=int, default=MODEL_PARAMS['n_estimators'], help='trees per model')
+    parser.add_argument('--workers', type=int, default=None, help='processes fitting models (default: number of CPUs)')
+    args = parser.parse_args()
+
+    combine_csv_path = os.path.join(args.data_dir, os.path.basename(nfl_sources.COMBINE_CSV))
+    season_csv_path = os.path.join(args.data_dir, os.path.basename(nfl_sources.SEASON_CSV))
+    params = dict(MODEL_PARAMS, n_estimators=args.estimators)
+    version_dir = train_models(nfl_sources.resolve_source(combine_csv_path), nfl_sources.resolve_season_source(season_csv_path),
+                               nfl_sources.models_dir(combine_csv_path), args.positions, args.seed, params, args.workers)
+    print(f'models -> {version_dir}')
+
+
+if __name__ == '__main__':
+    main()
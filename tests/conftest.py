@@ -0,0 +1,68 @@
+# **********************************************************************************************************************************************************************
+# Shared test setup: the modules of code/ are imported as flat siblings (like the dashboard and the benchmarks do)
+# - raw_combine / raw_season: small raw data sets in the layout of the shipped CSVs (imperial units, height as "6-1")
+# - data_dir: both written as CSVs into a temporary data directory
+# - run via: python -m pytest tests
+# **********************************************************************************************************************************************************************
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'code'))
+
+import nfl_sources
+
+POSITIONS = ['WR', 'RB', 'TE']
+
+
+@pytest.fixture
+def raw_combine():
+    rng = np.random.default_rng(0)
+    n = 60
+    inches = rng.integers(68, 78, n)
+    combine = pd.DataFrame({
+        'player_id': [f'00-{i:07d}' for i in range(n)],
+        'player_name': [f'Player {i}' for i in range(n)],
+        'Pos': np.resize(POSITIONS, n),
+        'School': 'State',
+        'season': rng.integers(2010, 2020, n),
+        'Height': [f'{value // 12}-{value % 12}' for value in inches],
+        'Weight': rng.normal(210, 15, n).round(),
+        '40yd': rng.normal(4.55, 0.1, n).round(2),
+        'Vertical': rng.normal(35, 3, n).round(1),
+        'Bench': rng.normal(16, 4, n).round(),
+        'Broad Jump': rng.normal(120, 6, n).round(),
+        '3Cone': rng.normal(7.0, 0.2, n).round(2),
+        'Shuttle': rng.normal(4.3, 0.15, n).round(2),
+        'Drafted': 'x',
+        'Round': 1.0,
+        'Pick': 1.0,
+    })
+    # a few skipped drills, like in the real combine data
+    combine.loc[rng.choice(n, 8, replace=False), 'Bench'] = np.nan
+    combine.loc[rng.choice(n, 6, replace=False), 'Vertical'] = np.nan
+    return combine
+
+
+@pytest.fixture
+def raw_season(raw_combine):
+    rows = []
+    for number, player in raw_combine.iterrows():
+        for year in range(number % 4 + 1):
+            games = 8 + (number + year) % 9
+            rows.append({'player_id': player['player_id'], 'player_name': player['player_name'], 'position': player['Pos'],
+                         'season': player['season'] + year, 'season_type': 'REG', 'games': games,
+                         'receptions': 2.0 * games + number % 7, 'targets': 3.0 * games, 'receiving_yards': 25.0 * games + number,
+                         'receiving_tds': float(year + number % 3), 'receiving_yards_after_catch': 8.0 * games,
+                         'carries': float(games + number % 5), 'rushing_yards': 4.0 * games, 'rushing_tds': float(number % 2)})
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture
+def data_dir(tmp_path, raw_combine, raw_season):
+    raw_combine.to_csv(tmp_path / os.path.basename(nfl_sources.COMBINE_CSV), index=False)
+    raw_season.to_csv(tmp_path / os.path.basename(nfl_sources.SEASON_CSV), index=False)
+    return tmp_path
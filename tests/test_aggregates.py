@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from nfl_aggregates import build_season_cube, stat_columns, update_season_cube
+
+
+def season_rows():
+    return pd.DataFrame({
+        'player_id': ['a', 'b', 'c', 'a', 'b'],
+        'position': ['WR', 'WR', 'RB', 'WR', 'WR'],
+        'season': [2020, 2020, 2020, 2021, 2021],
+        'draft_number': [12.0, 40.0, 3.0, 12.0, 40.0],
+        'jersey_number': [11, 80, 22, 11, 80],
+        'age': [23.0, 25.0, 22.0, 24.0, 26.0],
+        'receiving_yards': [800.0, 400.0, 100.0, np.nan, 600.0],
+        'receptions': [60.0, 30.0, 10.0, 50.0, 45.0],
+    })
+
+
+def test_identifier_and_roster_columns_are_not_stats():
+    assert stat_columns(season_rows()) == ['receiving_yards', 'receptions']
+
+
+def test_cube_aggregates_stats_only():
+    cube = build_season_cube(season_rows())
+    assert set(cube['stat']) == {'receiving_yards', 'receptions'}
+    wr_2020 = cube[(cube['position'] == 'WR') & (cube['season'] == 2020)].set_index('stat')
+    assert wr_2020.loc['receiving_yards', 'mean'] == 600.0
+    # missing values are ignored
+    wr_2021 = cube[(cube['position'] == 'WR') & (cube['season'] == 2021)].set_index('stat')
+    assert wr_2021.loc['receiving_yards', 'count'] == 1
+
+
+def test_update_matches_a_full_rebuild():
+    cube = build_season_cube(season_rows())
+    season = season_rows()
+    season.loc[season['season'] == 2021, 'receptions'] += 5
+    season = pd.concat([season, season_rows().iloc[:2].assign(season=2022)], ignore_index=True)
+
+    updated, aggregated = update_season_cube(cube, season)
+    assert aggregated == [2021, 2022]
+    pd.testing.assert_frame_equal(updated, build_season_cube(season))
+    # unchanged data aggregates nothing, removed seasons are dropped
+    assert update_season_cube(updated, season)[1] == []
+    removed, aggregated = update_season_cube(updated, season[season['season'] != 2020])
+    assert aggregated == [] and 2020 not in set(removed['season'])
@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+pytest.importorskip('fastapi')
+pytest.importorskip('httpx')
+pytest.importorskip('uvicorn')
+from fastapi.testclient import TestClient
+
+import nfl_sources
+from nfl_api import create_app
+from nfl_similarity import SIMILARITY_METRICS
+
+
+@pytest.fixture
+def client(data_dir):
+    sources = nfl_sources.engine_sources(os.path.join(data_dir, os.path.basename(nfl_sources.COMBINE_CSV)),
+                                         os.path.join(data_dir, os.path.basename(nfl_sources.SEASON_CSV)))
+    engine = nfl_sources.build_engine(sources, version=(nfl_sources.source_fingerprints(sources), None))
+    return TestClient(create_app(engine))
+
+
+def new_player(**missing):
+    values = {'Height_cm': 185.0, 'Weight_kg': 95.0, '40yd': 4.5, 'Vertical_cm': 90.0, 'BroadJump_m': 3.05, 'Bench': 15.0}
+    return {**values, **missing}
+
+
+def test_mahalanobis_without_missing_mode_estimates_missing_values(client):
+    response = client.post('/comparables', json={'position': 'WR', 'metrics': new_player(Bench=None), 'k': 5, 'distance': 'mahalanobis'})
+    assert response.status_code == 200
+    assert len(response.json()) == 5
+
+
+def test_mahalanobis_with_weights_is_rejected(client):
+    response = client.post('/comparables', json={'position': 'WR', 'metrics': new_player(), 'distance': 'mahalanobis',
+                                                  'weights': {SIMILARITY_METRICS[0]: 2.0}})
+    assert response.status_code == 422
+
+
+def test_euclidean_with_weights(client):
+    response = client.post('/comparables', json={'position': 'WR', 'metrics': new_player(), 'k': 3, 'weights': {'40yd': 2.0}})
+    assert response.status_code == 200
+    assert [row['Rank'] for row in response.json()] == [1, 2, 3]
+
+
+def test_unknown_weights_are_rejected(client):
+    response = client.post('/comparables', json={'position': 'WR', 'metrics': new_player(), 'weights': {'40yd': 2.0, 'Speed': 1.0}})
+    assert response.status_code == 422
+    assert 'Speed' in response.json()['detail']
+
+
+def test_season_series_of_an_unknown_position(client):
+    assert client.get('/seasons/WR/receptions').status_code == 200
+    assert client.get('/seasons/XX/receptions').status_code == 404
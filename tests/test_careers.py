@@ -0,0 +1,56 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import nfl_sources
+from nfl_careers import CAREER_SEARCH_STATS, CareerStore
+
+
+def season_rows():
+    return pd.DataFrame({
+        'player_key': [1, 1, 1, 2, 2, 2],
+        'position': ['WR', 'WR', 'WR', 'RB', 'RB', 'RB'],
+        'season': [2018, 2019, 2021, 2020, 2020, 2021],
+        'games': [10.0, 16.0, 8.0, 6.0, 10.0, 12.0],
+        'receptions': [20.0, 64.0, np.nan, 6.0, 14.0, 24.0],
+        'receiving_yards': [200.0, 800.0, 120.0, 30.0, 70.0, 240.0],
+    })
+
+
+def test_seasons_are_aligned_by_career_year():
+    store = CareerStore(season_rows())
+    row = store.rows(1)[0]
+    assert store.first_season[row] == 2018
+    assert store.mask[row].tolist() == [True, True, False, True]
+    assert store.per_game[row, 1, store.stats.index('receiving_yards')] == 50.0
+    # rolling mean over the recorded career years of the window, missing values skipped
+    assert np.isclose(store.rolling[row, 3, store.stats.index('receiving_yards')], (50.0 + 15.0) / 2)
+    assert np.isnan(store.rolling[row, 2]).all()
+
+
+def test_rows_of_one_player_and_season_are_summed():
+    store = CareerStore(season_rows())
+    row = store.rows(2)[0]
+    assert store.games[row, 0] == 16.0
+    assert store.totals[row, 0].tolist() == [20.0, 100.0]
+    history = store.history(2)
+    assert history['season'].tolist() == [2020, 2021]
+    assert history['receiving_yards'].tolist() == [100.0, 240.0]
+
+
+def test_history_keeps_player_order_and_drops_missing_stats():
+    store = CareerStore(season_rows())
+    history = store.history([2, 1], stats=['receptions'])
+    assert history['player_key'].tolist() == [2, 2, 1, 1]
+    assert history['season'].tolist() == [2020, 2021, 2018, 2019]
+    assert history['career_year'].tolist() == [1, 2, 1, 2]
+
+
+def test_dashboard_engine_searches_all_career_stats(data_dir):
+    sources = nfl_sources.engine_sources(os.path.join(data_dir, os.path.basename(nfl_sources.COMBINE_CSV)),
+                                         os.path.join(data_dir, os.path.basename(nfl_sources.SEASON_CSV)))
+    engine = nfl_sources.build_engine(sources, nfl_sources.DASHBOARD_SEASON_COLUMNS)
+    assert 'targets' in engine.careers.search_stats('WR')
+    assert engine.careers.search_stats('WR') == CAREER_SEARCH_STATS['WR']
+    assert engine.careers.search_stats('RB') == CAREER_SEARCH_STATS['RB']
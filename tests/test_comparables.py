@@ -0,0 +1,48 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import nfl_sources
+from nfl_comparables import build_comparables, nearest_comparables
+from nfl_similarity import SimilarityEngine
+
+METRICS = ['a', 'b']
+
+
+def test_player_is_left_out_of_its_comparables():
+    values = np.array([[0.0, 0.0], [0.0, 0.0], [1.0, 0.0], [0.0, 2.0], [3.0, 3.0]])
+    keys = np.array([10, 11, 12, 13, 14])
+    engine = SimilarityEngine(pd.DataFrame(values, columns=METRICS), METRICS, values=values)
+    table = nearest_comparables(engine, keys, values, keys, k=3)
+
+    assert not (table['player_key'] == table['neighbour_key']).any()
+    assert table.groupby('player_key')['rank'].apply(list).eq([[1, 2, 3]] * 5).all()
+    # the twin of a player (same metrics) is its closest comparable
+    first = table[table['rank'] == 1].set_index('player_key')
+    assert first.loc[10, 'neighbour_key'] == 11 and first.loc[11, 'neighbour_key'] == 10
+    assert first.loc[10, 'distance'] == 0
+
+
+def test_players_without_metrics_get_no_comparables():
+    values = np.array([[0.0, 0.0], [1.0, 1.0], [2.0, 0.0]])
+    keys = np.array([1, 2, 3])
+    engine = SimilarityEngine(pd.DataFrame(values, columns=METRICS), METRICS, values=values)
+    table = nearest_comparables(engine, keys, np.array([[np.nan, np.nan], [1.0, 1.0]]), np.array([4, 2]), k=2)
+    assert set(table['player_key']) == {2}
+    assert sorted(table['neighbour_key']) == [1, 3]
+
+
+def test_comparables_of_all_players(data_dir):
+    sources = nfl_sources.engine_sources(os.path.join(data_dir, os.path.basename(nfl_sources.COMBINE_CSV)),
+                                         os.path.join(data_dir, os.path.basename(nfl_sources.SEASON_CSV)))
+    index = nfl_sources.build_engine(sources).index
+    table = build_comparables(index, k=5, workers=1, block_size=7)
+
+    assert not (table['player_key'] == table['neighbour_key']).any()
+    assert (table.groupby('player_key').size() <= 5).all()
+    positions = pd.concat([index.combine_rows(position)[['player_key']].assign(neighbour_position=position) for position in index.positions])
+    neighbours = table.merge(positions, left_on='neighbour_key', right_on='player_key', suffixes=('', '_neighbour'))
+    assert (neighbours['position'].astype(str) == neighbours['neighbour_position']).all()
+    # the blocks give the same comparables as one block per position
+    pd.testing.assert_frame_equal(table, build_comparables(index, k=5, workers=1, block_size=1000))
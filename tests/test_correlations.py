@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from scipy import stats as scipy_stats
+
+from nfl_correlations import MIN_CORRELATION_PLAYERS, correlate
+
+
+def metric_and_stats(n=60, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.normal(4.5, 0.15, size=n)
+    Y = np.column_stack([
+        800 - 900 * (x - 4.5) + rng.normal(0, 60, size=n),
+        np.round(rng.normal(3, 2, size=n)),                     # many ties
+        20 + 10 * x + rng.normal(0, 1, size=n),
+    ])
+    Y[rng.random(Y.shape) < 0.15] = np.nan
+    x[[3, 11]] = np.nan
+    return x, Y
+
+
+def test_point_estimates_match_scipy():
+    x, Y = metric_and_stats()
+    table = correlate(x, Y, ['yards', 'touchdowns', 'other'], resamples=50)
+    for column, row in enumerate(table.itertuples()):
+        both = ~np.isnan(x) & ~np.isnan(Y[:, column])
+        pearson = scipy_stats.pearsonr(x[both], Y[both, column])
+        spearman = scipy_stats.spearmanr(x[both], Y[both, column])
+        line = scipy_stats.linregress(x[both], Y[both, column])
+        assert row.n == both.sum()
+        assert row.pearson == pytest.approx(pearson[0], abs=1e-10)
+        assert row.pearson_p == pytest.approx(pearson[1], rel=1e-6)
+        assert row.spearman == pytest.approx(spearman[0], abs=1e-10)
+        assert row.slope == pytest.approx(line.slope, rel=1e-8)
+        assert row.intercept == pytest.approx(line.intercept, rel=1e-8)
+        assert row.r2 == pytest.approx(line.rvalue ** 2, abs=1e-10)
+        assert row.pearson_low <= row.pearson <= row.pearson_high
+        assert row.spearman_low <= row.spearman <= row.spearman_high
+
+
+def test_pairs_with_few_players_have_no_statistics():
+    x, Y = metric_and_stats(n=MIN_CORRELATION_PLAYERS + 5)
+    Y[MIN_CORRELATION_PLAYERS - 1:, 0] = np.nan
+    row = correlate(x, Y, ['yards', 'touchdowns', 'other'], resamples=20).iloc[0]
+    assert row['n'] < MIN_CORRELATION_PLAYERS
+    assert np.isnan(row[['pearson', 'pearson_p', 'spearman', 'slope', 'r2']].astype(float)).all()
+
+
+def test_resamples_are_reproducible():
+    x, Y = metric_and_stats()
+    first = correlate(x, Y, ['yards', 'touchdowns', 'other'], resamples=30, seed=7, batch_size=7)
+    assert first.equals(correlate(x, Y, ['yards', 'touchdowns', 'other'], resamples=30, seed=7, batch_size=7))
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from nfl_sources import deduplicate_seasons
+
+
+def season_rows():
+    return pd.DataFrame({
+        'player_id': ['a', 'a', 'a', 'a', 'b', 'b', 'c', 'c', None, None],
+        'player_name': ['A', 'A', 'A', 'A Jr.', 'B', 'B', 'C', 'C', 'D', 'D'],
+        'position': ['WR', 'WR', 'WR', 'TE', 'RB', 'RB', 'QB', 'QB', 'WR', 'WR'],
+        'season': [2019, 2020, 2021, 2020, 2020, 2020, 2020, 2020, 2020, 2020],
+        'receptions': [50.0, np.nan, 40.0, 45.0, 10.0, 10.0, 1.0, 1.0, 5.0, 5.0],
+        'receiving_yards': [600.0, 500.0, 450.0, 520.0, np.nan, 80.0, 5.0, 5.0, 40.0, 40.0],
+    })
+
+
+def test_modal_position_wins_over_more_recorded_values():
+    deduplicated, _ = deduplicate_seasons(season_rows())
+    kept = deduplicated[(deduplicated['player_id'] == 'a') & (deduplicated['season'] == 2020)]
+    assert kept.index.tolist() == [1]
+
+
+def test_more_recorded_values_win_within_a_position():
+    deduplicated, _ = deduplicate_seasons(season_rows())
+    assert deduplicated[deduplicated['player_id'] == 'b'].index.tolist() == [5]
+
+
+def test_first_row_wins_among_identical_rows_and_rows_without_id_are_kept():
+    deduplicated, _ = deduplicate_seasons(season_rows())
+    assert deduplicated[deduplicated['player_id'] == 'c'].index.tolist() == [6]
+    assert deduplicated['player_id'].isna().sum() == 2
+    assert not deduplicated.dropna(subset=['player_id']).duplicated(['player_id', 'season']).any()
+
+
+def test_report_lists_the_collapsed_seasons_with_their_conflicts():
+    _, report = deduplicate_seasons(season_rows())
+    report = report.set_index(['player_id', 'season'])
+    assert report.index.tolist() == [('a', 2020), ('b', 2020), ('c', 2020)]
+    assert report.loc[('a', 2020), 'rows'] == 2
+    assert report.loc[('a', 2020), 'kept_position'] == 'WR'
+    assert report.loc[('a', 2020), 'dropped_positions'] == 'TE'
+    assert report.loc[('a', 2020), 'conflicting_columns'] == 'player_name, position, receptions, receiving_yards'
+    assert report.loc[('c', 2020), 'conflicting_columns'] == ''
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+from nfl_distributions import PositionDistributions, build_summaries
+
+METRICS = ['40yd', 'Bench']
+
+
+def combine_rows():
+    return pd.DataFrame({
+        'Pos': ['WR', 'WR', 'WR', 'WR', 'RB'],
+        '40yd': [4.4, 4.5, 4.6, 4.3, 4.5],
+        'Bench': [10.0, np.nan, 14.0, 12.0, 20.0],
+    })
+
+
+def test_boxplots_use_players_with_all_metrics():
+    distributions = PositionDistributions(combine_rows(), metrics=METRICS)
+    # the player without a bench result is left out of the 40yd boxplot as well
+    assert distributions.box_stats('WR', '40yd')['med'] == 4.4
+    assert distributions.summaries.set_index(['Pos', 'metric']).loc[('WR', '40yd'), 'count'] == 3
+
+
+def test_percentiles_rank_among_all_players_with_the_metric():
+    distributions = PositionDistributions(combine_rows(), metrics=METRICS)
+    assert distributions.percentile('WR', '40yd', 4.5) == 62.5
+
+
+def test_summaries_of_another_population_are_rebuilt():
+    per_metric = build_summaries(combine_rows(), METRICS).assign(count=[4, 3, 1, 1])
+    distributions = PositionDistributions(combine_rows(), per_metric, metrics=METRICS)
+    assert distributions.summaries['count'].tolist() == [3, 3, 1, 1]
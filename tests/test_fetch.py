@@ -0,0 +1,46 @@
+import os
+
+import pandas as pd
+
+import nfl_sources
+from nfl_fetch import ingest_seasons, merge_season, raw_path
+
+
+# Raw downloads of two seasons: player 1 is a WR with two roster entries (WR and TE) in 2021, player 2 has two identical entries
+def raw_seasons():
+    stats = {
+        2020: pd.DataFrame({'player_id': ['1', '2'], 'season': 2020, 'receptions': [50.0, 20.0], 'receiving_yards': [600.0, 150.0]}),
+        2021: pd.DataFrame({'player_id': ['1', '2'], 'season': 2021, 'receptions': [40.0, 25.0], 'receiving_yards': [500.0, 210.0]}),
+    }
+    rosters = {
+        2020: pd.DataFrame({'player_id': ['1', '2'], 'season': 2020, 'player_name': ['A', 'B'], 'position': ['WR', 'RB']}),
+        2021: pd.DataFrame({'player_id': ['1', '1', '2', '2'], 'season': 2021, 'player_name': ['A', 'A', 'B', 'B'],
+                            'position': ['TE', 'WR', 'RB', 'RB'], 'draft_number': [10.0, 10.0, None, 3.0]}),
+    }
+    return stats, rosters
+
+
+def test_partitions_and_csv_give_the_same_rows(tmp_path):
+    stats, rosters = raw_seasons()
+    cache_dir = tmp_path / 'raw'
+    cache_dir.mkdir()
+    for season in stats:
+        stats[season].to_csv(raw_path(cache_dir, 'seasonal_data', season, '.csv'), index=False)
+        rosters[season].to_csv(raw_path(cache_dir, 'seasonal_rosters', season, '.csv'), index=False)
+    directory = nfl_sources.partition_dir(str(tmp_path / 'players.csv'))
+    assert ingest_seasons(2020, 2021, directory, cache_dir, offline=True) == [2020, 2021]
+
+    csv_path = tmp_path / 'players.csv'
+    pd.concat([merge_season(stats[season], rosters[season]) for season in stats]).to_csv(csv_path, index=False)
+    from_csv = nfl_sources.read_season_csv(csv_path)
+    from_partitions = nfl_sources.read_season_source(directory)[from_csv.columns]
+
+    # the modal position over all seasons wins in both paths (within 2021 alone WR and TE are tied)
+    assert from_partitions.set_index(['player_id', 'season']).loc[('1', 2021), 'position'] == 'WR'
+    pd.testing.assert_frame_equal(from_partitions.sort_values(['player_id', 'season'], ignore_index=True),
+                                  from_csv.sort_values(['player_id', 'season'], ignore_index=True))
+
+    # the collapsed duplicates are reported with the season they belong to
+    report = pd.read_csv(os.path.join(directory, 'season_2021_duplicates.csv'), dtype={'player_id': 'object'})
+    assert report[['player_id', 'kept_position']].values.tolist() == [['1', 'WR'], ['2', 'RB']]
+    assert not os.path.exists(os.path.join(directory, 'season_2020_duplicates.csv'))
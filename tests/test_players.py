@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from nfl_players import build_player_dimension, normalize_name, player_keys
+
+
+def test_normalized_names_ignore_case_accents_punctuation_and_suffixes():
+    assert normalize_name('D.K. Metcalf Jr.') == 'dk metcalf'
+    assert normalize_name('José  Núñez III') == 'jose nunez'
+    assert normalize_name(None) is None
+
+
+def test_rows_are_matched_by_id_then_by_name():
+    combine = pd.DataFrame({'player_id': ['id-1', 'id-2', None, None],
+                            'player_name': ['Calvin Ridley', 'Mike Williams', 'Odell Beckham', 'Mike Williams']})
+    dimension = build_player_dimension([combine])
+    # two players share a name: the row without id is a third player, the name alone is ambiguous
+    assert len(dimension) == 4
+
+    season = pd.DataFrame({'player_id': ['id-2', None, None, 'id-9'],
+                           'player_name': ['Mike Williams', 'Odell Beckham Jr.', 'Calvin Ridely', 'Calvin Ridley']})
+    keys = player_keys(season, dimension)
+    key_of = dict(zip(dimension['player_name'], dimension['player_key']))
+    assert keys[0] == dimension.loc[dimension['player_id'] == 'id-2', 'player_key'].item()
+    # no id: the player without id of that name, else the closest unique name
+    assert keys[1] == key_of['Odell Beckham']
+    assert keys[2] == key_of['Calvin Ridley']
+    # an unknown id is not matched by name (another player may share it)
+    assert keys[3] == -1
+
+
+def test_existing_keys_are_kept_and_new_players_appended():
+    existing = build_player_dimension([pd.DataFrame({'player_id': ['id-1'], 'player_name': ['A Player']})])
+    season = pd.DataFrame({'player_id': ['id-2', 'id-1', 'id-2'], 'player_name': ['B Player', 'A Player', 'B Player']})
+    dimension = build_player_dimension([season], existing)
+    assert dimension['player_key'].tolist() == [0, 1]
+    assert dimension['player_id'].tolist() == ['id-1', 'id-2']
+    assert dimension['player_key'].dtype == np.int32
@@ -0,0 +1,27 @@
+import tracemalloc
+
+import nfl_profile
+from nfl_profile import begin, current_profile, discard, end, stage
+
+
+def test_interrupted_rerun_is_discarded():
+    begin('timing')
+    with stage('load'):
+        pass
+    # the rerun is interrupted before end(): the next rerun of the session starts without profiling
+    discard()
+    assert current_profile() is None
+    assert not tracemalloc.is_tracing()
+    assert end() is None
+
+
+def test_next_profiled_rerun_starts_clean():
+    begin('cprofile')
+    with stage('stale'):
+        pass
+    profile = begin('timing')
+    with stage('fresh'):
+        pass
+    assert [record.name for record in end().records] == ['fresh']
+    assert profile not in nfl_profile._active.values()
+    assert not tracemalloc.is_tracing()
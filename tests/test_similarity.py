@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from nfl_similarity import GaussianImputer, SimilarityEngine
+
+METRICS = ['a', 'b', 'c', 'd']
+
+
+def players(n=40, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.normal(size=(n, len(METRICS))) * [1.0, 5.0, 0.2, 3.0] + [10.0, 50.0, 4.5, 20.0]
+    values[rng.random(values.shape) < 0.2] = np.nan
+    return pd.DataFrame(values, columns=METRICS)
+
+
+# Distances of the masked mode computed pair by pair: standardized differences over the shared metrics, re-normalised
+def brute_force_masked(frame, query):
+    values = frame[METRICS].to_numpy()
+    standardized = (values - np.nanmean(values, axis=0)) / np.nanstd(values, axis=0)
+    query = (query - np.nanmean(values, axis=0)) / np.nanstd(values, axis=0)
+    distances = []
+    for row in standardized:
+        shared = ~np.isnan(row) & ~np.isnan(query)
+        distances.append(np.sqrt(((row - query)[shared] ** 2).sum() * len(METRICS) / shared.sum()) if shared.any() else np.inf)
+    return np.array(distances)
+
+
+def test_masked_distance_matches_brute_force():
+    frame = players()
+    engine = SimilarityEngine(frame, METRICS, missing='masked')
+    query = np.array([10.5, np.nan, 4.4, 22.0])
+    rows, distances = engine.nearest(query, k=10)
+    expected = brute_force_masked(frame, query)
+    order = np.argsort(expected, kind='stable')[:10]
+    assert np.allclose(distances[0], expected[order])
+    assert set(rows[0]) == set(order)
+
+
+def test_masked_distance_equals_euclidean_for_complete_players():
+    frame = players().dropna()
+    query = frame.iloc[0].to_numpy() + 0.1
+    masked = SimilarityEngine(frame, METRICS, missing='masked').nearest(query, k=5)
+    complete = SimilarityEngine(frame, METRICS, missing='complete').nearest(query, k=5)
+    assert np.array_equal(masked[0], complete[0])
+    assert np.allclose(masked[1], complete[1])
+
+
+def test_imputer_fills_the_conditional_mean():
+    rng = np.random.default_rng(1)
+    covariance = np.array([[1.0, 0.8, 0.2], [0.8, 1.0, 0.1], [0.2, 0.1, 1.0]])
+    values = rng.multivariate_normal([0.0, 1.0, 2.0], covariance, size=500)
+    imputer = GaussianImputer(values)
+    mean, fitted = values.mean(axis=0), np.cov(values, rowvar=False)
+
+    row = np.array([[1.5, np.nan, np.nan]])
+    expected = mean[1:] + fitted[1:, :1] @ np.linalg.inv(fitted[:1, :1]) @ (row[0, :1] - mean[:1])
+    assert np.allclose(imputer.transform(row)[0, 1:], expected)
+    # observed values are kept, complete rows are unchanged
+    assert imputer.transform(row)[0, 0] == 1.5
+    assert np.array_equal(imputer.transform(values[:3]), values[:3])
+
+
+def test_mahalanobis_cannot_be_masked():
+    with pytest.raises(ValueError):
+        SimilarityEngine(players(), METRICS, distance='mahalanobis', missing='masked')
+
+
+def test_tree_and_chunked_search_agree_on_incomplete_queries(monkeypatch):
+    import nfl_similarity
+    frame = players(n=60).dropna()
+    queries = np.array([[10.0, 50.0, 4.5, 20.0], [np.nan, 55.0, 4.4, 18.0]])
+    chunked = SimilarityEngine(frame, METRICS, missing='complete').nearest(queries, k=3)
+    monkeypatch.setattr(nfl_similarity, 'KD_TREE_MIN_PLAYERS', 1)
+    tree = SimilarityEngine(frame, METRICS, missing='complete').nearest(queries, k=3)
+    assert np.array_equal(tree[0], chunked[0])
+    assert np.allclose(tree[1], chunked[1], equal_nan=True)
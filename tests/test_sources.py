@@ -0,0 +1,20 @@
+import os
+
+import pandas as pd
+
+import nfl_sources
+
+
+def test_both_data_sets_store_the_season_as_int16(data_dir, raw_combine):
+    combine = nfl_sources.read_combine_csv(os.path.join(data_dir, os.path.basename(nfl_sources.COMBINE_CSV)))
+    season = nfl_sources.read_season_csv(os.path.join(data_dir, os.path.basename(nfl_sources.SEASON_CSV)))
+    assert combine['season'].dtype == 'int16' and season['season'].dtype == 'int16'
+    assert combine['season'].tolist() == raw_combine['season'].tolist()
+
+
+def test_combine_rows_without_a_valid_season_are_dropped(data_dir, raw_combine):
+    path = os.path.join(data_dir, os.path.basename(nfl_sources.COMBINE_CSV))
+    raw_combine.astype({'season': 'object'}).assign(season=['n/a'] + raw_combine['season'].tolist()[1:]).to_csv(path, index=False)
+    combine = nfl_sources.read_combine_csv(path)
+    assert len(combine) == len(raw_combine) - 1
+    assert combine.index.equals(pd.RangeIndex(len(combine)))